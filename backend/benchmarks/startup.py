@@ -0,0 +1,92 @@
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_PHASE = re.compile(r'^app_startup_phase_seconds\{phase="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def cold_start(db_url, path="/api/health", timeout=30.0, poll_interval=0.005):
+    """
+    Start a fresh `python src/app.py` worker in production mode and poll
+    `path` until it answers 200. Returns the seconds from spawning the
+    process to that first response, with the app's startup phases as
+    reported at /api/metrics.
+    """
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=db_url, FLASK_ENV="production", FLASK_RUN_HOST="127.0.0.1",
+               FLASK_RUN_PORT=str(port), DB_CREATE_ALL="false")
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join("src", "app.py")], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"worker exited with status {process.returncode} before serving {path}")
+            try:
+                status, _ = _get(base + path)
+                if status == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"worker did not serve {path} within {timeout}s")
+            time.sleep(poll_interval)
+        first_request = time.perf_counter() - started
+        phases = {}
+        try:
+            _, body = _get(base + "/api/metrics")
+            phases = {name: float(value) for name, value in _PHASE.findall(body.decode())}
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        return {"first_request_seconds": first_request, "phases": phases}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def run_startup_benchmark(db_url, runs=5, path="/api/health"):
+    """
+    Median, min and max time-to-first-request over `runs` fresh workers,
+    plus the median of each startup phase.
+    """
+    results = []
+    for i in range(runs):
+        result = cold_start(db_url, path=path)
+        logger.info(f"Run {i + 1}/{runs}: first response after {result['first_request_seconds']:.3f}s")
+        results.append(result)
+    seconds = [r["first_request_seconds"] for r in results]
+    phase_names = list(dict.fromkeys(name for r in results for name in r["phases"]))
+    return {
+        "path": path,
+        "runs": results,
+        "median_first_request_seconds": statistics.median(seconds),
+        "min_first_request_seconds": min(seconds),
+        "max_first_request_seconds": max(seconds),
+        "median_phase_seconds": {
+            name: statistics.median(r["phases"][name] for r in results if name in r["phases"])
+            for name in phase_names
+        },
+    }
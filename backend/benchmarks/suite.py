@@ -0,0 +1,242 @@
+import os
+import platform
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from logging import getLogger
+import numpy as np
+import pandas as pd
+from src.etl_steps.cleaner import basic_clean, calculate_distance, calculate_cell_ids, advanced_clean_and_enrich
+from src.etl_steps.loader import iter_csv_in_chunks
+from src.services_custom.top_k_hotspots import count_pickup_cells, manual_top_k, cells_to_hotspots
+from .synthetic import size_label, write_synthetic_csv
+
+logger = getLogger(__name__)
+
+REPORT_VERSION = 1
+
+# Timed stages in pipeline order
+STAGES = (
+    "read_csv",
+    "basic_clean",
+    "calculate_distance",
+    "advanced_clean_and_enrich",
+    "hotspot_cell_ids",
+    "top_k_hotspots",
+)
+
+# Rows per chunk when generating the synthetic CSV; fixed so the data for a
+# size and seed does not depend on the chunk size being benchmarked
+GENERATOR_CHUNK = 50000
+
+
+def synthetic_csv(data_dir, rows, seed):
+    """
+    Path of the cached synthetic raw CSV for (rows, seed), generated on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{size_label(rows)}-s{seed}.csv")
+    if not os.path.exists(path):
+        write_synthetic_csv(path, rows, chunksize=GENERATOR_CHUNK, seed=seed)
+    return path
+
+
+class _StageRunner:
+    """
+    Runs the stages over one chunk, adding elapsed seconds and input rows
+    per stage, or recording tracemalloc peaks instead when `trace` is set.
+    """
+
+    def __init__(self, k, cell_size_deg, trace=False):
+        self.k = k
+        self.cell_size_deg = cell_size_deg
+        self.trace = trace
+        self.seconds = defaultdict(float)
+        self.rows = defaultdict(int)
+        self.peak_bytes = {}
+        self.cell_counts = pd.Series(dtype="int64")
+        self.pickup_cells = defaultdict(int)
+
+    def timed(self, stage, rows, func, *args):
+        if self.trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        result = func(*args)
+        self.seconds[stage] += time.perf_counter() - started
+        self.rows[stage] += rows
+        if self.trace:
+            self.peak_bytes[stage] = max(self.peak_bytes.get(stage, 0), tracemalloc.get_traced_memory()[1] - base)
+        return result
+
+    def _count_cell_ids(self, lat, lon):
+        counts = calculate_cell_ids(lat, lon, self.cell_size_deg).value_counts()
+        self.cell_counts = self.cell_counts.add(counts, fill_value=0)
+
+    def _count_pickup_cells(self, records):
+        for cell, count in count_pickup_cells(records, cell_size_deg=self.cell_size_deg).items():
+            self.pickup_cells[cell] += count
+
+    def _select_hotspots(self):
+        return cells_to_hotspots(manual_top_k(self.pickup_cells, self.k), self.cell_size_deg)
+
+    def chunk(self, chunk):
+        cleaned, _, _ = self.timed("basic_clean", len(chunk), basic_clean, chunk)
+        rows = len(cleaned)
+        if not rows:
+            return
+        self.timed("calculate_distance", rows, calculate_distance,
+                   cleaned["pickup_latitude"], cleaned["pickup_longitude"],
+                   cleaned["dropoff_latitude"], cleaned["dropoff_longitude"])
+        self.timed("advanced_clean_and_enrich", rows, advanced_clean_and_enrich, cleaned.copy())
+        self.timed("hotspot_cell_ids", rows, self._count_cell_ids,
+                   cleaned["pickup_latitude"], cleaned["pickup_longitude"])
+        # the pure Python path takes dict rows; building them is not timed
+        records = cleaned[["pickup_latitude", "pickup_longitude"]].to_dict("records")
+        self.timed("top_k_hotspots", rows, self._count_pickup_cells, records)
+
+    def finish(self):
+        self.timed("top_k_hotspots", 0, self._select_hotspots)
+
+
+def _timed_pass(csv_path, chunksize, k, cell_size_deg):
+    runner = _StageRunner(k, cell_size_deg)
+    chunks = iter_csv_in_chunks(csv_path, chunksize=chunksize)
+    while True:
+        chunk = runner.timed("read_csv", 0, next, chunks, None)
+        if chunk is None:
+            break
+        runner.rows["read_csv"] += len(chunk)
+        runner.chunk(chunk)
+    runner.finish()
+    return runner
+
+
+def _memory_pass(csv_path, chunksize, k, cell_size_deg):
+    """
+    tracemalloc peak of each stage on the first chunk (stages work chunk by
+    chunk, so one full chunk shows their working set). Not timed.
+    """
+    runner = _StageRunner(k, cell_size_deg, trace=True)
+    tracemalloc.start()
+    try:
+        chunk = runner.timed("read_csv", 0, next, iter_csv_in_chunks(csv_path, chunksize=chunksize))
+        runner.chunk(chunk)
+        runner.finish()
+    finally:
+        tracemalloc.stop()
+    return runner.peak_bytes
+
+
+def benchmark_size(csv_path, rows, chunksize=50000, repeat=1, measure_memory=True, k=10, cell_size_deg=0.01):
+    """
+    Time every stage over the whole file `repeat` times (keeping the best
+    time per stage) and optionally measure its peak memory.
+    """
+    best = None
+    for _ in range(repeat):
+        runner = _timed_pass(csv_path, chunksize, k, cell_size_deg)
+        if best is None:
+            best = runner
+        else:
+            for stage in STAGES:
+                best.seconds[stage] = min(best.seconds[stage], runner.seconds[stage])
+    peaks = _memory_pass(csv_path, chunksize, k, cell_size_deg) if measure_memory else {}
+
+    stages = {}
+    for stage in STAGES:
+        seconds = best.seconds[stage]
+        stages[stage] = {
+            "seconds": round(seconds, 6),
+            "rows": best.rows[stage],
+            "rows_per_sec": round(best.rows[stage] / seconds, 1) if seconds else None,
+            "peak_mb": round(peaks[stage] / 2 ** 20, 3) if stage in peaks else None,
+        }
+    return {
+        "rows": rows,
+        "clean_rows": best.rows["calculate_distance"],
+        "total_seconds": round(sum(best.seconds.values()), 6),
+        "stages": stages,
+    }
+
+
+def run_benchmarks(sizes, data_dir, chunksize=50000, seed=42, repeat=1, measure_memory=True, k=10,
+                   cell_size_deg=0.01):
+    """
+    Benchmark every size (row counts) on deterministic synthetic data and
+    return the JSON-serializable report.
+    """
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "seed": seed,
+            "chunksize": chunksize,
+            "repeat": repeat,
+            "k": k,
+            "cell_size_deg": cell_size_deg,
+        },
+        "sizes": {},
+    }
+    for rows in sizes:
+        csv_path = synthetic_csv(data_dir, rows, seed)
+        logger.info(f"Benchmarking {size_label(rows)} rows ({csv_path})")
+        report["sizes"][size_label(rows)] = benchmark_size(
+            csv_path, rows, chunksize=chunksize, repeat=repeat, measure_memory=measure_memory,
+            k=k, cell_size_deg=cell_size_deg)
+    return report
+
+
+def compare_reports(current, baseline, time_tolerance=0.10, memory_tolerance=0.20):
+    """
+    Compare each (size, stage) present in both reports. A stage regresses
+    when its throughput drops by more than `time_tolerance` or its peak
+    memory grows by more than `memory_tolerance` (fractions).
+    Returns a list of dicts with the numbers and a status of
+    "regression", "improved", "ok" or "new".
+    """
+    results = []
+    for size, entry in current["sizes"].items():
+        base_stages = baseline.get("sizes", {}).get(size, {}).get("stages", {})
+        for stage, now in entry["stages"].items():
+            base = base_stages.get(stage)
+            row = {
+                "size": size,
+                "stage": stage,
+                "rows_per_sec": now["rows_per_sec"],
+                "baseline_rows_per_sec": None,
+                "throughput_change": None,
+                "peak_mb": now["peak_mb"],
+                "baseline_peak_mb": None,
+                "memory_change": None,
+                "status": "new",
+            }
+            if base is None:
+                results.append(row)
+                continue
+            row["baseline_rows_per_sec"] = base["rows_per_sec"]
+            row["baseline_peak_mb"] = base["peak_mb"]
+            status = "ok"
+            if now["rows_per_sec"] and base["rows_per_sec"]:
+                change = now["rows_per_sec"] / base["rows_per_sec"] - 1
+                row["throughput_change"] = round(change, 4)
+                if change < -time_tolerance:
+                    status = "regression"
+                elif change > time_tolerance:
+                    status = "improved"
+            if now["peak_mb"] is not None and base["peak_mb"]:
+                change = now["peak_mb"] / base["peak_mb"] - 1
+                row["memory_change"] = round(change, 4)
+                if change > memory_tolerance:
+                    status = "regression"
+            row["status"] = status
+            results.append(row)
+    return results
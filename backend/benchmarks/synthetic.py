@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import pandas as pd
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# (name, latitude, longitude, spread in degrees, share of pickups)
+NYC_CLUSTERS = (
+    ("midtown", 40.7549, -73.9840, 0.010, 0.30),
+    ("upper_east_side", 40.7736, -73.9566, 0.010, 0.14),
+    ("upper_west_side", 40.7870, -73.9754, 0.010, 0.10),
+    ("downtown", 40.7128, -74.0060, 0.008, 0.12),
+    ("chelsea_village", 40.7376, -73.9985, 0.008, 0.12),
+    ("williamsburg", 40.7081, -73.9571, 0.012, 0.05),
+    ("penn_station", 40.7506, -73.9935, 0.003, 0.06),
+    ("jfk", 40.6413, -73.7781, 0.006, 0.04),
+    ("laguardia", 40.7769, -73.8740, 0.004, 0.04),
+    ("city_wide", 40.7300, -73.9350, 0.060, 0.03),
+)
+
+# Pickups per hour of day (relative), with morning and evening peaks
+HOURLY_PROFILE = np.array([
+    3.0, 2.2, 1.6, 1.2, 1.0, 1.1, 2.2, 3.8, 4.6, 4.4, 4.1, 4.2,
+    4.4, 4.4, 4.6, 4.6, 4.3, 5.0, 5.8, 6.0, 5.6, 5.2, 4.8, 3.9,
+])
+
+PERIOD_START = np.datetime64("2016-01-01T00:00:00")
+PERIOD_DAYS = 182
+
+COLUMNS = (
+    "id", "vendor_id", "pickup_datetime", "dropoff_datetime", "passenger_count",
+    "pickup_longitude", "pickup_latitude", "dropoff_longitude", "dropoff_latitude",
+    "store_and_fwd_flag", "trip_duration", "fare_amount", "tip_amount", "payment_type",
+)
+
+# Kinds of dirty row, each tripping a different cleaning rule
+DIRTY_KINDS = (
+    "bad_datetime", "missing_coordinates", "zero_coordinates", "negative_duration",
+    "zero_distance", "negative_fare", "long_duration",
+)
+
+
+def parse_size(size):
+    """
+    "10k", "1m", "2.5M" or "5000" -> number of rows.
+    """
+    text = str(size).strip().lower()
+    factor = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    if factor != 1:
+        text = text[:-1]
+    return int(float(text) * factor)
+
+
+def size_label(rows):
+    if rows % 1000000 == 0:
+        return f"{rows // 1000000}m"
+    if rows % 1000 == 0:
+        return f"{rows // 1000}k"
+    return str(rows)
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+
+def synthetic_chunk(rows, seed=42, chunk_index=0, first_id=0, dirty_fraction=0.02):
+    """
+    One raw trip chunk in the Kaggle/TLC layout (string datetimes, as read
+    from CSV). Pickups and dropoffs are drawn around NYC_CLUSTERS, pickup
+    times follow HOURLY_PROFILE, and `dirty_fraction` of the rows are
+    broken in one of the DIRTY_KINDS ways. The chunk depends only on
+    (seed, chunk_index), so any size is reproducible chunk by chunk.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    weights = np.array([c[4] for c in NYC_CLUSTERS])
+    centers = np.array([(c[1], c[2], c[3]) for c in NYC_CLUSTERS])
+
+    def draw_points():
+        cluster = rng.choice(len(NYC_CLUSTERS), size=rows, p=weights / weights.sum())
+        lat = centers[cluster, 0] + rng.normal(0, 1, rows) * centers[cluster, 2]
+        lon = centers[cluster, 1] + rng.normal(0, 1, rows) * centers[cluster, 2] * 1.3
+        return lat, lon
+
+    pickup_lat, pickup_lon = draw_points()
+    dropoff_lat, dropoff_lon = draw_points()
+    # most trips stay local: pull half of the dropoffs towards their pickup
+    local = rng.random(rows) < 0.5
+    dropoff_lat[local] = pickup_lat[local] + rng.normal(0, 0.012, local.sum())
+    dropoff_lon[local] = pickup_lon[local] + rng.normal(0, 0.015, local.sum())
+
+    day = rng.integers(0, PERIOD_DAYS, rows)
+    hour = rng.choice(24, size=rows, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    second = rng.integers(0, 3600, rows)
+    pickup = PERIOD_START + (day * 86400 + hour * 3600 + second).astype("timedelta64[s]")
+
+    distance = _haversine_km(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+    speed = np.clip(rng.lognormal(np.log(18), 0.35, rows), 4, 80)
+    duration = np.maximum(60, distance / speed * 3600 + rng.normal(120, 60, rows)).astype(np.int64)
+    dropoff = pickup + duration.astype("timedelta64[s]")
+    fare = np.round(2.5 + distance * 1.56 + duration / 60 * 0.5 + rng.normal(0, 1, rows), 2)
+    card = rng.random(rows) < 0.68
+    tip = np.where(card, np.round(fare * rng.uniform(0.1, 0.25, rows), 2), 0.0)
+
+    df = pd.DataFrame({
+        "id": np.char.add("id", np.arange(first_id, first_id + rows).astype(str)),
+        "vendor_id": rng.integers(1, 3, rows),
+        "pickup_datetime": pd.Series(pickup).astype(str),
+        "dropoff_datetime": pd.Series(dropoff).astype(str),
+        "passenger_count": rng.choice([1, 1, 1, 1, 2, 2, 3, 5, 6], size=rows),
+        "pickup_longitude": np.round(pickup_lon, 6),
+        "pickup_latitude": np.round(pickup_lat, 6),
+        "dropoff_longitude": np.round(dropoff_lon, 6),
+        "dropoff_latitude": np.round(dropoff_lat, 6),
+        "store_and_fwd_flag": np.where(rng.random(rows) < 0.005, "Y", "N"),
+        "trip_duration": duration,
+        "fare_amount": fare,
+        "tip_amount": tip,
+        "payment_type": np.where(card, "CRD", "CSH"),
+    }, columns=list(COLUMNS))
+
+    dirty = np.flatnonzero(rng.random(rows) < dirty_fraction)
+    kinds = rng.integers(0, len(DIRTY_KINDS), len(dirty))
+    for i, kind in enumerate(DIRTY_KINDS):
+        at = dirty[kinds == i]
+        if kind == "bad_datetime":
+            df.loc[at, "pickup_datetime"] = "garbage"
+        elif kind == "missing_coordinates":
+            df.loc[at, "pickup_longitude"] = np.nan
+        elif kind == "zero_coordinates":
+            df.loc[at, ["dropoff_latitude", "dropoff_longitude"]] = 0.0
+        elif kind == "negative_duration":
+            df.loc[at, "trip_duration"] = -df.loc[at, "trip_duration"]
+        elif kind == "zero_distance":
+            df.loc[at, "dropoff_latitude"] = df.loc[at, "pickup_latitude"]
+            df.loc[at, "dropoff_longitude"] = df.loc[at, "pickup_longitude"]
+        elif kind == "negative_fare":
+            df.loc[at, "fare_amount"] = -df.loc[at, "fare_amount"]
+        elif kind == "long_duration":
+            df.loc[at, "trip_duration"] = 60 * 3600
+    return df
+
+
+def iter_synthetic_chunks(rows, chunksize=50000, seed=42, dirty_fraction=0.02):
+    """
+    Yield `rows` synthetic raw rows as DataFrames of at most `chunksize` rows.
+    """
+    for index, first in enumerate(range(0, rows, chunksize)):
+        yield synthetic_chunk(min(chunksize, rows - first), seed=seed, chunk_index=index,
+                              first_id=first, dirty_fraction=dirty_fraction)
+
+
+def write_synthetic_csv(path, rows, chunksize=50000, seed=42, dirty_fraction=0.02):
+    """
+    Write a raw CSV of `rows` synthetic trips. Chunks are seeded by index,
+    so a given (rows, chunksize, seed) always produces the same file.
+    """
+    tmp_path = f"{path}.tmp"
+    for index, chunk in enumerate(iter_synthetic_chunks(rows, chunksize, seed, dirty_fraction)):
+        chunk.to_csv(tmp_path, mode="w" if index == 0 else "a", header=index == 0, index=False)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {rows} synthetic trips to {path}")
+    return path
@@ -51,6 +51,16 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # indexes limited with ddl_if(dialect=...) (the BRIN index on trips) only
+    # exist on that dialect, so autogenerate should not expect them elsewhere
+    ddl_if = getattr(object, '_ddl_if', None)
+    if type_ == 'index' and not reflected and ddl_if is not None \
+            and ddl_if.dialect is not None:
+        return ddl_if.dialect == context.get_context().dialect.name
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +75,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -97,6 +108,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
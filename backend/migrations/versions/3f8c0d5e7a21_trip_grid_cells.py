@@ -0,0 +1,68 @@
+"""multi-resolution grid cell columns on trips
+
+Revision ID: 3f8c0d5e7a21
+Revises: 9e4a61c2b8f7
+Create Date: 2026-10-18 11:26:07.904551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c0d5e7a21'
+down_revision = '9e4a61c2b8f7'
+branch_labels = None
+depends_on = None
+
+# column suffix -> cell size in degrees (mirrors CELL_RESOLUTIONS)
+RESOLUTIONS = {'d1': 0.1, 'd2': 0.01, 'd3': 0.001}
+
+
+def _floor_sql(dialect, value):
+    if dialect == 'sqlite':
+        return f"(CAST({value} AS INTEGER) - ({value} < CAST({value} AS INTEGER)))"
+    return f"floor({value})"
+
+
+def _cell_id_sql(dialect, lat, lon, size):
+    # same packing as services_custom.top_k_hotspots.cell_to_id
+    lat_offset = int(round(90 / size))
+    lon_offset = int(round(180 / size))
+    width = 2 * lon_offset + 1
+    ci = _floor_sql(dialect, f"({lat} / {size!r})")
+    cj = _floor_sql(dialect, f"({lon} / {size!r})")
+    return f"(({ci} + {lat_offset}) * {width} + ({cj} + {lon_offset}))"
+
+
+def upgrade():
+    with op.batch_alter_table('trips', schema=None) as batch_op:
+        for suffix in RESOLUTIONS:
+            batch_op.add_column(sa.Column(f'pickup_cell_{suffix}', sa.BigInteger(), nullable=True))
+        for suffix in RESOLUTIONS:
+            batch_op.add_column(sa.Column(f'dropoff_cell_{suffix}', sa.BigInteger(), nullable=True))
+
+    # backfill rows imported before the ETL computed cell ids
+    dialect = op.get_bind().dialect.name
+    for suffix, size in RESOLUTIONS.items():
+        pickup = _cell_id_sql(dialect, 'pickup_latitude', 'pickup_longitude', size)
+        dropoff = _cell_id_sql(dialect, 'dropoff_latitude', 'dropoff_longitude', size)
+        op.execute(
+            f"UPDATE trips SET pickup_cell_{suffix} = {pickup}, dropoff_cell_{suffix} = {dropoff} "
+            f"WHERE pickup_cell_{suffix} IS NULL"
+        )
+
+    with op.batch_alter_table('trips', schema=None) as batch_op:
+        for suffix in RESOLUTIONS:
+            batch_op.create_index(f'ix_trips_pickup_dt_cell_{suffix}', ['pickup_datetime', f'pickup_cell_{suffix}'], unique=False)
+            batch_op.create_index(batch_op.f(f'ix_trips_dropoff_cell_{suffix}'), [f'dropoff_cell_{suffix}'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trips', schema=None) as batch_op:
+        for suffix in RESOLUTIONS:
+            batch_op.drop_index(batch_op.f(f'ix_trips_dropoff_cell_{suffix}'))
+            batch_op.drop_index(f'ix_trips_pickup_dt_cell_{suffix}')
+        for suffix in RESOLUTIONS:
+            batch_op.drop_column(f'dropoff_cell_{suffix}')
+            batch_op.drop_column(f'pickup_cell_{suffix}')
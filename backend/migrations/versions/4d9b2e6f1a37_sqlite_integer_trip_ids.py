@@ -0,0 +1,40 @@
+"""INTEGER trip ids on SQLite
+
+Revision ID: 4d9b2e6f1a37
+Revises: c7f5a1e3b284
+Create Date: 2026-10-18 21:12:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9b2e6f1a37'
+down_revision = 'c7f5a1e3b284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only autoincrements an INTEGER PRIMARY KEY; the BIGINT id from
+    # the initial migration made every insert fail with NOT NULL on trips.id.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('trips', recreate='always') as batch_op:
+        batch_op.alter_column('id',
+               existing_type=sa.BigInteger(),
+               type_=sa.Integer(),
+               existing_nullable=False,
+               autoincrement=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('trips', recreate='always') as batch_op:
+        batch_op.alter_column('id',
+               existing_type=sa.Integer(),
+               type_=sa.BigInteger(),
+               existing_nullable=False,
+               autoincrement=True)
@@ -0,0 +1,31 @@
+"""hourly trip rollups
+
+Revision ID: 5b7e2f0a9d13
+Revises: c41d9143fc57
+Create Date: 2026-10-18 09:12:41.302118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2f0a9d13'
+down_revision = 'c41d9143fc57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_hourly_rollups',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('pickup_hour', sa.Integer(), nullable=False),
+    sa.Column('trip_count', sa.BigInteger(), nullable=False),
+    sa.Column('speed_sum', sa.Float(), nullable=False),
+    sa.Column('speed_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'pickup_hour')
+    )
+
+
+def downgrade():
+    op.drop_table('trip_hourly_rollups')
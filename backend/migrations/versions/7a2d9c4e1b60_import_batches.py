@@ -0,0 +1,34 @@
+"""import batch ledger
+
+Revision ID: 7a2d9c4e1b60
+Revises: 3f8c0d5e7a21
+Create Date: 2026-10-18 11:42:10.215377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2d9c4e1b60'
+down_revision = '3f8c0d5e7a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_batches',
+    sa.Column('source', sa.String(length=40), nullable=False),
+    sa.Column('unit', sa.String(length=8), nullable=False),
+    sa.Column('start_offset', sa.BigInteger(), nullable=False),
+    sa.Column('end_offset', sa.BigInteger(), nullable=False),
+    sa.Column('rows', sa.BigInteger(), nullable=False),
+    sa.Column('first_pickup', sa.DateTime(), nullable=True),
+    sa.Column('last_pickup', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('source', 'unit', 'start_offset')
+    )
+
+
+def downgrade():
+    op.drop_table('import_batches')
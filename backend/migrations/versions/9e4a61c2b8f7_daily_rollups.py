@@ -0,0 +1,34 @@
+"""daily trip rollups
+
+Revision ID: 9e4a61c2b8f7
+Revises: 5b7e2f0a9d13
+Create Date: 2026-10-18 10:03:55.718402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a61c2b8f7'
+down_revision = '5b7e2f0a9d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_daily_rollups',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('trip_count', sa.BigInteger(), nullable=False),
+    sa.Column('distance_sum', sa.Float(), nullable=False),
+    sa.Column('distance_count', sa.BigInteger(), nullable=False),
+    sa.Column('fare_sum', sa.Float(), nullable=False),
+    sa.Column('fare_count', sa.BigInteger(), nullable=False),
+    sa.Column('speed_sum', sa.Float(), nullable=False),
+    sa.Column('speed_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('date')
+    )
+
+
+def downgrade():
+    op.drop_table('trip_daily_rollups')
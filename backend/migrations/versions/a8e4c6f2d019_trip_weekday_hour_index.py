@@ -0,0 +1,26 @@
+"""(pickup_datetime, day_of_week, pickup_hour) index on trips
+
+Revision ID: a8e4c6f2d019
+Revises: f1b7d3e9a602
+Create Date: 2026-10-18 17:02:41.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e4c6f2d019'
+down_revision = 'f1b7d3e9a602'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # on the partitioned PostgreSQL table this also builds it on every month partition
+    op.create_index('ix_trips_pickup_dt_dow_hour', 'trips', ['pickup_datetime', 'day_of_week', 'pickup_hour'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_trips_pickup_dt_dow_hour', table_name='trips')
@@ -0,0 +1,29 @@
+"""dataset version counter
+
+Revision ID: b6e0f3a8c925
+Revises: 7a2d9c4e1b60
+Create Date: 2026-10-18 12:20:41.603118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e0f3a8c925'
+down_revision = '7a2d9c4e1b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dataset_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('dataset_version')
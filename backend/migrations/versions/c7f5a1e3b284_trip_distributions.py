@@ -0,0 +1,35 @@
+"""per-day distribution sketches
+
+Revision ID: c7f5a1e3b284
+Revises: a8e4c6f2d019
+Create Date: 2026-10-18 17:48:19.402667
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f5a1e3b284'
+down_revision = 'a8e4c6f2d019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_distributions',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('value_count', sa.BigInteger(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=True),
+    sa.Column('max_value', sa.Float(), nullable=True),
+    sa.Column('centroid_means', sa.LargeBinary(), nullable=False),
+    sa.Column('centroid_weights', sa.LargeBinary(), nullable=False),
+    sa.Column('histogram', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'metric')
+    )
+
+
+def downgrade():
+    op.drop_table('trip_distributions')
@@ -0,0 +1,82 @@
+"""partition trips by pickup month
+
+Revision ID: d3a7b1f4e862
+Revises: b6e0f3a8c925
+Create Date: 2026-10-18 12:58:13.472905
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7b1f4e862'
+down_revision = 'b6e0f3a8c925'
+branch_labels = None
+depends_on = None
+
+# btree indexes of trips at this revision, recreated on the new parent table
+INDEXES = {
+    'ix_trips_pickup_datetime': ['pickup_datetime'],
+    'ix_trips_trip_distance': ['trip_distance'],
+    'ix_trips_pickup_dt_distance': ['pickup_datetime', 'trip_distance'],
+    'ix_trips_pickup_dt_cell_d1': ['pickup_datetime', 'pickup_cell_d1'],
+    'ix_trips_pickup_dt_cell_d2': ['pickup_datetime', 'pickup_cell_d2'],
+    'ix_trips_pickup_dt_cell_d3': ['pickup_datetime', 'pickup_cell_d3'],
+    'ix_trips_dropoff_cell_d1': ['dropoff_cell_d1'],
+    'ix_trips_dropoff_cell_d2': ['dropoff_cell_d2'],
+    'ix_trips_dropoff_cell_d3': ['dropoff_cell_d3'],
+}
+
+
+def _months(first, last):
+    # same naming as services.partitions.partition_name
+    month = date(first.year, first.month, 1)
+    while month <= last.date():
+        upper = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield f"trips_y{month.year:04d}m{month.month:02d}", month, upper
+        month = upper
+
+
+def _copy_table(old, partitioned):
+    # new trips with the same columns and id sequence as `old`, then its rows
+    suffix = " PARTITION BY RANGE (pickup_datetime)" if partitioned else ""
+    op.execute(f"CREATE TABLE trips (LIKE {old} INCLUDING DEFAULTS){suffix}")
+    key = "id, pickup_datetime" if partitioned else "id"
+    op.execute(f"ALTER TABLE trips ADD CONSTRAINT trips_pkey PRIMARY KEY ({key})")
+    op.execute("ALTER SEQUENCE trips_id_seq OWNED BY trips.id")
+    if partitioned:
+        first, last = op.get_bind().execute(sa.text(f"SELECT min(pickup_datetime), max(pickup_datetime) FROM {old}")).one()
+        if first is not None:
+            for name, lower, upper in _months(first, last):
+                op.execute(f"CREATE TABLE {name} PARTITION OF trips FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    op.execute(f"INSERT INTO trips SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+    # indexes are built after the copy, which is much faster than maintaining them row by row
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'trips', columns, unique=False)
+
+
+def upgrade():
+    # declarative partitioning is PostgreSQL only; SQLite dev databases keep a plain table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("ALTER TABLE trips RENAME TO trips_unpartitioned")
+    op.execute("ALTER TABLE trips_unpartitioned RENAME CONSTRAINT trips_pkey TO trips_unpartitioned_pkey")
+    op.execute("ALTER SEQUENCE trips_id_seq OWNED BY NONE")
+    _copy_table('trips_unpartitioned', partitioned=True)
+    # summaries of time-ordered inserts: a few pages per partition instead of a btree entry per row
+    op.create_index('ix_trips_pickup_dt_brin', 'trips', ['pickup_datetime'], unique=False, postgresql_using='brin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("ALTER TABLE trips RENAME TO trips_partitioned")
+    op.execute("ALTER TABLE trips_partitioned RENAME CONSTRAINT trips_pkey TO trips_partitioned_pkey")
+    op.execute("ALTER SEQUENCE trips_id_seq OWNED BY NONE")
+    op.drop_index('ix_trips_pickup_dt_brin', table_name='trips_partitioned')
+    for name in INDEXES:
+        op.drop_index(name, table_name='trips_partitioned')
+    _copy_table('trips_partitioned', partitioned=False)
@@ -0,0 +1,44 @@
+"""stratified trip samples
+
+Revision ID: e5c2a8d0f374
+Revises: d3a7b1f4e862
+Create Date: 2026-10-18 15:02:17.284615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a8d0f374'
+down_revision = 'd3a7b1f4e862'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_samples',
+    sa.Column('trip_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('pickup_datetime', sa.DateTime(), nullable=False),
+    sa.Column('pickup_hour', sa.Integer(), nullable=True),
+    sa.Column('trip_distance', sa.Float(), nullable=True),
+    sa.Column('fare_amount', sa.Float(), nullable=True),
+    sa.Column('average_speed_kmph', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('trip_id')
+    )
+    op.create_index(op.f('ix_trip_samples_date'), 'trip_samples', ['date'], unique=False)
+    op.create_index(op.f('ix_trip_samples_pickup_datetime'), 'trip_samples', ['pickup_datetime'], unique=False)
+    op.create_table('trip_sample_strata',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('population', sa.BigInteger(), nullable=False),
+    sa.Column('sample_rows', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('date')
+    )
+
+
+def downgrade():
+    op.drop_table('trip_sample_strata')
+    op.drop_index(op.f('ix_trip_samples_pickup_datetime'), table_name='trip_samples')
+    op.drop_index(op.f('ix_trip_samples_date'), table_name='trip_samples')
+    op.drop_table('trip_samples')
@@ -0,0 +1,39 @@
+"""origin-destination flow rollups
+
+Revision ID: f1b7d3e9a602
+Revises: e5c2a8d0f374
+Create Date: 2026-10-18 16:11:48.530271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b7d3e9a602'
+down_revision = 'e5c2a8d0f374'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trip_flow_rollups',
+    sa.Column('resolution', sa.String(length=2), nullable=False),
+    sa.Column('origin_cell', sa.BigInteger(), nullable=False),
+    sa.Column('destination_cell', sa.BigInteger(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('trip_count', sa.BigInteger(), nullable=False),
+    sa.Column('duration_sum', sa.Float(), nullable=False),
+    sa.Column('duration_count', sa.BigInteger(), nullable=False),
+    sa.Column('fare_sum', sa.Float(), nullable=False),
+    sa.Column('fare_count', sa.BigInteger(), nullable=False),
+    sa.Column('speed_sum', sa.Float(), nullable=False),
+    sa.Column('speed_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('resolution', 'origin_cell', 'destination_cell', 'date')
+    )
+    op.create_index('ix_trip_flow_rollups_resolution_date', 'trip_flow_rollups', ['resolution', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_trip_flow_rollups_resolution_date', table_name='trip_flow_rollups')
+    op.drop_table('trip_flow_rollups')
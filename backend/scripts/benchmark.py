@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import logging
+
+# Add the parent directory (project root) to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from src.config import Config
+from benchmarks.synthetic import parse_size, write_synthetic_csv
+from benchmarks.suite import run_benchmarks, compare_reports
+from benchmarks.startup import run_startup_benchmark
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.join(project_root, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def print_comparison(results):
+    print(f"{'size':>6} {'stage':<26} {'rows/s':>12} {'baseline':>12} {'change':>8} "
+          f"{'peak MB':>9} {'baseline':>9} {'change':>8}  status")
+    for r in results:
+        print(f"{r['size']:>6} {r['stage']:<26} {_fmt(r['rows_per_sec'], ',.0f'):>12} "
+              f"{_fmt(r['baseline_rows_per_sec'], ',.0f'):>12} {_fmt(r['throughput_change'], '+.1%'):>8} "
+              f"{_fmt(r['peak_mb'], '.1f'):>9} {_fmt(r['baseline_peak_mb'], '.1f'):>9} "
+              f"{_fmt(r['memory_change'], '+.1%'):>8}  {r['status']}")
+
+
+def compare(current, baseline_path, time_tolerance, memory_tolerance):
+    """
+    Print the comparison table; returns the number of regressed stages.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    results = compare_reports(current, baseline, time_tolerance, memory_tolerance)
+    print_comparison(results)
+    regressions = [r for r in results if r["status"] == "regression"]
+    if regressions:
+        logger.warning(f"{len(regressions)} stage(s) regressed against {baseline_path}")
+    return len(regressions)
+
+
+def write_json(path, report):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages, hotspot selection and API startup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the suite and write a JSON report")
+    run.add_argument("--sizes", default="10k,1m,10m", help="Comma separated row counts, e.g. 10k,1m,10m")
+    run.add_argument("--chunksize", type=int, default=Config.CHUNK_SIZE)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--repeat", type=int, default=1, help="Passes per size; the best time per stage is kept")
+    run.add_argument("--k", type=int, default=10, help="Hotspots selected")
+    run.add_argument("--resolution", type=float, default=0.01, help="Hotspot grid cell size in degrees")
+    run.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak memory pass")
+    run.add_argument("--data-dir", default=os.path.join(BENCHMARK_DIR, "data"),
+                     help="Where the synthetic CSVs are cached")
+    run.add_argument("--out", default=os.path.join(BENCHMARK_DIR, "results", "latest.json"))
+    run.add_argument("--baseline", default=DEFAULT_BASELINE)
+    run.add_argument("--save-baseline", action="store_true", help="Also write the report as the new baseline")
+
+    cmp = sub.add_parser("compare", help="Compare a report with the baseline; exits 1 on regressions")
+    cmp.add_argument("report", nargs="?", default=os.path.join(BENCHMARK_DIR, "results", "latest.json"))
+    cmp.add_argument("--baseline", default=DEFAULT_BASELINE)
+
+    for p in (run, cmp):
+        p.add_argument("--tolerance", type=float, default=0.10,
+                       help="Allowed throughput drop before a stage is flagged (fraction)")
+        p.add_argument("--memory-tolerance", type=float, default=0.20,
+                       help="Allowed peak memory growth before a stage is flagged (fraction)")
+
+    gen = sub.add_parser("generate", help="Write a synthetic raw trips CSV")
+    gen.add_argument("--rows", default="1m")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--dirty-fraction", type=float, default=0.02)
+    gen.add_argument("--out", required=True)
+
+    start = sub.add_parser("startup", help="Time fresh API workers to their first response; exits 1 if too slow")
+    start.add_argument("--runs", type=int, default=5)
+    start.add_argument("--max-seconds", type=float, default=2.0,
+                       help="Largest allowed median time from process start to the first response")
+    start.add_argument("--db-url", default=f"sqlite:///{os.path.join(BENCHMARK_DIR, 'data', 'startup.db')}",
+                       help="Database the workers connect to")
+    start.add_argument("--path", default="/api/health", help="URL path of the first request")
+    start.add_argument("--out", default=os.path.join(BENCHMARK_DIR, "results", "startup.json"))
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        os.makedirs(os.path.join(BENCHMARK_DIR, "data"), exist_ok=True)
+        report = run_startup_benchmark(args.db_url, runs=args.runs, path=args.path)
+        write_json(args.out, report)
+        for name, seconds in report["median_phase_seconds"].items():
+            print(f"{name:<16} {seconds * 1000:8.1f} ms")
+        median = report["median_first_request_seconds"]
+        print(f"{'first request':<16} {median * 1000:8.1f} ms (median of {args.runs}, "
+              f"min {report['min_first_request_seconds'] * 1000:.1f}, max {report['max_first_request_seconds'] * 1000:.1f})")
+        if median > args.max_seconds:
+            logger.warning(f"Median time to first request {median:.3f}s exceeds {args.max_seconds:.3f}s")
+            return 1
+        return 0
+
+    if args.command == "generate":
+        write_synthetic_csv(args.out, parse_size(args.rows), seed=args.seed, dirty_fraction=args.dirty_fraction)
+        return 0
+
+    if args.command == "run":
+        sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+        report = run_benchmarks(sizes, args.data_dir, chunksize=args.chunksize, seed=args.seed,
+                                repeat=args.repeat, measure_memory=not args.no_memory, k=args.k,
+                                cell_size_deg=args.resolution)
+        write_json(args.out, report)
+        if args.save_baseline:
+            write_json(args.baseline, report)
+            return 0
+        if not os.path.exists(args.baseline):
+            logger.info(f"No baseline at {args.baseline}; rerun with --save-baseline to create one")
+            return 0
+    else:
+        with open(args.report) as f:
+            report = json.load(f)
+    return 1 if compare(report, args.baseline, args.tolerance, args.memory_tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory (project root) to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine
+from src.config import Config
+from src.services.columnar import write_snapshot
+from src.services.dataset_version import current_dataset_version
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the memory-mapped columnar snapshot of the trips table")
+    parser.add_argument("--db-url", help="Database URL", default=Config.SQLALCHEMY_DATABASE_URI)
+    parser.add_argument("--snapshot-dir", help="Snapshot directory", default=Config.COLUMNAR_SNAPSHOT_DIR,
+                        required=Config.COLUMNAR_SNAPSHOT_DIR is None)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    with engine.connect() as connection:
+        version = current_dataset_version(connection)
+    write_snapshot(engine, args.snapshot_dir, version)
+    logger.info("Snapshot complete.")
+
+
+if __name__ == "__main__":
+    main()
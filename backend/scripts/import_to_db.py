@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
-import csv 
+import argparse
+import csv
+import hashlib
 import os
 import sys
+import time
 from datetime import datetime
 import logging
 
@@ -12,9 +15,20 @@ sys.path.insert(0, project_root)
 # Now use absolute imports
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from src.config import Config
+from src.config import Config, engine_options
 from src.models.trip import Trip
+from src.models.import_batch import ImportBatch
 from src.extensions import db
+from src.services.rollups import refresh_rollups
+from src.services.sampling import refresh_samples
+from src.services.distributions import refresh_distributions, distributions_path, load_distribution_file
+from src.services.dataset_version import bump_dataset_version
+from src.services.columnar import write_snapshot
+from src.services.partitions import ensure_month_partitions
+from src.services.trip_loader import copy_csv, read_csv_header, TripSink, IMPORT_FIELDS
+from src.services.checkpoint import (Checkpoint, manifest_path, committed_spans, pending_spans,
+                                     merge_spans, committed_prefix, check_resumable, imported_window)
+from src.etl_steps.loader import iter_parquet_in_chunks, parquet_columns
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -61,17 +75,26 @@ def row_to_trip_dict(row):
         "fare_per_km": safe_float(row.get("fare_per_km", "")),
         "pickup_hour": safe_int(row.get("pickup_hour", "")),
         "day_of_week": safe_int(row.get("day_of_week", "")),
+        "pickup_cell_d1": safe_int(row.get("pickup_cell_d1", "")),
+        "pickup_cell_d2": safe_int(row.get("pickup_cell_d2", "")),
+        "pickup_cell_d3": safe_int(row.get("pickup_cell_d3", "")),
+        "dropoff_cell_d1": safe_int(row.get("dropoff_cell_d1", "")),
+        "dropoff_cell_d2": safe_int(row.get("dropoff_cell_d2", "")),
+        "dropoff_cell_d3": safe_int(row.get("dropoff_cell_d3", "")),
     }
 
 
-def bulk_insert(session, rows):
+def bulk_insert(session, rows, batch=None):
     """
     session: SQLAlchemy session
     rows: list of dicts mapping Trip fields
+    batch: optional import ledger row committed in the same transaction
     Use SQLAlchemy bulk_insert_mappings for speed.
     """
     try:
         session.bulk_insert_mappings(Trip, rows)
+        if batch is not None:
+            session.bulk_insert_mappings(ImportBatch, [batch])
         session.commit()
         logger.info(f"Successfully inserted {len(rows)} rows")
     except Exception as e:
@@ -80,46 +103,248 @@ def bulk_insert(session, rows):
         raise
 
 
-def main(csv_path, batch_size=5000, db_url=None):
+def insert_csv(session, csv_path, batch_size, source=None, spans=None, on_commit=None):
+    """
+    Portable path: parse rows in Python and insert with bulk_insert_mappings.
+    Batches are tracked by byte offset so each one commits with an import
+    ledger row keyed on `source`; `spans` limits the load to those byte
+    spans and on_commit(start, stop, rows) runs after every batch.
+    Returns (rows inserted, first pickup, last pickup).
+    """
+    total = 0
+    first_pickup = None
+    last_pickup = None
+    header, data_start = read_csv_header(csv_path)
+    if spans is None:
+        spans = [(data_start, os.path.getsize(csv_path))]
+
+    def flush(batch, start, stop):
+        nonlocal total, first_pickup, last_pickup
+        pickups = [t["pickup_datetime"] for t in batch if t["pickup_datetime"] is not None]
+        lo, hi = (min(pickups), max(pickups)) if pickups else (None, None)
+        ledger = None
+        if source is not None:
+            ledger = {
+                "source": source, "unit": "bytes", "start_offset": start, "end_offset": stop,
+                "rows": len(batch), "first_pickup": lo, "last_pickup": hi,
+            }
+        ensure_month_partitions(session.get_bind(), lo, hi)
+        bulk_insert(session, batch, ledger)
+        total += len(batch)
+        if lo is not None:
+            first_pickup = lo if first_pickup is None else min(first_pickup, lo)
+            last_pickup = hi if last_pickup is None else max(last_pickup, hi)
+        if on_commit is not None:
+            on_commit(start, stop, len(batch))
+
+    with open(csv_path, 'rb') as f:
+        for span_start, span_stop in spans:
+            f.seek(span_start)
+            offset = batch_start = span_start
+            batch = []
+            while offset < span_stop:
+                line = f.readline()
+                if not line:
+                    break
+                offset += len(line)
+                values = next(csv.reader([line.decode('utf-8')]), None)
+                if values:
+                    batch.append(row_to_trip_dict(dict(zip(header, values))))
+                if len(batch) >= batch_size:
+                    flush(batch, batch_start, offset)
+                    logger.info(f"Inserted {total} rows so far...")
+                    batch, batch_start = [], offset
+
+            # Insert remaining rows of the span
+            if batch_start < offset:
+                flush(batch, batch_start, offset)
+                logger.info(f"Inserted final batch. Total: {total} rows")
+
+    return total, first_pickup, last_pickup
+
+
+def load_parquet(engine, path, batch_size, start_date=None, end_date=None, source=None, skip_rows=0,
+                 on_commit=None):
+    """
+    Typed path for the partitioned parquet ETL output: reads only the
+    partitions in [start_date, end_date] and the Trip columns, and writes
+    them through TripSink without any per-field parsing. Batches are
+    tracked by row offset in read order and committed with a ledger row
+    keyed on `source`; the first skip_rows rows are skipped.
+    Returns (rows inserted, first pickup, last pickup).
+    """
+    columns = [f for f in IMPORT_FIELDS if f in parquet_columns(path)]
+    sink = TripSink(engine)
+    total = 0
+    offset = 0
+    first_pickup = None
+    last_pickup = None
+    try:
+        for df in iter_parquet_in_chunks(path, chunksize=batch_size, start_date=start_date,
+                                         end_date=end_date, columns=columns):
+            start, offset = offset, offset + len(df)
+            if offset <= skip_rows:
+                continue
+            if start < skip_rows:
+                df = df.iloc[skip_rows - start:]
+                start = skip_rows
+            batch = (source, "rows", start, offset) if source is not None else None
+            total += sink.write(df, batch)
+            if on_commit is not None:
+                on_commit(start, offset, len(df))
+            lo, hi = df['pickup_datetime'].min(), df['pickup_datetime'].max()
+            first_pickup = lo if first_pickup is None else min(first_pickup, lo)
+            last_pickup = hi if last_pickup is None else max(last_pickup, hi)
+            logger.info(f"Inserted {total} rows so far...")
+    finally:
+        sink.close()
+    return total, first_pickup, last_pickup
+
+
+def main(csv_path, batch_size=5000, db_url=None, update_rollups=True, mode="auto", workers=1,
+         start_date=None, end_date=None, resume=False, checkpoint_path=None, snapshot_dir=None,
+         copy_batch_bytes=Config.COPY_BATCH_BYTES):
+    """
+    mode: "copy" streams the file with PostgreSQL COPY in `copy_batch_bytes`
+    ranges (optionally spread over `workers` connections), "insert" uses bulk_insert_mappings, "auto" picks
+    copy on PostgreSQL and insert elsewhere (e.g. SQLite).
+    A directory path is read as the partitioned parquet ETL output, limited
+    to pickup dates start_date..end_date when given.
+    Every batch commits with an import_batches ledger row keyed on the file
+    fingerprint and offsets, and a checkpoint manifest (default
+    <csv_path>.import-checkpoint.json) is saved after it. resume=True loads
+    only what the ledger does not already hold; without it a file that was
+    (partly) imported before is refused, so trips are never loaded twice.
+    With snapshot_dir the columnar snapshot is rewritten once the data is in.
+    Distribution sketches come from the file the ETL wrote next to the
+    input where it covers a day's trips, and are recomputed otherwise.
+    """
     if db_url is None:
         db_url = Config.SQLALCHEMY_DATABASE_URI
 
     logger.info(f"Connecting to database: {db_url}")
-    engine = create_engine(db_url)
+    # one pooled connection per COPY worker; pool options only apply to PostgreSQL
+    engine = create_engine(db_url, **engine_options({
+        "SQLALCHEMY_DATABASE_URI": db_url,
+        "DB_POOL_SIZE": max(5, workers),
+        "DB_MAX_OVERFLOW": Config.DB_MAX_OVERFLOW,
+    }))
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    total = 0
-    batch = []
+    if mode == "auto":
+        mode = "copy" if engine.dialect.name == "postgresql" else "insert"
+    if mode == "copy" and engine.dialect.name != "postgresql":
+        raise ValueError(f"COPY import needs PostgreSQL, not {engine.dialect.name}")
+
+    logger.info(f"Reading CSV from: {csv_path} (mode={mode}, workers={workers})")
 
-    logger.info(f"Reading CSV from: {csv_path}")
+    is_parquet = os.path.isdir(csv_path)
+    checkpoint = Checkpoint(checkpoint_path or manifest_path(csv_path, "import"), csv_path)
+    # a parquet source is only the same batch sequence for the same date filter
+    source = checkpoint.fingerprint
+    if is_parquet and (start_date or end_date):
+        source = hashlib.sha1(f"{source}:{start_date}:{end_date}".encode("utf-8")).hexdigest()
+        checkpoint.fingerprint = source
+    unit = "rows" if is_parquet else "bytes"
+    with engine.connect() as connection:
+        committed = committed_spans(connection, source, unit)
+        rows_before = imported_window(connection, source, unit)[0] or 0
+    check_resumable(committed, csv_path, resume)
+    saved = checkpoint.load() if resume else {}
+    if committed:
+        logger.info(f"Resuming import of {csv_path}: {len(committed)} batches ({rows_before} rows) already "
+                    f"committed; checkpoint at offset {saved.get('offset', 0)}")
+
+    data_start = 0 if is_parquet else read_csv_header(csv_path)[1]
+    progress = {"rows": rows_before, "done": merge_spans(committed)}
+    checkpoint.state = {"mode": mode, "unit": unit}
+
+    def on_commit(start, stop, rows):
+        progress["rows"] += rows
+        progress["done"] = merge_spans(progress["done"] + [(start, stop)])
+        checkpoint.save(offset=committed_prefix(progress["done"], data_start), committed=progress["done"],
+                        rows_written=progress["rows"], complete=False)
 
     try:
-        with open(csv_path, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                trip = row_to_trip_dict(row)
-                batch.append(trip)
-                if len(batch) >= batch_size:
-                    bulk_insert(session, batch)
-                    total += len(batch)
-                    logger.info(f"Inserted {total} rows so far...")
-                    batch = []
+        started = time.perf_counter()
+        if is_parquet:
+            mode = "parquet"
+            total, first_pickup, last_pickup = load_parquet(
+                engine, csv_path, batch_size, start_date, end_date,
+                source=source, skip_rows=committed_prefix(committed), on_commit=on_commit)
+        else:
+            spans = pending_spans(committed, data_start, os.path.getsize(csv_path))
+            if mode == "copy":
+                total, first_pickup, last_pickup = copy_csv(engine, csv_path, workers=workers, source=source,
+                                                            spans=spans, on_commit=on_commit,
+                                                            batch_bytes=copy_batch_bytes)
+            else:
+                total, first_pickup, last_pickup = insert_csv(session, csv_path, batch_size, source=source,
+                                                              spans=spans, on_commit=on_commit)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Loaded {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec, mode={mode})")
+        checkpoint.save(rows_written=progress["rows"], complete=True)
 
-            # Insert remaining rows
-            if batch:
-                bulk_insert(session, batch)
-                total += len(batch)
-                logger.info(f"Inserted final batch. Total: {total} rows")
+        if committed:
+            # cover the days loaded by earlier, interrupted runs as well
+            with engine.connect() as connection:
+                _, first_pickup, last_pickup = imported_window(connection, source, unit)
+
+        # Re-aggregate the rollup, sample and distribution tables for the days this file touched
+        refreshed = update_rollups and first_pickup is not None
+        if refreshed:
+            refresh_rollups(session, first_pickup.date(), last_pickup.date())
+            refresh_samples(session, first_pickup.date(), last_pickup.date(),
+                            fraction=Config.SAMPLE_FRACTION, min_rows=Config.SAMPLE_MIN_ROWS)
+            # the ETL writes the day sketches of its output next to it
+            sketches = distributions_path(csv_path)
+            if os.path.exists(sketches):
+                for day in load_distribution_file(session, sketches, first_pickup.date(), last_pickup.date()):
+                    refresh_distributions(session, day, day)
+            else:
+                refresh_distributions(session, first_pickup.date(), last_pickup.date())
+
+        # invalidate cached API responses; a resumed run that finds every
+        # batch committed still has to publish the rows of the crashed one
+        if progress["rows"] or refreshed:
+            version = bump_dataset_version(engine)
+            if snapshot_dir:
+                write_snapshot(engine, snapshot_dir, version)
 
         logger.info("Import complete.")
     except Exception as e:
         logger.error(f"Error during import: {e}")
+        if progress["rows"] > rows_before:
+            # the batches committed before the failure are already served
+            bump_dataset_version(engine)
         raise
     finally:
         session.close()
 
 
 if __name__ == "__main__":
-    csv_path = sys.argv[1] if len(sys.argv) > 1 else "data/processed/trips_cleaned.csv"
-    main(csv_path)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", help="Path to processed CSV or parquet directory",
+                        default="data/processed/trips_cleaned.csv")
+    parser.add_argument("--mode", choices=["auto", "copy", "insert"], default="auto",
+                        help="copy = PostgreSQL COPY FROM STDIN, insert = bulk_insert_mappings")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel COPY connections (copy mode)")
+    parser.add_argument("--batch-size", type=int, default=Config.BATCH_SIZE, help="Rows per insert batch (insert mode)")
+    parser.add_argument("--copy-batch-bytes", type=int, default=Config.COPY_BATCH_BYTES,
+                        help="Bytes of CSV per committed COPY batch (copy mode)")
+    parser.add_argument("--db-url", help="Database URL", default=None)
+    parser.add_argument("--no-rollups", action="store_true", help="Skip refreshing the rollup, sample and distribution tables")
+    parser.add_argument("--start-date", help="First pickup date to load from parquet input (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last pickup date to load from parquet input (YYYY-MM-DD)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted import, skipping batches already committed")
+    parser.add_argument("--checkpoint", help="Checkpoint manifest path (default <csv>.import-checkpoint.json)",
+                        default=None)
+    parser.add_argument("--snapshot-dir", default=Config.COLUMNAR_SNAPSHOT_DIR,
+                        help="Rewrite the columnar snapshot in this directory after the import")
+    args = parser.parse_args()
+    main(args.csv, batch_size=args.batch_size, db_url=args.db_url, update_rollups=not args.no_rollups,
+         mode=args.mode, workers=args.workers, start_date=args.start_date, end_date=args.end_date,
+         resume=args.resume, checkpoint_path=args.checkpoint, snapshot_dir=args.snapshot_dir,
+         copy_batch_bytes=args.copy_batch_bytes)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory (project root) to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.config import Config
+from src.services.rollups import rebuild_all_rollups
+from src.services.sampling import rebuild_all_samples
+from src.services.distributions import rebuild_all_distributions
+from src.services.dataset_version import bump_dataset_version
+from src.services.columnar import write_snapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the trip rollup, sample and distribution tables from the trips table")
+    parser.add_argument("--db-url", help="Database URL", default=Config.SQLALCHEMY_DATABASE_URI)
+    parser.add_argument("--snapshot-dir", default=Config.COLUMNAR_SNAPSHOT_DIR,
+                        help="Rewrite the columnar snapshot in this directory afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    session = sessionmaker(bind=engine)()
+    try:
+        rebuild_all_rollups(session)
+        rebuild_all_samples(session, fraction=Config.SAMPLE_FRACTION, min_rows=Config.SAMPLE_MIN_ROWS)
+        rebuild_all_distributions(session)
+    finally:
+        session.close()
+    version = bump_dataset_version(engine)
+    if args.snapshot_dir:
+        write_snapshot(engine, args.snapshot_dir, version)
+    logger.info("Rollup rebuild complete.")
+
+
+if __name__ == "__main__":
+    main()
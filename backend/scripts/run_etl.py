@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
+import time
 import argparse
 import logging
+import tracemalloc
 
 # Add the parent directory (project root) to Python path
 # This allows us to import from 'src' as an absolute import
@@ -10,7 +13,15 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
 # Now use absolute imports
-from src.services.etl import run_etl_from_csv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.services.etl import run_etl_from_csv, run_etl_to_db
+from src.etl_steps.profiling import StageProfiler
+from src.services.rollups import refresh_rollups
+from src.services.sampling import refresh_samples
+from src.services.distributions import refresh_distributions
+from src.services.dataset_version import bump_dataset_version
+from src.services.columnar import write_snapshot
 from src.config import Config
 
 logging.basicConfig(level=logging.INFO)
@@ -19,11 +30,87 @@ logger = logging.getLogger(__name__)
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--csv", help="Path to raw CSV", required=True)
-    parser.add_argument("--out", help="Path output processed CSV", default="data/processed/trips_cleaned.csv")
+    parser.add_argument("--out", help="Path output processed CSV (or parquet directory)", default=None)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="parquet writes a directory partitioned by pickup date")
+    parser.add_argument("--to-db", action="store_true",
+                        help="Load cleaned chunks straight into the database instead of writing --out")
+    parser.add_argument("--db-url", help="Database URL for --to-db", default=Config.SQLALCHEMY_DATABASE_URI)
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="Transformed chunks buffered between transform and load (--to-db)")
+    parser.add_argument("--workers", type=int, default=Config.ETL_WORKERS,
+                        help="Processes used to clean and enrich chunks in parallel")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Chunks submitted to the pool but not yet written (default 2 x workers)")
+    parser.add_argument("--typed", action=argparse.BooleanOptionalAction, default=Config.CSV_TYPED,
+                        help="Read the raw CSV with compact dtypes and parsed datetimes "
+                             "(default from CSV_TYPED; --no-typed overrides it)")
+    parser.add_argument("--prune-columns", action="store_true",
+                        help="With --typed, skip raw columns no ETL step uses")
+    parser.add_argument("--csv-engine", choices=["c", "pyarrow"], default=Config.CSV_ENGINE,
+                        help="CSV parser used with --typed")
+    parser.add_argument("--quarantine", default=None,
+                        help="Append rejected rows with a reject_reason column to this CSV (or .parquet) file")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint manifest")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint manifest path (default next to --out, or to --csv with --to-db)")
+    parser.add_argument("--snapshot-dir", default=Config.COLUMNAR_SNAPSHOT_DIR,
+                        help="With --to-db, rewrite the columnar snapshot in this directory afterwards")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every ETL stage per chunk and report rows/sec and max RSS per stage")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="With --profile, also trace each stage's peak allocations (much slower)")
+    parser.add_argument("--profile-report", default=None,
+                        help="JSON profile path (default <out>.profile.json, or <csv>.profile.json with --to-db)")
     args = parser.parse_args()
+    read_options = {"typed": args.typed, "prune_columns": args.prune_columns, "engine": args.csv_engine}
+    if args.out is None:
+        args.out = "data/processed/trips_parquet" if args.format == "parquet" else "data/processed/trips_cleaned.csv"
     chunksize = Config.CHUNK_SIZE
-    logger.info(f"Starting ETL: {args.csv} -> {args.out} with chunksize={chunksize}")
-    run_etl_from_csv(args.csv, args.out, chunksize=chunksize)
+    profiler = StageProfiler(trace_memory=args.profile_memory) if args.profile else None
+    if profiler is not None and profiler.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    if args.to_db:
+        logger.info(f"Starting ETL: {args.csv} -> database with chunksize={chunksize}")
+        engine = create_engine(args.db_url)
+        rows, first_pickup, last_pickup = run_etl_to_db(
+            args.csv, engine, chunksize=chunksize, queue_size=args.queue_size,
+            workers=args.workers, max_in_flight=args.max_in_flight, read_options=read_options,
+            quarantine_path=args.quarantine, resume=args.resume, checkpoint_path=args.checkpoint,
+            profiler=profiler)
+        if first_pickup is not None:
+            session = sessionmaker(bind=engine)()
+            try:
+                refresh_rollups(session, first_pickup.date(), last_pickup.date())
+                refresh_samples(session, first_pickup.date(), last_pickup.date(),
+                                fraction=Config.SAMPLE_FRACTION, min_rows=Config.SAMPLE_MIN_ROWS)
+                refresh_distributions(session, first_pickup.date(), last_pickup.date())
+            finally:
+                session.close()
+        version = bump_dataset_version(engine)
+        if args.snapshot_dir:
+            write_snapshot(engine, args.snapshot_dir, version)
+    else:
+        logger.info(f"Starting ETL: {args.csv} -> {args.out} with chunksize={chunksize}, workers={args.workers}")
+        run_etl_from_csv(args.csv, args.out, chunksize=chunksize,
+                         workers=args.workers, max_in_flight=args.max_in_flight,
+                         output_format=args.format, read_options=read_options,
+                         quarantine_path=args.quarantine, resume=args.resume,
+                         checkpoint_path=args.checkpoint, profiler=profiler)
+    if profiler is not None:
+        if profiler.trace_memory:
+            tracemalloc.stop()
+        report_path = args.profile_report or f"{args.csv if args.to_db else args.out.rstrip(os.sep)}.profile.json"
+        report = profiler.report(
+            time.perf_counter() - started, csv_path=args.csv, output="database" if args.to_db else args.out,
+            output_format=args.format, chunksize=chunksize, workers=args.workers, read_options=read_options)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(profiler.format_table())
+        logger.info(f"Wall time {report['wall_seconds']:.1f}s; profile written to {report_path}")
     logger.info("ETL complete.")
 
 if __name__ == "__main__":
@@ -1,83 +1,237 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import func
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import tuple_
+from src.extensions import db
 from src.models.trip import Trip
-from src.services_custom.top_k_hotspots import top_k_hotspots
+from src.services.rollups import parse_window, filter_window, midnight
+from src.services.trip_stats import hourly_stats, summary_stats, hotspot_stats, flow_stats, timeseries_stats, heatmap_stats
+from src.services.dataset_version import current_dataset_version
+from src.services.sampling import sample_summary_stats, sample_hourly_stats, estimated_window_rows
+from src.services.distributions import distribution_stats, DistributionsMissing, DEFAULT_QUANTILES
+from src.services.concurrent_queries import run_concurrently, QueryTimeout
 
 trips_bp = Blueprint('trips', __name__)
 
+
+class InvalidWindow(Exception):
+    """
+    The start/end query args are not ISO datetimes; answered with a 400.
+    """
+
+
+@trips_bp.errorhandler(InvalidWindow)
+def _invalid_window(e):
+    return jsonify({"error": "Invalid date", "message": str(e)}), 400
+
+
+def _window(whole_days=False):
+    """
+    (start, end) query args of the trip endpoints; raises InvalidWindow.
+    With `whole_days` (endpoints answered from daily aggregates) both must
+    be dates, and `end` stands for that whole day.
+    """
+    try:
+        start, end = parse_window(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        raise InvalidWindow(str(e)) from e
+    if whole_days and any(bound is not None and bound != midnight(bound.date()) for bound in (start, end)):
+        raise InvalidWindow("this endpoint aggregates whole days; start and end must be dates (YYYY-MM-DD)")
+    return start, end
+
+
+def _dataset_version():
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        return current_dataset_version(db.session)
+    return cache.dataset_version(lambda: current_dataset_version(db.session))
+
+
+def _columnar_snapshot():
+    """
+    The memory-mapped columnar snapshot when USE_COLUMNAR is on and the
+    snapshot is at the current dataset version, else None (answer from SQL).
+    """
+    store = current_app.extensions.get('columnar')
+    if store is None:
+        return None
+    return store.snapshot(_dataset_version())
+
+
+def _approx_mode():
+    """
+    The `approx` query arg: True/False when given, None to decide per window.
+    """
+    approx = request.args.get('approx')
+    if approx is None:
+        return None
+    return approx.lower() in ('true', '1', 'yes')
+
+
+def _answer_approximately(approx, start, end, snapshot):
+    """
+    approx=true always uses the sample; without the arg it is used when no
+    columnar snapshot is loaded and the window spans more than
+    APPROX_ROW_THRESHOLD trips.
+    """
+    if approx is not None:
+        return approx
+    threshold = current_app.config.get('APPROX_ROW_THRESHOLD', 0)
+    return snapshot is None and threshold > 0 and estimated_window_rows(start, end) > threshold
+
+
+def _summary_data(start, end, approx, use_rollups):
+    snapshot = _columnar_snapshot()
+    if _answer_approximately(approx, start, end, snapshot):
+        stats = sample_summary_stats(start, end)
+        if stats is not None:
+            return stats
+    if snapshot is not None:
+        return snapshot.summary(start, end)
+    return summary_stats(start, end, use_rollups=use_rollups)
+
+
+def _hourly_data(start, end, approx, use_rollups):
+    snapshot = _columnar_snapshot()
+    if _answer_approximately(approx, start, end, snapshot):
+        stats = sample_hourly_stats(start, end)
+        if stats is not None:
+            return stats
+    if snapshot is not None:
+        return snapshot.hourly(start, end)
+    return hourly_stats(start, end, use_rollups=use_rollups)
+
+
+def _hotspot_data(start, end, k, resolution):
+    snapshot = _columnar_snapshot()
+    if snapshot is not None:
+        return snapshot.hotspots(start, end, k=k, cell_size_deg=resolution)
+    return hotspot_stats(start, end, k=k, cell_size_deg=resolution)
+
+
+def _hotspot_args():
+    """
+    (k, resolution) query args of the hotspot endpoints; raises ValueError.
+    """
+    k = request.args.get('k', type=int, default=10)
+    # grid cell size in degrees: 0.1 (city-wide), 0.01 or 0.001 (block level)
+    resolution = request.args.get('resolution', type=float, default=0.01)
+    if resolution <= 0:
+        raise ValueError("resolution must be positive")
+    return k, resolution
+
+
+def _cached_json(key, build):
+    """
+    JSON response for build(), served from the response cache when an entry
+    for `key` (endpoint plus normalized args) exists at the current dataset
+    version. Always carries a content ETag, so If-None-Match gets a 304.
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        response = jsonify(build())
+        response.add_etag()
+        return response.make_conditional(request)
+
+    key = key + (_dataset_version(),)
+    entry = cache.get(key)
+    if entry is None:
+        entry = cache.put(key, jsonify(build()).get_data())
+    body, etag = entry
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def _encode_cursor(pickup_datetime, trip_id):
+    raw = f"{pickup_datetime.isoformat()}|{trip_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    pickup, trip_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(pickup), int(trip_id)
+
+
 @trips_bp.route('', methods=['GET'])
 def list_trips():
     """
-    Simple listing endpoint with filters:
+    Listing endpoint with filters, ordered by (pickup_datetime, id):
     - start, end: ISO datetimes for pickup
     - min_distance, max_distance
-    - limit: number
+    - limit: page size (max 1000)
+    - cursor: value of the X-Next-Cursor header from the previous page
+    - fields: comma separated subset of Trip.API_FIELDS to select
+    - format=ndjson: stream every matching row as newline-delimited JSON
     """
-    start = request.args.get('start')   # ISO datetime string
-    end = request.args.get('end')
+    start, end = _window()
+    try:
+        after = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        return jsonify({"error": "Invalid cursor", "message": str(e)}), 400
     min_distance = request.args.get('min_distance', type=float)
     max_distance = request.args.get('max_distance', type=float)
-    limit = request.args.get('limit', type=int, default=100)
+    limit = request.args.get('limit', type=int)
+
+    fields = Trip.API_FIELDS
+    if request.args.get('fields'):
+        fields = tuple(f.strip() for f in request.args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in Trip.API_FIELDS]
+        if unknown or not fields:
+            return jsonify({"error": "Invalid fields", "message": f"Unknown fields: {unknown}"}), 400
 
-    q = Trip.query
-    if start:
-        q = q.filter(Trip.pickup_datetime >= start)
-    if end:
-        q = q.filter(Trip.pickup_datetime <= end)
+    # cursor columns are always selected, even if not returned
+    selected = list(dict.fromkeys(fields + ("pickup_datetime", "id")))
+    q = Trip.query.with_entities(*[getattr(Trip, f) for f in selected])
+    q = filter_window(q, Trip.pickup_datetime, start, end)
     if min_distance is not None:
         q = q.filter(Trip.trip_distance >= min_distance)
     if max_distance is not None:
         q = q.filter(Trip.trip_distance <= max_distance)
+    if after is not None:
+        # row-value comparison keeps the seek on the pickup_datetime index;
+        # the plain bound lets the planner prune earlier month partitions
+        q = q.filter(Trip.pickup_datetime >= after[0])
+        q = q.filter(tuple_(Trip.pickup_datetime, Trip.id) > tuple_(*after))
+    q = q.order_by(Trip.pickup_datetime, Trip.id)
 
-    results = q.limit(min(limit, 1000)).all()
-    data = [r.to_dict() for r in results]
-    return jsonify(data)
+    if request.args.get('format') == 'ndjson':
+        if limit is not None:
+            q = q.limit(limit)
+
+        def generate():
+            # yield_per streams from a server-side cursor on PostgreSQL
+            for row in q.yield_per(1000):
+                yield json.dumps(Trip.row_to_dict(row, fields)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    page_size = min(limit if limit is not None else 100, 1000)
+    rows = q.limit(page_size).all()
+    response = jsonify([Trip.row_to_dict(r, fields) for r in rows])
+    if len(rows) == page_size and rows:
+        response.headers['X-Next-Cursor'] = _encode_cursor(rows[-1].pickup_datetime, rows[-1].id)
+    return response
 
 @trips_bp.route('/summary', methods=['GET'])
 def summary():
     """
-    Return simple aggregates over pickups in a time window
+    Return simple aggregates over pickups in a time window.
+    approx=true (or a window over APPROX_ROW_THRESHOLD trips) estimates them
+    from the stratified sample, with confidence intervals and sample size.
     """
+    start, end = _window()
+
+    use_rollups = current_app.config.get('USE_ROLLUPS', False)
+    approx = _approx_mode()
     try:
-        # Log request details for debugging
-        print(f"Summary API called with args: {dict(request.args)}")
-        
-        start = request.args.get('start')
-        end = request.args.get('end')
-        
-        # Log parsed date values
-        print(f"Date range: start={start}, end={end}")
-        
-        q = Trip.query
-        if start:
-            q = q.filter(Trip.pickup_datetime >= start)
-        if end:
-            q = q.filter(Trip.pickup_datetime <= end)
-
-        # Count query - catch and log any DB errors
-        try:
-            total_trips = q.count()
-        except Exception as e:
-            print(f"Error in count query: {str(e)}")
-            return jsonify({"error": "Database error", "message": str(e)}), 500
-
-        # Average queries
-        avg_distance = q.with_entities(func.avg(Trip.trip_distance)).scalar() or 0
-        avg_fare = q.with_entities(func.avg(Trip.fare_amount)).scalar() or 0
-        avg_speed = q.with_entities(func.avg(Trip.average_speed_kmph)).scalar() or 0
-
-        # Return the data
-        response_data = {
-            "total_trips": total_trips,
-            "avg_distance": float(avg_distance),
-            "avg_fare": float(avg_fare),
-            "avg_speed_kmph": float(avg_speed)
-        }
-        print(f"Summary response: {response_data}")
-        return jsonify(response_data)
-        
+        return _cached_json(('summary', start, end, use_rollups, approx),
+                            lambda: _summary_data(start, end, approx, use_rollups))
     except Exception as e:
-        print(f"Unexpected error in summary endpoint: {str(e)}")
+        current_app.logger.error(f"Error in summary endpoint: {str(e)}", exc_info=True)
         return jsonify({
             "error": "Server error",
             "message": str(e),
@@ -97,52 +251,122 @@ def get_hotspots():
     """
     Return the top K pickup hotspots
     """
-    start = request.args.get('start')
-    end = request.args.get('end')
-    k = request.args.get('k', type=int, default=10)
-    
-    q = Trip.query
-    if start:
-        q = q.filter(Trip.pickup_datetime >= start)
-    if end:
-        q = q.filter(Trip.pickup_datetime <= end)
-    
-    # Limit to avoid memory issues
-    trips = q.limit(10000).all()
-    trip_dicts = [t.to_dict() for t in trips]
-    hotspots = top_k_hotspots(trip_dicts, k=k)
-    
-    return jsonify(hotspots)
+    start, end = _window()
+    try:
+        k, resolution = _hotspot_args()
+    except ValueError as e:
+        return jsonify({"error": "Invalid resolution", "message": str(e)}), 400
+
+    return _cached_json(('hotspots', start, end, k, resolution),
+                        lambda: _hotspot_data(start, end, k, resolution))
 
 @trips_bp.route('/hourly', methods=['GET'])
 def get_hourly_stats():
     """
-    Return hourly trip count and average speeds
-    """
-    start = request.args.get('start')
-    end = request.args.get('end')
-    
-    q = Trip.query
-    if start:
-        q = q.filter(Trip.pickup_datetime >= start)
-    if end:
-        q = q.filter(Trip.pickup_datetime <= end)
-    
-    hours = list(range(24))
-    trips_by_hour = []
-    speeds_by_hour = []
-    
-    for hour in hours:
-        hour_trips = q.filter(Trip.pickup_hour == hour).count()
-        trips_by_hour.append(hour_trips)
-        
-        avg_speed = q.filter(Trip.pickup_hour == hour).with_entities(
-            func.avg(Trip.average_speed_kmph)
-        ).scalar() or 0
-        speeds_by_hour.append(float(avg_speed))
-    
-    return jsonify({
-        "hours": hours,
-        "trips": trips_by_hour,
-        "speeds": speeds_by_hour
-    })
+    Return hourly trip count and average speeds (approx as for /summary)
+    """
+    start, end = _window()
+
+    use_rollups = current_app.config.get('USE_ROLLUPS', False)
+    approx = _approx_mode()
+    return _cached_json(('hourly', start, end, use_rollups, approx),
+                        lambda: _hourly_data(start, end, approx, use_rollups))
+
+
+@trips_bp.route('/timeseries', methods=['GET'])
+def get_timeseries():
+    """
+    Return trip count and average fare, distance and speed per pickup time
+    bucket: bucket=5min, hour (default), day or week (Monday based). Empty
+    buckets in the window are included with zeros.
+    """
+    start, end = _window()
+
+    bucket = request.args.get('bucket', 'hour')
+    max_buckets = current_app.config.get('TIMESERIES_MAX_BUCKETS')
+    try:
+        return _cached_json(('timeseries', start, end, bucket),
+                            lambda: timeseries_stats(start, end, bucket=bucket, max_buckets=max_buckets))
+    except ValueError as e:
+        return jsonify({"error": "Invalid bucket", "message": str(e)}), 400
+
+@trips_bp.route('/heatmap', methods=['GET'])
+def get_heatmap():
+    """
+    Return trip counts per weekday (rows, Monday first) and pickup hour
+    """
+    start, end = _window()
+
+    return _cached_json(('heatmap', start, end), lambda: heatmap_stats(start, end))
+
+@trips_bp.route('/distribution', methods=['GET'])
+def get_distribution():
+    """
+    Return count, mean, min/max, percentiles and a fixed-bin histogram per
+    metric, merged from the daily sketches (404 when the window has trips
+    but the sketches were never built):
+    - start, end: dates, both days included (400 for a time of day)
+    - metrics: comma separated subset of fare_amount, trip_distance,
+      trip_duration, average_speed_kmph, fare_per_km (default all)
+    - quantiles: comma separated values in [0, 1] (default p1..p99)
+    """
+    start, end = _window(whole_days=True)
+
+    try:
+        metrics = tuple(m.strip() for m in request.args.get('metrics', '').split(',') if m.strip())
+        quantiles = DEFAULT_QUANTILES
+        if request.args.get('quantiles'):
+            quantiles = tuple(float(q) for q in request.args['quantiles'].split(',') if q.strip())
+        return _cached_json(('distribution', start, end, metrics, quantiles),
+                            lambda: distribution_stats(start, end, metrics=metrics, quantiles=quantiles))
+    except ValueError as e:
+        return jsonify({"error": "Invalid metrics or quantiles", "message": str(e)}), 400
+    except DistributionsMissing as e:
+        return jsonify({"error": "Distributions not built", "message": str(e)}), 404
+
+@trips_bp.route('/flows', methods=['GET'])
+def get_flows():
+    """
+    Return the top K origin -> destination grid cell flows with their trip
+    count and average duration, fare and speed; resolution 0.1 or 0.01.
+    The flow rollup is daily, so start and end are dates, both days
+    included (400 for a time of day).
+    """
+    start, end = _window(whole_days=True)
+    try:
+        k, resolution = _hotspot_args()
+        return _cached_json(('flows', start, end, k, resolution),
+                            lambda: flow_stats(start, end, k=k, cell_size_deg=resolution))
+    except ValueError as e:
+        return jsonify({"error": "Invalid resolution", "message": str(e)}), 400
+
+@trips_bp.route('/dashboard', methods=['GET'])
+def dashboard():
+    """
+    Summary, hourly stats and hotspots for one window in a single response.
+    Accepts the args of the three endpoints (start, end, approx, k,
+    resolution); the three aggregations run concurrently on separate pooled
+    connections, each limited to DASHBOARD_QUERY_TIMEOUT seconds.
+    """
+    start, end = _window()
+    try:
+        k, resolution = _hotspot_args()
+    except ValueError as e:
+        return jsonify({"error": "Invalid resolution", "message": str(e)}), 400
+
+    use_rollups = current_app.config.get('USE_ROLLUPS', False)
+    approx = _approx_mode()
+    app = current_app._get_current_object()
+
+    def build():
+        return run_concurrently(app, {
+            "summary": lambda: _summary_data(start, end, approx, use_rollups),
+            "hourly": lambda: _hourly_data(start, end, approx, use_rollups),
+            "hotspots": lambda: _hotspot_data(start, end, k, resolution),
+        }, timeout=current_app.config.get('DASHBOARD_QUERY_TIMEOUT'))
+
+    try:
+        return _cached_json(('dashboard', start, end, use_rollups, approx, k, resolution), build)
+    except QueryTimeout as e:
+        current_app.logger.warning(f"Dashboard timed out: {e}")
+        return jsonify({"error": "Query timeout", "message": str(e)}), 504
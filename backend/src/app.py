@@ -1,62 +1,118 @@
 #!/usr/bin/env python3
-import sys
+import time
+_import_started = time.perf_counter()
+
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sys
+import posixpath
 
+# `python src/app.py` only puts src/ on sys.path; everything imports through the src package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import sys
-from flask import Flask, send_from_directory
-from config import Config
-from extensions import db
+from flask import Flask, Response, request, send_from_directory
+from werkzeug.security import safe_join
+from src.config import Config, engine_options
+from src.extensions import db, response_cache, columnar_store, request_metrics, static_assets
 from src.api.trips import trips_bp
+# every model module, so db.create_all() creates all tables; import_batches is
+# otherwise only imported by the loaders
+from src.models import dataset_version, import_batch, rollup, trip, trip_distribution, trip_sample
+from src.services.startup import StartupTimer, check_schema_revision
+
+_import_seconds = time.perf_counter() - _import_started
 
 
 def create_app(config_class=Config):
-    app = Flask(__name__, static_folder='../frontend', static_url_path='')
-    app.config.from_object(config_class)
+    startup = StartupTimer()
+    startup.record('imports', _import_seconds)
+
+    with startup.phase('config'):
+        # the frontend is served by the routes below, not Flask's static view
+        app = Flask(__name__, static_folder=None)
+        app.config.from_object(config_class)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+        app.extensions['startup'] = startup
 
     # Initialize extensions
-    db.init_app(app)
+    with startup.phase('extensions'):
+        db.init_app(app)
+        response_cache.init_app(app)
+        columnar_store.init_app(app)
+        request_metrics.init_app(app)
+    with startup.phase('static_assets'):
+        static_assets.init_app(app)
 
     # Register blueprints
-    app.register_blueprint(trips_bp, url_prefix='/api/trips')
+    with startup.phase('blueprints'):
+        app.register_blueprint(trips_bp, url_prefix='/api/trips')
 
-    # Create tables if they don't exist
-    with app.app_context():
-        try:
-            db.create_all()
-        except Exception as e:
-            print(f"Database initialization error: {e}")
+    # Development creates missing tables; production schemas come from the
+    # Alembic migrations, so only their revision is checked
+    with startup.phase('schema'), app.app_context():
+        if app.config.get('DB_CREATE_ALL', False):
+            try:
+                db.create_all()
+            except Exception as e:
+                app.logger.error(f"Database initialization error: {e}")
+        else:
+            check_schema_revision(db.engine, app.config['MIGRATIONS_DIR'])
 
     # Serve frontend files
+    frontend_dir = app.config['FRONTEND_DIR']
+
+    def send_asset(path):
+        """
+        The file at `path` under the frontend directory, or None if missing.
+        """
+        if 'static_assets' in app.extensions:
+            asset = static_assets.get(path)
+            return None if asset is None else static_assets.response(asset, request, app.response_class)
+        full_path = safe_join(frontend_dir, path)
+        if full_path is None or not os.path.isfile(full_path):
+            return None
+        return send_from_directory(frontend_dir, path)
+
+    def send_index():
+        response = send_asset('index.html')
+        return ({"error": "Not found"}, 404) if response is None else response
+
     @app.route('/')
     def index():
-        return send_from_directory('../frontend', 'index.html')
-    
+        return send_index()
+
     @app.route('/<path:path>')
     def serve_static(path):
         # Serve static files (JS, CSS, images, etc.)
-        if os.path.exists(os.path.join('../frontend', path)):
-            return send_from_directory('../frontend', path)
-        # If file doesn't exist, return index.html (for SPA routing)
-        return send_from_directory('../frontend', 'index.html')
+        response = send_asset(path)
+        if response is not None:
+            return response
+        # Missing files and API paths are 404s; other paths are SPA routes
+        if path.startswith('api/') or '.' in posixpath.basename(path):
+            return {"error": "Not found"}, 404
+        return send_index()
 
     @app.route('/api/health')
     def health():
         return {"status": "healthy"}
 
+    @app.route('/api/metrics')
+    def metrics():
+        # Prometheus text exposition format
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
     # Error handlers
     @app.errorhandler(Exception)
     def handle_exception(e):
         app.logger.error(f"Unhandled exception: {str(e)}", exc_info=True)
         return {"error": str(e), "type": type(e).__name__}, 500
 
+    app.logger.info(f"App created in {startup.total() * 1000:.0f}ms ({startup.format()})")
     return app
 
 
 if __name__ == '__main__':
     app = create_app()
+    print(f"App ready in {app.extensions['startup'].total():.2f}s ({app.extensions['startup'].format()})")
     print(f"Starting server on http://{Config.HOST}:{Config.PORT}")
     print("Frontend and API available at the same origin - no CORS needed!")
     app.run(
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from logging import getLogger
+from ..services_custom.top_k_hotspots import CELL_RESOLUTIONS, cell_id_layout
+from .profiling import NULL_PROFILER
 
 logger = getLogger(__name__)
 
@@ -9,17 +11,34 @@ logger = getLogger(__name__)
 EPSILON = 1e-6
 
 
-def basic_clean(df: pd.DataFrame):
+# Rejection reasons in rule order; a row is tagged with the first rule it fails
+REJECT_REASONS = (
+    "missing_essential",
+    "non_positive_duration",
+    "invalid_coordinates",
+    "non_positive_distance",
+    "negative_fare",
+    "distance_outlier",
+    "duration_outlier",
+)
+
+
+def basic_clean(df: pd.DataFrame, return_removed=False, profiler=NULL_PROFILER):
     """
-    Apply basic cleaning rules and return cleaned df and a logged DataFrame of removed rows.
+    Apply basic cleaning rules and return the cleaned df, the removed rows and
+    per-reason removed counts.
     Rules:
       - drop rows with missing pickup or dropoff time
       - drop rows with missing trip_duration or non-positive duration
       - drop rows with negative fare (if present)
       - compute parsed datetimes
       - calculate trip_distance from coordinates
+    All rules are evaluated into one reason-coded array and applied with a
+    single filter. Removed rows (with a reject_reason column) are only
+    materialized when return_removed=True; otherwise an empty DataFrame is
+    returned in their place. Each step is timed as a stage of `profiler`.
     """
-    removed = []
+    rows = len(df)
 
     # Standardize column names (attempt common variants)
     rename_map = {}
@@ -33,82 +52,74 @@ def basic_clean(df: pd.DataFrame):
         df = df.rename(columns=rename_map)
 
     # Parse datetimes
-    for col in ['pickup_datetime', 'dropoff_datetime']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    with profiler.stage("parse_datetimes", rows):
+        for col in ['pickup_datetime', 'dropoff_datetime']:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
 
-    # missing essential fields (pickup/dropoff times and duration)
-    mask_missing = df['pickup_datetime'].isna() | df['dropoff_datetime'].isna()
-    if 'trip_duration' in df.columns:
-        mask_missing = mask_missing | df['trip_duration'].isna()
+        # Calculate trip_duration from datetime columns if the source lacks it
+        duration_given = 'trip_duration' in df.columns
+        if not duration_given:
+            df['trip_duration'] = (df['dropoff_datetime'] - df['pickup_datetime']).dt.total_seconds()
 
-    if mask_missing.any():
-        removed.append(("missing_essential", df[mask_missing]))
-        df = df[~mask_missing]
+    # Calculate trip_distance from coordinates using Haversine formula
+    with profiler.stage("haversine", rows):
+        df['trip_distance'] = calculate_distance(
+            df['pickup_latitude'],
+            df['pickup_longitude'],
+            df['dropoff_latitude'],
+            df['dropoff_longitude']
+        )
+
+    # 0 = keep, i + 1 = REJECT_REASONS[i]
+    codes = np.zeros(len(df), dtype=np.int8)
+
+    def flag(reason, build_mask):
+        with profiler.stage(f"mask_{reason}", rows):
+            mask = np.asarray(pd.Series(build_mask(), index=df.index).fillna(False), dtype=bool)
+            codes[(codes == 0) & mask] = REJECT_REASONS.index(reason) + 1
+
+    # missing essential fields (pickup/dropoff times and duration)
+    def missing_essential():
+        mask_missing = df['pickup_datetime'].isna() | df['dropoff_datetime'].isna()
+        if duration_given:
+            mask_missing = mask_missing | df['trip_duration'].isna()
+        return mask_missing
+    flag("missing_essential", missing_essential)
 
     # trip_duration must be > 0
-    if 'trip_duration' in df.columns:
-        mask_nonpos_duration = df['trip_duration'] <= 0
-        if mask_nonpos_duration.any():
-            removed.append(("non_positive_duration", df[mask_nonpos_duration]))
-            df = df[~mask_nonpos_duration]
-    else:
-        # Calculate trip_duration from datetime columns
-        df['trip_duration'] = (df['dropoff_datetime'] - df['pickup_datetime']).dt.total_seconds()
-        mask_nonpos_duration = df['trip_duration'] <= 0
-        if mask_nonpos_duration.any():
-            removed.append(("non_positive_duration", df[mask_nonpos_duration]))
-            df = df[~mask_nonpos_duration]
+    flag("non_positive_duration", lambda: df['trip_duration'] <= 0)
 
-    # Calculate trip_distance from coordinates using Haversine formula
-    df['trip_distance'] = calculate_distance(
-        df['pickup_latitude'],
-        df['pickup_longitude'],
-        df['dropoff_latitude'],
-        df['dropoff_longitude']
-    )
-
-    # Drop rows with invalid coordinates (resulting in NaN distance)
-    mask_invalid_distance = df['trip_distance'].isna()
-    if mask_invalid_distance.any():
-        removed.append(("invalid_coordinates", df[mask_invalid_distance]))
-        df = df[~mask_invalid_distance]
+    # invalid coordinates result in NaN distance
+    flag("invalid_coordinates", lambda: df['trip_distance'].isna())
 
     # trip_distance must be > 0
-    mask_nonpos_dist = df['trip_distance'] <= 0
-    if mask_nonpos_dist.any():
-        removed.append(("non_positive_distance", df[mask_nonpos_dist]))
-        df = df[~mask_nonpos_dist]
+    flag("non_positive_distance", lambda: df['trip_distance'] <= 0)
 
     # negative fares (if fare column exists)
     if 'fare_amount' in df.columns:
-        mask_neg_fare = df['fare_amount'] < 0
-        if mask_neg_fare.any():
-            removed.append(("negative_fare", df[mask_neg_fare]))
-            df = df[~mask_neg_fare]
+        flag("negative_fare", lambda: df['fare_amount'] < 0)
 
     # cap outliers: drop trips with distance > 300 km or duration > 48 hours (tuneable)
-    mask_dist_outlier = df['trip_distance'] > 300
-    if mask_dist_outlier.any():
-        removed.append(("distance_outlier", df[mask_dist_outlier]))
-        df = df[~mask_dist_outlier]
-
-    mask_duration_outlier = df['trip_duration'] > 48 * 3600
-    if mask_duration_outlier.any():
-        removed.append(("duration_outlier", df[mask_duration_outlier]))
-        df = df[~mask_duration_outlier]
-
-    # Reset index
-    df = df.reset_index(drop=True)
-
-    # combine removed reason frames into one for logging
-    removed_df = pd.concat([r[1] for r in removed]) if removed else pd.DataFrame()
-    # return cleaned df and removed_df with reasons
-    reasons = []
-    for reason, frame in removed:
-        reasons.append((reason, frame.shape[0]))
-        logger.info(f"Removed {frame.shape[0]} rows for reason: {reason}")
-
+    flag("distance_outlier", lambda: df['trip_distance'] > 300)
+    flag("duration_outlier", lambda: df['trip_duration'] > 48 * 3600)
+
+    with profiler.stage("apply_filter", rows):
+        keep = codes == 0
+        removed_df = pd.DataFrame()
+        if return_removed and not keep.all():
+            removed_df = df[~keep].assign(
+                reject_reason=np.asarray(REJECT_REASONS)[codes[~keep] - 1]
+            ).reset_index(drop=True)
+
+        reasons = []
+        counts = np.bincount(codes, minlength=len(REJECT_REASONS) + 1)
+        for i, reason in enumerate(REJECT_REASONS):
+            if counts[i + 1]:
+                reasons.append((reason, int(counts[i + 1])))
+                logger.info(f"Removed {counts[i + 1]} rows for reason: {reason}")
+
+        df = df[keep].reset_index(drop=True)
     return df, removed_df, reasons
 
 
@@ -145,10 +156,24 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return distance
 
 
+def calculate_cell_ids(lat, lon, cell_size_deg):
+    """
+    Vectorized coord_to_cell + cell_to_id: packed grid cell ids for
+    coordinate series, as nullable Int64 (missing coordinates -> <NA>).
+    """
+    lat_offset, lon_offset, width = cell_id_layout(cell_size_deg)
+    # float64 for the division and int64 for the packing: ids reach ~1e11,
+    # far beyond what float32 (typed reads) represents exactly
+    ci = np.floor(pd.to_numeric(lat, errors='coerce').astype('float64') / cell_size_deg).astype('Int64')
+    cj = np.floor(pd.to_numeric(lon, errors='coerce').astype('float64') / cell_size_deg).astype('Int64')
+    return (ci + lat_offset) * width + (cj + lon_offset)
+
+
 def advanced_clean_and_enrich(df: pd.DataFrame):
     """
     Derived feature engineering: trip_duration already present.
     Compute average_speed_kmph, fare_per_km, pickup_hour, day_of_week
+    and pickup/dropoff grid cell ids at each resolution in CELL_RESOLUTIONS
     """
     # trip_distance is already in km from calculate_distance
     df['trip_distance_km'] = df['trip_distance']
@@ -175,6 +200,12 @@ def advanced_clean_and_enrich(df: pd.DataFrame):
     df['pickup_hour'] = pd.to_datetime(df['pickup_datetime']).dt.hour
     df['day_of_week'] = pd.to_datetime(df['pickup_datetime']).dt.dayofweek
 
+    for suffix, cell_size_deg in CELL_RESOLUTIONS.items():
+        df[f'pickup_cell_{suffix}'] = calculate_cell_ids(
+            df['pickup_latitude'], df['pickup_longitude'], cell_size_deg)
+        df[f'dropoff_cell_{suffix}'] = calculate_cell_ids(
+            df['dropoff_latitude'], df['dropoff_longitude'], cell_size_deg)
+
     # drop temp helper column trip_duration_hours
     df = df.drop(columns=['trip_duration_hours'])
 
@@ -1,11 +1,190 @@
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
 from logging import getLogger
 
 logger = getLogger(__name__)
 
-def iter_csv_in_chunks(csv_path, chunksize=50000, **read_csv_kwargs):
+# Compact dtypes for the NYC taxi columns (Kaggle trip-duration and TLC yellow
+# layouts). Nullable integer types keep missing values without upcasting.
+TAXI_DTYPES = {
+    "vendor_id": "Int8",
+    "VendorID": "Int8",
+    "passenger_count": "Int8",
+    # coordinates stay float64: float32 keeps ~7 significant digits (about
+    # 4e-6 degrees here), enough to move points across 0.001-degree cell edges
+    "pickup_longitude": "float64",
+    "pickup_latitude": "float64",
+    "dropoff_longitude": "float64",
+    "dropoff_latitude": "float64",
+    "trip_duration": "float32",
+    "trip_distance": "float32",
+    "fare_amount": "float32",
+    "tip_amount": "float32",
+    "payment_type": "category",
+    "store_and_fwd_flag": "category",
+}
+
+TAXI_DATETIME_COLUMNS = (
+    "pickup_datetime", "dropoff_datetime", "tpep_pickup_datetime", "tpep_dropoff_datetime",
+)
+
+# Raw columns the cleaning, enrichment and import steps actually use
+TAXI_USED_COLUMNS = set(TAXI_DTYPES) - {"store_and_fwd_flag"} | set(TAXI_DATETIME_COLUMNS)
+
+ARROW_TYPES = {
+    "Int8": pa.int8(),
+    "float32": pa.float32(),
+    "float64": pa.float64(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def _parse_datetimes(chunk):
+    # done after the read so unparseable values become NaT instead of
+    # failing the chunk; basic_clean drops them as missing_essential
+    for col in TAXI_DATETIME_COLUMNS:
+        if col in chunk.columns and chunk[col].dtype == object:
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+    return chunk
+
+
+def _iter_csv_pyarrow(source, chunksize, columns, names=None):
+    column_types = {c: ARROW_TYPES[TAXI_DTYPES[c]] for c in columns if c in TAXI_DTYPES}
+    column_types.update({c: pa.string() for c in columns if c in TAXI_DATETIME_COLUMNS})
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(column_names=names),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, include_columns=columns),
+    )
+    # arrow batches are sized in bytes; regroup them into chunksize rows
+    pending = []
+    pending_rows = 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunksize)
+            rest = table.slice(chunksize)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def data_row_offset(csv_path, rows, block_size=1 << 20):
+    """
+    Byte offset at which data row `rows` (0 = the row after the header)
+    starts, or the file size if it has fewer rows. Newlines are counted in
+    fixed-size blocks, so memory does not grow with `rows`. Assumes no
+    quoted field spans a newline, which holds for the taxi CSVs.
+    """
+    remaining = rows + 1  # the header line
+    position = 0
+    with open(csv_path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return position
+            newlines = block.count(b"\n")
+            if newlines >= remaining:
+                index = -1
+                for _ in range(remaining):
+                    index = block.index(b"\n", index + 1)
+                return position + index + 1
+            remaining -= newlines
+            position += len(block)
+
+
+def iter_csv_in_chunks(csv_path, chunksize=50000, typed=False, prune_columns=False, engine="c",
+                       skip_rows=0, **read_csv_kwargs):
+    """
+    Yield pandas DataFrame chunks.
+    typed=True reads the taxi columns with the compact TAXI_DTYPES and parsed
+    datetimes instead of object/float64; numeric columns must then be
+    well-formed. prune_columns=True skips raw columns no ETL step uses.
+    engine="pyarrow" parses with pyarrow's streaming CSV reader (typed only).
+    skip_rows data rows after the header are skipped without being parsed:
+    reading starts at their byte offset (used to resume a checkpointed run).
+    """
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    with open(csv_path, "rb") as source:
+        if skip_rows:
+            # pandas turns any skiprows, even an integer, into a set of row numbers
+            offset = data_row_offset(csv_path, skip_rows)
+            if offset >= os.path.getsize(csv_path):
+                return
+            source.seek(offset)
+            read_csv_kwargs.update(header=None, names=header)
+        yield from _iter_csv(source, header, chunksize, typed, prune_columns, engine, skip_rows, read_csv_kwargs)
+
+
+def _iter_csv(source, header, chunksize, typed, prune_columns, engine, skip_rows, read_csv_kwargs):
+    if not typed:
+        for chunk in pd.read_csv(source, chunksize=chunksize, low_memory=False, **read_csv_kwargs):
+            yield chunk
+        return
+
+    columns = [c for c in header if c in TAXI_USED_COLUMNS] if prune_columns else header
+
+    if engine == "pyarrow":
+        # past the header when resuming, so the names are supplied instead of read
+        names = header if skip_rows else None
+        for table in _iter_csv_pyarrow(source, chunksize, columns, names):
+            yield _parse_datetimes(table.to_pandas(types_mapper={pa.int8(): pd.Int8Dtype()}.get))
+        return
+
+    dtypes = {c: TAXI_DTYPES[c] for c in columns if c in TAXI_DTYPES}
+    for chunk in pd.read_csv(source, chunksize=chunksize, usecols=columns, dtype=dtypes, **read_csv_kwargs):
+        yield _parse_datetimes(chunk)
+
+# Hive-style partition key written by the parquet ETL output (pickup_date=YYYY-MM-DD)
+PARTITION_COLUMN = "pickup_date"
+
+
+def _parquet_dataset(path):
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+
+def _partition_filter(start_date=None, end_date=None):
+    # ISO dates compare correctly as strings
+    expr = None
+    if start_date is not None:
+        expr = ds.field(PARTITION_COLUMN) >= str(start_date)
+    if end_date is not None:
+        upper = ds.field(PARTITION_COLUMN) <= str(end_date)
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def parquet_columns(path):
+    """
+    Column names stored in the parquet ETL output (including the partition key).
+    """
+    return _parquet_dataset(path).schema.names
+
+
+def read_parquet_partitions(path, start_date=None, end_date=None, columns=None):
+    """
+    Read the partitioned parquet ETL output for pickup dates
+    start_date..end_date (inclusive, either may be None). Only matching
+    partition directories and the requested columns are read.
+    """
+    dataset = _parquet_dataset(path)
+    table = dataset.to_table(columns=columns, filter=_partition_filter(start_date, end_date))
+    return table.to_pandas()
+
+
+def iter_parquet_in_chunks(path, chunksize=50000, start_date=None, end_date=None, columns=None):
     """
-    Yield pandas DataFrame chunks
+    Yield pandas DataFrame chunks of the partitioned parquet ETL output,
+    with the same partition and column pruning as read_parquet_partitions.
     """
-    for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False, **read_csv_kwargs):
-        yield chunk
+    dataset = _parquet_dataset(path)
+    for batch in dataset.to_batches(columns=columns, filter=_partition_filter(start_date, end_date),
+                                    batch_size=chunksize):
+        if batch.num_rows:
+            yield batch.to_pandas()
@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def max_rss_bytes():
+    """
+    High-water resident set size of this process, or None where unavailable.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class StageProfiler:
+    """
+    Accumulates wall time, calls, input rows and memory per ETL stage.
+    Every stage records how much it raised the process max RSS, which shows
+    the stages that push the high-water mark. With trace_memory (tracemalloc
+    running; slows allocation-heavy stages a lot) it also records the
+    stage's own peak over the memory held when it started; such stages must
+    not nest. Stage dicts from other processes are folded in with merge().
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        rss = max_rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - base if tracing else None
+            self.add(name, seconds, rows, peak, _growth(rss))
+
+    def iterate(self, name, iterable):
+        """
+        Yield from `iterable`, timing each next() (e.g. reading a CSV chunk)
+        as stage `name` with len(item) rows.
+        """
+        iterator = iter(iterable)
+        while True:
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            rss = max_rss_bytes()
+            started = time.perf_counter()
+            item = next(iterator, None)
+            seconds = time.perf_counter() - started
+            if item is None:
+                return
+            peak = tracemalloc.get_traced_memory()[1] - base if tracing else None
+            self.add(name, seconds, len(item), peak, _growth(rss))
+            yield item
+
+    def add(self, name, seconds, rows=0, peak_bytes=None, rss_growth=None, calls=1):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0,
+                                                  "peak_bytes": None, "rss_growth": None})
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+            entry["rows"] += rows
+            if peak_bytes is not None:
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak_bytes)
+            if rss_growth is not None:
+                entry["rss_growth"] = (entry["rss_growth"] or 0) + rss_growth
+
+    def merge(self, stages):
+        for name, e in stages.items():
+            self.add(name, e["seconds"], e["rows"], e["peak_bytes"], e["rss_growth"], e["calls"])
+
+    def report(self, wall_seconds=None, **info):
+        """
+        JSON-serializable report; `info` (paths, settings) is included as is.
+        """
+        busy = sum(e["seconds"] for e in self.stages.values())
+        stages = {}
+        for name, e in self.stages.items():
+            stages[name] = {
+                "seconds": round(e["seconds"], 6),
+                "calls": e["calls"],
+                "rows": e["rows"],
+                "rows_per_sec": round(e["rows"] / e["seconds"], 1) if e["rows"] and e["seconds"] else None,
+                "share": round(e["seconds"] / busy, 4) if busy else None,
+                "peak_mb": round(e["peak_bytes"] / 2 ** 20, 3) if e["peak_bytes"] is not None else None,
+                "rss_growth_mb": round(e["rss_growth"] / 2 ** 20, 1) if e["rss_growth"] is not None else None,
+            }
+        rss = max_rss_bytes()
+        return {**info, "trace_memory": self.trace_memory,
+                "max_rss_mb": round(rss / 2 ** 20, 1) if rss is not None else None,
+                "wall_seconds": round(wall_seconds, 3) if wall_seconds is not None else None,
+                "stage_seconds": round(busy, 3), "stages": stages}
+
+    def format_table(self):
+        """
+        Stages by time spent, largest first, as a fixed-width text table.
+        """
+        def fmt(value, spec):
+            return "-" if value is None else format(value, spec)
+
+        report = self.report()
+        lines = [f"{'stage':<30} {'seconds':>10} {'share':>7} {'calls':>6} {'rows/s':>13} "
+                 f"{'peak MB':>8} {'+RSS MB':>8}"]
+        for name, s in sorted(report["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append(f"{name:<30} {s['seconds']:>10.3f} {fmt(s['share'], '.1%'):>7} {s['calls']:>6} "
+                         f"{fmt(s['rows_per_sec'], ',.0f'):>13} {fmt(s['peak_mb'], '.1f'):>8} "
+                         f"{fmt(s['rss_growth_mb'], '.1f'):>8}")
+        return "\n".join(lines)
+
+
+def _growth(rss_before):
+    if rss_before is None:
+        return None
+    return max_rss_bytes() - rss_before
+
+
+class _NullProfiler:
+    """
+    Stand-in used when profiling is off; stage() costs one nullcontext.
+    """
+
+    def stage(self, name, rows=0):
+        return nullcontext()
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,63 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class QuarantineWriter:
+    """
+    Streams rows rejected by basic_clean (with their reject_reason) to disk
+    so bad data can be audited without being held in memory.
+    A .parquet path is written as one file per run, a row group per chunk;
+    any other path is treated as CSV and appended to across runs.
+    resume_position is a position() saved by an interrupted run: a CSV file
+    is truncated back to it, a Parquet run writes <name>-from-<position>.parquet
+    since a Parquet file cannot be appended to.
+    """
+
+    def __init__(self, path, resume_position=None):
+        self.format = "parquet" if path.endswith(".parquet") else "csv"
+        if resume_position is not None and self.format == "parquet":
+            path = f"{path[:-len('.parquet')]}-from-{resume_position}.parquet"
+        self.path = path
+        self.rows = 0
+        self.base_rows = resume_position if self.format == "parquet" and resume_position else 0
+        self._parquet_writer = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume_position is not None and self.format == "csv" and os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(resume_position)
+
+    def position(self):
+        """
+        Resume point for a checkpoint: bytes written for CSV, rows for Parquet.
+        """
+        if self.format == "parquet":
+            return self.base_rows + self.rows
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def write(self, rejected):
+        if rejected is None or rejected.empty:
+            return
+        if self.format == "parquet":
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(rejected, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(rejected, schema=self._parquet_writer.schema,
+                                             preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            rejected.to_csv(self.path, index=False, header=write_header, mode='a')
+        self.rows += len(rejected)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        logger.info(f"Quarantined {self.rows} rejected rows to {self.path}")
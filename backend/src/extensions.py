@@ -1,5 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from src.services.response_cache import ResponseCache
+from src.services.columnar import ColumnarStore
+from src.services.request_metrics import RequestMetrics
+from src.services.static_assets import StaticAssets
 
 db = SQLAlchemy()
-migrate = Migrate()
+response_cache = ResponseCache()
+columnar_store = ColumnarStore()
+request_metrics = RequestMetrics()
+static_assets = StaticAssets()
@@ -0,0 +1,19 @@
+"""
+Entry point of the migration commands, e.g. `flask --app src.manage db upgrade`
+from backend/. Flask-Migrate (and alembic) are only imported here, not by
+API workers.
+"""
+from flask_migrate import Migrate
+from src.app import create_app
+from src.config import Config
+from src.extensions import db
+
+
+
+class MigrationConfig(Config):
+    # tables are created by the migrations themselves
+    DB_CREATE_ALL = False
+
+
+app = create_app(MigrationConfig)
+migrate = Migrate(app, db, directory=Config.MIGRATIONS_DIR)
@@ -0,0 +1,19 @@
+from ..extensions import db
+
+
+class DatasetVersion(db.Model):
+    """
+    Single-row counter bumped by the import scripts whenever trips or
+    rollups change; part of the API response cache key.
+    """
+    __tablename__ = "dataset_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
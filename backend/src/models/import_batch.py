@@ -0,0 +1,31 @@
+from ..extensions import db
+
+
+class ImportBatch(db.Model):
+    """
+    Ledger of committed import batches. Each row is written in the same
+    transaction as the trips it describes, keyed on the source fingerprint
+    and start offset, so a replayed batch is rejected instead of loaded twice.
+    Offsets are bytes into a processed CSV or rows into any other source.
+    """
+    __tablename__ = "import_batches"
+
+    source = db.Column(db.String(40), primary_key=True)
+    unit = db.Column(db.String(8), primary_key=True)
+    start_offset = db.Column(db.BigInteger, primary_key=True)
+    end_offset = db.Column(db.BigInteger, nullable=False)
+    rows = db.Column(db.BigInteger, nullable=False, default=0)
+    first_pickup = db.Column(db.DateTime)
+    last_pickup = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "unit": self.unit,
+            "start_offset": self.start_offset,
+            "end_offset": self.end_offset,
+            "rows": self.rows,
+            "first_pickup": self.first_pickup.isoformat() if self.first_pickup else None,
+            "last_pickup": self.last_pickup.isoformat() if self.last_pickup else None,
+        }
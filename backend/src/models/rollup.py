@@ -0,0 +1,96 @@
+from ..extensions import db
+
+
+class HourlyTripRollup(db.Model):
+    """
+    Pre-aggregated trip counts per (pickup date, pickup_hour).
+    Kept current by scripts/import_to_db.py; sums are stored instead of
+    averages so rollup rows can be merged with raw scans of partial days.
+    """
+    __tablename__ = "trip_hourly_rollups"
+
+    date = db.Column(db.Date, primary_key=True)
+    pickup_hour = db.Column(db.Integer, primary_key=True)
+    trip_count = db.Column(db.BigInteger, nullable=False, default=0)
+    speed_sum = db.Column(db.Float, nullable=False, default=0.0)
+    speed_count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "date": self.date.isoformat() if self.date else None,
+            "pickup_hour": self.pickup_hour,
+            "trip_count": self.trip_count,
+            "speed_sum": self.speed_sum,
+            "speed_count": self.speed_count,
+        }
+
+
+class DailyTripRollup(db.Model):
+    """
+    Pre-aggregated count and sums per pickup date for /api/trips/summary.
+    Nullable columns keep their own non-null counts so averages match AVG().
+    """
+    __tablename__ = "trip_daily_rollups"
+
+    date = db.Column(db.Date, primary_key=True)
+    trip_count = db.Column(db.BigInteger, nullable=False, default=0)
+    distance_sum = db.Column(db.Float, nullable=False, default=0.0)
+    distance_count = db.Column(db.BigInteger, nullable=False, default=0)
+    fare_sum = db.Column(db.Float, nullable=False, default=0.0)
+    fare_count = db.Column(db.BigInteger, nullable=False, default=0)
+    speed_sum = db.Column(db.Float, nullable=False, default=0.0)
+    speed_count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "date": self.date.isoformat() if self.date else None,
+            "trip_count": self.trip_count,
+            "distance_sum": self.distance_sum,
+            "distance_count": self.distance_count,
+            "fare_sum": self.fare_sum,
+            "fare_count": self.fare_count,
+            "speed_sum": self.speed_sum,
+            "speed_count": self.speed_count,
+        }
+
+
+class TripFlowRollup(db.Model):
+    """
+    Trips per (origin cell, destination cell, pickup date) at each grid
+    resolution in FLOW_RESOLUTIONS, using the packed pickup/dropoff cell ids.
+    Only pairs that occur get a row. Kept current with the other rollups so
+    /api/trips/flows never groups raw trips.
+    """
+    __tablename__ = "trip_flow_rollups"
+
+    resolution = db.Column(db.String(2), primary_key=True)
+    origin_cell = db.Column(db.BigInteger, primary_key=True)
+    destination_cell = db.Column(db.BigInteger, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    trip_count = db.Column(db.BigInteger, nullable=False, default=0)
+    duration_sum = db.Column(db.Float, nullable=False, default=0.0)
+    duration_count = db.Column(db.BigInteger, nullable=False, default=0)
+    fare_sum = db.Column(db.Float, nullable=False, default=0.0)
+    fare_count = db.Column(db.BigInteger, nullable=False, default=0)
+    speed_sum = db.Column(db.Float, nullable=False, default=0.0)
+    speed_count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # window scans: every pair of one resolution within a date range
+        db.Index("ix_trip_flow_rollups_resolution_date", "resolution", "date"),
+    )
+
+    def to_dict(self):
+        return {
+            "resolution": self.resolution,
+            "origin_cell": self.origin_cell,
+            "destination_cell": self.destination_cell,
+            "date": self.date.isoformat() if self.date else None,
+            "trip_count": self.trip_count,
+            "duration_sum": self.duration_sum,
+            "duration_count": self.duration_count,
+            "fare_sum": self.fare_sum,
+            "fare_count": self.fare_count,
+            "speed_sum": self.speed_sum,
+            "speed_count": self.speed_count,
+        }
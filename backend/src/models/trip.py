@@ -2,9 +2,18 @@ from ..extensions import db
 from sqlalchemy import Index
 
 class Trip(db.Model):
+    """
+    On PostgreSQL, migration d3a7b1f4e862 turns trips into a table
+    partitioned by RANGE (pickup_datetime), one partition per month
+    (services.partitions creates them on import), with primary key
+    (id, pickup_datetime). ids still come from one sequence, so the ORM
+    keeps identifying rows by id alone; SQLite keeps a plain table.
+    Filter on pickup_datetime directly so the planner can prune months.
+    """
     __tablename__ = "trips"
 
-    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    # SQLite only autoincrements INTEGER PRIMARY KEY
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
     vendor_id = db.Column(db.Integer, nullable=True)
     pickup_datetime = db.Column(db.DateTime, nullable=False, index=True)
     dropoff_datetime = db.Column(db.DateTime, nullable=False)
@@ -25,10 +34,46 @@ class Trip(db.Model):
     pickup_hour = db.Column(db.Integer, nullable=True)
     day_of_week = db.Column(db.Integer, nullable=True)  # 0=Monday
 
+    # Packed grid cell ids (see services_custom.top_k_hotspots.cell_to_id)
+    # at 0.1, 0.01 and 0.001 degree resolution
+    pickup_cell_d1 = db.Column(db.BigInteger, nullable=True)
+    pickup_cell_d2 = db.Column(db.BigInteger, nullable=True)
+    pickup_cell_d3 = db.Column(db.BigInteger, nullable=True)
+    dropoff_cell_d1 = db.Column(db.BigInteger, nullable=True, index=True)
+    dropoff_cell_d2 = db.Column(db.BigInteger, nullable=True, index=True)
+    dropoff_cell_d3 = db.Column(db.BigInteger, nullable=True, index=True)
+
     __table_args__ = (
         Index('ix_trips_pickup_dt_distance', "pickup_datetime", "trip_distance"),
+        # (time, cell) so windowed hotspot group-bys can be answered from the index alone
+        Index('ix_trips_pickup_dt_cell_d1', "pickup_datetime", "pickup_cell_d1"),
+        Index('ix_trips_pickup_dt_cell_d2', "pickup_datetime", "pickup_cell_d2"),
+        Index('ix_trips_pickup_dt_cell_d3', "pickup_datetime", "pickup_cell_d3"),
+        # covers the windowed weekday x hour heatmap group-by
+        Index('ix_trips_pickup_dt_dow_hour', "pickup_datetime", "day_of_week", "pickup_hour"),
+        # block-range summary for time-ordered loads (PostgreSQL, created per partition)
+        Index('ix_trips_pickup_dt_brin', "pickup_datetime", postgresql_using="brin").ddl_if(dialect="postgresql"),
+    )
+
+    # Fields exposed by the API, in to_dict() order
+    API_FIELDS = (
+        "id", "vendor_id", "pickup_datetime", "dropoff_datetime", "passenger_count",
+        "trip_distance", "pickup_longitude", "pickup_latitude", "dropoff_longitude",
+        "dropoff_latitude", "fare_amount", "tip_amount", "trip_duration",
+        "average_speed_kmph", "fare_per_km", "pickup_hour", "day_of_week",
     )
 
+    @staticmethod
+    def row_to_dict(row, fields):
+        """
+        Serialize a projected result row (from with_entities) like to_dict().
+        """
+        data = {}
+        for field in fields:
+            value = getattr(row, field)
+            data[field] = value.isoformat() if hasattr(value, "isoformat") else value
+        return data
+
     def to_dict(self):
         return {
             "id": self.id,
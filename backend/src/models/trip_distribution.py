@@ -0,0 +1,23 @@
+from ..extensions import db
+
+
+class TripDistribution(db.Model):
+    """
+    Per pickup date and metric: a t-digest (services_custom.quantile_sketch)
+    stored as float64 centroid arrays, and fixed-bin histogram counts as
+    int64 (first and last bins count values below and above the range).
+    Both merge across days, so any whole-day window is answered from these
+    rows alone. Kept current by the import scripts through
+    services.distributions.
+    """
+    __tablename__ = "trip_distributions"
+
+    date = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(32), primary_key=True)
+    value_count = db.Column(db.BigInteger, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    min_value = db.Column(db.Float, nullable=True)
+    max_value = db.Column(db.Float, nullable=True)
+    centroid_means = db.Column(db.LargeBinary, nullable=False)
+    centroid_weights = db.Column(db.LargeBinary, nullable=False)
+    histogram = db.Column(db.LargeBinary, nullable=False)
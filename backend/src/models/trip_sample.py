@@ -0,0 +1,37 @@
+from ..extensions import db
+
+
+class TripSample(db.Model):
+    """
+    Stratified sample of trips, one stratum per pickup date, holding only
+    the columns the approximate summary and hourly queries read.
+    Kept current by the import scripts through services.sampling.
+    """
+    __tablename__ = "trip_samples"
+
+    trip_id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    pickup_datetime = db.Column(db.DateTime, nullable=False, index=True)
+    pickup_hour = db.Column(db.Integer, nullable=True)
+    trip_distance = db.Column(db.Float, nullable=True)
+    fare_amount = db.Column(db.Float, nullable=True)
+    average_speed_kmph = db.Column(db.Float, nullable=True)
+
+
+class TripSampleStratum(db.Model):
+    """
+    Population and sample size of each pickup date in trip_samples; every
+    sampled row of a date stands for population / sample_rows trips.
+    """
+    __tablename__ = "trip_sample_strata"
+
+    date = db.Column(db.Date, primary_key=True)
+    population = db.Column(db.BigInteger, nullable=False, default=0)
+    sample_rows = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "date": self.date.isoformat() if self.date else None,
+            "population": self.population,
+            "sample_rows": self.sample_rows,
+        }
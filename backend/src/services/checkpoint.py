@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from logging import getLogger
+from sqlalchemy import func, select
+from ..models.import_batch import ImportBatch
+
+logger = getLogger(__name__)
+
+FINGERPRINT_BLOCK = 1 << 20
+
+# raw DB-API form of the ledger insert, for writes that share a COPY transaction
+LEDGER_INSERT_SQL = (
+    "INSERT INTO import_batches (source, unit, start_offset, end_offset, rows, first_pickup, last_pickup) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def _source_files(path):
+    if not os.path.isdir(path):
+        return [(os.path.basename(path), path)]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            if not name.startswith((".", "_")):
+                full = os.path.join(root, name)
+                files.append((os.path.relpath(full, path), full))
+    return files
+
+
+def file_fingerprint(path):
+    """
+    Cheap fingerprint of a source file (or parquet directory): sha1 of each
+    file's name, size and first and last MiB. Changes whenever the file is
+    regenerated without rereading multi-GB inputs end to end.
+    """
+    digest = hashlib.sha1()
+    for name, full in _source_files(path):
+        size = os.path.getsize(full)
+        digest.update(f"{name}:{size}\n".encode("utf-8"))
+        with open(full, "rb") as f:
+            digest.update(f.read(FINGERPRINT_BLOCK))
+            if size > FINGERPRINT_BLOCK:
+                f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def manifest_path(path, kind):
+    """
+    Default checkpoint manifest location, next to `path`.
+    """
+    return f"{path.rstrip(os.sep)}.{kind}-checkpoint.json"
+
+
+class Checkpoint:
+    """
+    JSON manifest rewritten (atomically) after every committed chunk or batch
+    so an interrupted run can resume. It is tied to the source fingerprint:
+    a manifest written for other contents of the file is ignored.
+    """
+
+    def __init__(self, path, source, fingerprint=None):
+        self.path = path
+        self.source = source
+        self.fingerprint = fingerprint or file_fingerprint(source)
+        self.state = {}
+
+    def load(self):
+        """
+        Return the saved state for this source, or {} if there is none.
+        """
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if manifest.get("fingerprint") != self.fingerprint:
+            logger.warning(f"Checkpoint {self.path} was written for different contents of {self.source}; ignoring it")
+            return {}
+        self.state = {k: v for k, v in manifest.items() if k not in ("source", "fingerprint", "updated_at")}
+        return self.state
+
+    def save(self, **state):
+        self.state.update(state)
+        manifest = {
+            "source": os.path.abspath(self.source),
+            "fingerprint": self.fingerprint,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            **self.state,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+
+def committed_spans(connection, source, unit):
+    """
+    Sorted (start, end) offsets of the batches already committed from `source`.
+    """
+    rows = connection.execute(
+        select(ImportBatch.start_offset, ImportBatch.end_offset)
+        .where(ImportBatch.source == source, ImportBatch.unit == unit)
+        .order_by(ImportBatch.start_offset)
+    ).all()
+    return [(start, end) for start, end in rows]
+
+
+def pending_spans(committed, lo, hi):
+    """
+    Parts of [lo, hi) not covered by the sorted `committed` spans.
+    """
+    spans = []
+    pos = lo
+    for start, end in committed:
+        if end <= pos:
+            continue
+        if start >= hi:
+            break
+        if start > pos:
+            spans.append((pos, start))
+        pos = max(pos, end)
+    if pos < hi:
+        spans.append((pos, hi))
+    return spans
+
+
+def merge_spans(spans):
+    """
+    Sorted union of (start, end) spans, adjacent spans joined.
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def committed_prefix(committed, start=0):
+    """
+    End of the run of committed spans contiguous from `start`, for sources
+    that are loaded strictly in order.
+    """
+    pos = start
+    for span_start, span_end in committed:
+        if span_start > pos:
+            break
+        pos = max(pos, span_end)
+    return pos
+
+
+def check_resumable(committed, source_path, resume):
+    """
+    A source that already has committed batches is only loaded again with
+    resume, which skips them; otherwise the run is refused.
+    """
+    if committed and not resume:
+        raise ValueError(
+            f"{source_path} has {len(committed)} batches already imported; "
+            f"rerun with --resume to load only the remainder"
+        )
+
+
+def imported_window(connection, source, unit):
+    """
+    (rows, first pickup, last pickup) over every committed batch of `source`,
+    so rollups can be refreshed for the whole file after a resumed run.
+    """
+    return connection.execute(
+        select(func.sum(ImportBatch.rows), func.min(ImportBatch.first_pickup), func.max(ImportBatch.last_pickup))
+        .where(ImportBatch.source == source, ImportBatch.unit == unit)
+    ).one()
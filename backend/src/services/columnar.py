@@ -0,0 +1,238 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from logging import getLogger
+import numpy as np
+from sqlalchemy import select, table, column
+from ..services_custom.top_k_hotspots import (
+    CELL_RESOLUTIONS, cell_id_layout, id_to_cell, manual_top_k, cells_to_hotspots, resolution_suffix,
+)
+
+logger = getLogger(__name__)
+
+# Trip columns kept in the snapshot and their on-disk dtypes. Missing
+# values are NaN for floats and -1 for integers (cell ids are never negative).
+SNAPSHOT_COLUMNS = {
+    "pickup_datetime": "datetime64[ns]",
+    "pickup_hour": "int8",
+    "trip_distance": "float64",
+    "fare_amount": "float64",
+    "average_speed_kmph": "float64",
+    "pickup_latitude": "float64",
+    "pickup_longitude": "float64",
+    **{f"pickup_cell_{suffix}": "int64" for suffix in CELL_RESOLUTIONS},
+}
+
+META_FILE = "meta.json"
+
+
+def _column_path(directory, name):
+    return os.path.join(directory, f"{name}.bin")
+
+
+def _pandas():
+    """
+    The pandas module, imported on first use. Only the writers (snapshot
+    export, distribution refresh) need it; API workers that just read
+    snapshots and sketches start faster without it.
+    """
+    import pandas
+    return pandas
+
+
+def _to_array(series, dtype):
+    pd = _pandas()
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series).to_numpy(dtype=dtype)
+    if dtype.startswith("int"):
+        return pd.to_numeric(series).fillna(-1).to_numpy(dtype=dtype)
+    return pd.to_numeric(series).to_numpy(dtype=dtype, na_value=np.nan)
+
+
+def write_snapshot(engine, directory, dataset_version=0, chunksize=200000):
+    """
+    Export the snapshot columns of trips, ordered by pickup time, to one raw
+    binary file per column under `directory`, plus meta.json. The export is
+    written next to the old snapshot and swapped in with renames, so readers
+    never see a partial one; processes that still map the old files keep
+    working. Returns the number of rows written.
+    """
+    pd = _pandas()
+    tmp_dir = f"{directory.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = list(SNAPSHOT_COLUMNS)
+    # plain table() rather than the Trip model: extensions.py imports this module before db exists
+    trips = table("trips", *[column(c) for c in columns + ["id"]])
+    stmt = select(*[trips.c[c] for c in columns]).order_by(trips.c.pickup_datetime, trips.c.id)
+
+    rows = 0
+    files = {c: open(_column_path(tmp_dir, c), "wb") for c in columns}
+    try:
+        with engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            for chunk in pd.read_sql_query(stmt, connection, chunksize=chunksize):
+                for c in columns:
+                    files[c].write(_to_array(chunk[c], SNAPSHOT_COLUMNS[c]).tobytes())
+                rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {
+        "rows": rows,
+        "dataset_version": dataset_version,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "columns": SNAPSHOT_COLUMNS,
+    }
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    old_dir = f"{directory.rstrip(os.sep)}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Wrote columnar snapshot of {rows} trips (dataset version {dataset_version}) to {directory}")
+    return rows
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class ColumnarSnapshot:
+    """
+    Read-only, memory-mapped trip columns sorted by pickup time. A time
+    window is two binary searches on pickup_datetime; each aggregate is a
+    handful of vectorized reductions over the contiguous slice between
+    them. The pages are shared by every process mapping the same snapshot.
+    """
+
+    def __init__(self, columns, meta):
+        self.columns = columns
+        self.meta = meta
+        self.rows = meta["rows"]
+        self.dataset_version = meta["dataset_version"]
+
+    @classmethod
+    def load(cls, directory):
+        meta = read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"No columnar snapshot in {directory}")
+        columns = {}
+        for name, dtype in meta["columns"].items():
+            if meta["rows"]:
+                columns[name] = np.memmap(_column_path(directory, name), dtype=dtype, mode="r",
+                                          shape=(meta["rows"],))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        return cls(columns, meta)
+
+    def window(self, start=None, end=None):
+        """
+        [lo, hi) row range of pickups in the inclusive [start, end] window.
+        """
+        pickup = self.columns["pickup_datetime"]
+        lo = 0 if start is None else int(np.searchsorted(pickup, np.datetime64(start), side="left"))
+        hi = self.rows if end is None else int(np.searchsorted(pickup, np.datetime64(end), side="right"))
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _mean(values):
+        valid = ~np.isnan(values)
+        count = np.count_nonzero(valid)
+        return float(values[valid].sum() / count) if count else 0.0
+
+    def summary(self, start=None, end=None):
+        """
+        Same result as trip_stats.summary_stats; averages skip missing values like AVG().
+        """
+        lo, hi = self.window(start, end)
+        return {
+            "total_trips": hi - lo,
+            "avg_distance": self._mean(self.columns["trip_distance"][lo:hi]),
+            "avg_fare": self._mean(self.columns["fare_amount"][lo:hi]),
+            "avg_speed_kmph": self._mean(self.columns["average_speed_kmph"][lo:hi]),
+        }
+
+    def hourly(self, start=None, end=None):
+        """
+        Same result as trip_stats.hourly_stats.
+        """
+        lo, hi = self.window(start, end)
+        hours = self.columns["pickup_hour"][lo:hi]
+        speeds = self.columns["average_speed_kmph"][lo:hi]
+        valid = (hours >= 0) & (hours < 24)
+        trips = np.bincount(hours[valid], minlength=24)
+        with_speed = valid & ~np.isnan(speeds)
+        speed_sum = np.bincount(hours[with_speed], weights=speeds[with_speed], minlength=24)
+        speed_count = np.bincount(hours[with_speed], minlength=24)
+        return {
+            "hours": list(range(24)),
+            "trips": [int(n) for n in trips],
+            "speeds": [float(s / c) if c else 0.0 for s, c in zip(speed_sum, speed_count)],
+        }
+
+    def _cell_ids(self, lo, hi, cell_size_deg):
+        suffix = resolution_suffix(cell_size_deg)
+        if suffix is not None:
+            ids = self.columns[f"pickup_cell_{suffix}"][lo:hi]
+            return ids[ids >= 0]
+        lat = self.columns["pickup_latitude"][lo:hi]
+        lon = self.columns["pickup_longitude"][lo:hi]
+        valid = ~np.isnan(lat) & ~np.isnan(lon)
+        lat_offset, lon_offset, width = cell_id_layout(cell_size_deg)
+        ci = np.floor(lat[valid] / cell_size_deg).astype(np.int64)
+        cj = np.floor(lon[valid] / cell_size_deg).astype(np.int64)
+        return (ci + lat_offset) * width + (cj + lon_offset)
+
+    def hotspots(self, start=None, end=None, k=10, cell_size_deg=0.01):
+        """
+        Same result as trip_stats.hotspot_stats. Cells are counted with
+        np.unique and only those that can still make the top k are handed
+        to manual_top_k.
+        """
+        lo, hi = self.window(start, end)
+        cells, counts = np.unique(self._cell_ids(lo, hi, cell_size_deg), return_counts=True)
+        if 0 < k < len(counts):
+            keep = counts >= np.partition(counts, -k)[-k]
+            cells, counts = cells[keep], counts[keep]
+        pairs = ((id_to_cell(int(cell_id), cell_size_deg), int(n)) for cell_id, n in zip(cells, counts))
+        return cells_to_hotspots(manual_top_k(pairs, k), cell_size_deg)
+
+
+class ColumnarStore:
+    """
+    App extension holding the current snapshot. A snapshot is only served
+    while its dataset version matches the database; otherwise the directory
+    is re-read (a new one may have been written after an import) and None
+    is returned until it catches up, so callers fall back to SQL.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._snapshot = None
+
+    def init_app(self, app):
+        if app.config.get("USE_COLUMNAR") and app.config.get("COLUMNAR_SNAPSHOT_DIR"):
+            self.directory = app.config["COLUMNAR_SNAPSHOT_DIR"]
+            self._snapshot = None
+            app.extensions["columnar"] = self
+
+    def snapshot(self, dataset_version):
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.dataset_version == dataset_version:
+            return snapshot
+        meta = read_meta(self.directory)
+        if meta is None or meta["dataset_version"] != dataset_version:
+            return None
+        self._snapshot = ColumnarSnapshot.load(self.directory)
+        logger.info(f"Loaded columnar snapshot of {self._snapshot.rows} trips (version {dataset_version})")
+        return self._snapshot
@@ -0,0 +1,94 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from logging import getLogger
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from ..extensions import db
+
+logger = getLogger(__name__)
+
+
+class QueryTimeout(Exception):
+    """
+    A concurrent query did not finish within its timeout.
+    """
+
+
+def query_executor(app):
+    """
+    The app's thread pool for concurrent queries (DASHBOARD_WORKERS threads),
+    created on first use.
+    """
+    executor = app.extensions.get("query_executor")
+    if executor is None:
+        executor = app.extensions.setdefault("query_executor", ThreadPoolExecutor(
+            max_workers=app.config.get("DASHBOARD_WORKERS", 3), thread_name_prefix="query"))
+    return executor
+
+
+def _run_in_app_context(app, func, deadline):
+    """
+    Run func() in a fresh app context (its own scoped session, hence its own
+    pooled connection). With a `deadline` (time.monotonic()) the database
+    itself aborts the work once it passes: statement_timeout on PostgreSQL,
+    a progress handler on SQLite. So a timed-out task releases its pool
+    thread and connection then, instead of running to completion after
+    run_concurrently has given up on it.
+    """
+    with app.app_context():
+        if deadline is None:
+            return func()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QueryTimeout("deadline passed before the query started")
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            # applies to every statement of this task's transaction
+            db.session.execute(text(f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}"))
+            return func()
+        if dialect != "sqlite":
+            return func()
+        raw = db.session.connection().connection.dbapi_connection
+        # a non-zero return interrupts the running statement
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        try:
+            return func()
+        finally:
+            raw.set_progress_handler(None, 0)
+
+
+def run_concurrently(app, tasks, timeout=None):
+    """
+    Run each callable of `tasks` ({name: func}) on the query pool, each in
+    its own app context and database connection, and return {name: result}.
+    Raises QueryTimeout when any of them takes longer than `timeout`
+    seconds (measured from submission); other errors are re-raised.
+    Tasks still queued are cancelled and running ones are aborted by the
+    database at the same deadline, so none holds a worker or connection
+    much longer than `timeout`.
+    """
+    executor = query_executor(app)
+    deadline = time.monotonic() + timeout if timeout else None
+    futures = {
+        # copy_context keeps per-request state (e.g. SQL metrics) visible to the thread
+        name: executor.submit(contextvars.copy_context().run, _run_in_app_context, app, func, deadline)
+        for name, func in tasks.items()
+    }
+    results = {}
+    try:
+        for name, future in futures.items():
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            try:
+                results[name] = future.result(timeout=remaining)
+            except (FutureTimeout, QueryTimeout):
+                raise QueryTimeout(f"{name} query exceeded {timeout}s") from None
+            except OperationalError as e:
+                # PostgreSQL statement_timeout, or the SQLite progress handler
+                if "statement timeout" in str(e) or "interrupted" in str(e):
+                    raise QueryTimeout(f"{name} query exceeded {timeout}s") from e
+                raise
+    finally:
+        for future in futures.values():
+            future.cancel()
+    return results
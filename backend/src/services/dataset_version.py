@@ -0,0 +1,37 @@
+from logging import getLogger
+from sqlalchemy import select, update, insert
+from ..models.dataset_version import DatasetVersion
+
+logger = getLogger(__name__)
+
+VERSION_ROW_ID = 1
+
+
+def current_dataset_version(connection):
+    """
+    Current dataset version (0 before the first import).
+    `connection` may be a Connection or a Session.
+    """
+    version = connection.execute(
+        select(DatasetVersion.version).where(DatasetVersion.id == VERSION_ROW_ID)
+    ).scalar()
+    return version or 0
+
+
+def bump_dataset_version(engine):
+    """
+    Increment the dataset version after new data lands, so cached API
+    responses computed from the old data are no longer served.
+    Returns the new version.
+    """
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(DatasetVersion)
+            .where(DatasetVersion.id == VERSION_ROW_ID)
+            .values(version=DatasetVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(DatasetVersion).values(id=VERSION_ROW_ID, version=1))
+        version = current_dataset_version(connection)
+    logger.info(f"Dataset version is now {version}")
+    return version
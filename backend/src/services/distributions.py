@@ -0,0 +1,329 @@
+import os
+from datetime import timedelta
+from logging import getLogger
+import numpy as np
+from sqlalchemy import func, select
+from ..models.trip import Trip
+from ..models.trip_distribution import TripDistribution
+from ..services_custom.quantile_sketch import TDigest, DEFAULT_COMPRESSION
+from .columnar import _pandas
+from .rollups import midnight, _as_date
+
+logger = getLogger(__name__)
+
+# metric -> (low, high, bins) of its fixed-width histogram; values outside
+# the range are counted in separate below/above bins
+DISTRIBUTION_METRICS = {
+    "fare_amount": (0.0, 100.0, 50),           # dollars
+    "trip_distance": (0.0, 50.0, 50),          # km
+    "trip_duration": (0.0, 7200.0, 60),        # seconds
+    "average_speed_kmph": (0.0, 100.0, 50),
+    "fare_per_km": (0.0, 20.0, 40),
+}
+
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class DistributionsMissing(Exception):
+    """
+    The window has trips but no daily sketches: they are stored when trips
+    are loaded into the database (run_etl --to-db, or import_to_db from the
+    sketches the ETL wrote next to its output) or by rebuild_rollups.
+    """
+
+
+def histogram_edges(metric):
+    low, high, bins = DISTRIBUTION_METRICS[metric]
+    return np.linspace(low, high, bins + 1)
+
+
+def _histogram(values, metric):
+    """
+    [below, bin counts..., above] for the non-NaN `values` of a metric.
+    """
+    low, high, bins = DISTRIBUTION_METRICS[metric]
+    counts = np.zeros(bins + 2, dtype=np.int64)
+    counts[0] = np.count_nonzero(values < low)
+    counts[-1] = np.count_nonzero(values > high)
+    counts[1:-1] = np.histogram(values, bins=bins, range=(low, high))[0]
+    return counts
+
+
+def _distribution_row(day, metric, count, total, digest, histogram):
+    return {
+        "date": day,
+        "metric": metric,
+        "value_count": count,
+        "value_sum": total,
+        "min_value": digest.min if count else None,
+        "max_value": digest.max if count else None,
+        "centroid_means": digest.means.tobytes(),
+        "centroid_weights": digest.weights.tobytes(),
+        "histogram": histogram.tobytes(),
+    }
+
+
+def _summarise(values, metric, compression):
+    """
+    (count, sum, t-digest, histogram) of the non-NaN `values` of a metric.
+    """
+    values = values[~np.isnan(values)]
+    return len(values), float(values.sum()), TDigest.from_values(values, compression), _histogram(values, metric)
+
+
+def _metric_values(frame, metric):
+    return _pandas().to_numeric(frame[metric]).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class DistributionBuilder:
+    """
+    Per-day sketches and histograms of DISTRIBUTION_METRICS built chunk by
+    chunk from enriched trips, so the ETL can write them next to its output
+    without a second pass. Chunks may hold any days in any order; builders
+    for separate chunks (e.g. from pool workers) combine with merge().
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.trips = {}   # date -> trips seen
+        self.parts = {}   # (date, metric) -> [count, sum, digest, histogram]
+
+    def add(self, df):
+        """
+        Summarise the trips of `df` (pickup_datetime plus the metric columns).
+        """
+        for day, frame in df.groupby(df["pickup_datetime"].dt.normalize(), sort=False):
+            day = day.date()
+            self.trips[day] = self.trips.get(day, 0) + len(frame)
+            for metric in DISTRIBUTION_METRICS:
+                self._merge_part((day, metric), *_summarise(_metric_values(frame, metric), metric, self.compression))
+        return self
+
+    def merge(self, other):
+        for day, trips in other.trips.items():
+            self.trips[day] = self.trips.get(day, 0) + trips
+        for key, part in other.parts.items():
+            self._merge_part(key, *part)
+        return self
+
+    def _merge_part(self, key, count, total, digest, histogram):
+        part = self.parts.get(key)
+        if part is None:
+            self.parts[key] = [count, total, digest, histogram]
+            return
+        part[0] += count
+        part[1] += total
+        part[2] = TDigest.merged([part[2], digest], self.compression)
+        part[3] = part[3] + histogram
+
+    def rows(self):
+        """
+        trip_distributions rows, ordered by date and metric.
+        """
+        return [_distribution_row(day, metric, *self.parts[day, metric]) for day, metric in sorted(self.parts)]
+
+
+def distributions_path(output_path):
+    """
+    Where the ETL writes the sketches of `output_path`: inside a parquet
+    dataset directory (the leading underscore keeps dataset readers away),
+    or next to a CSV as <name>.distributions.parquet.
+    """
+    if os.path.isdir(output_path):
+        return os.path.join(output_path, "_distributions.parquet")
+    return f"{os.path.splitext(output_path)[0]}.distributions.parquet"
+
+
+def _distribution_file_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("date", pa.date32()), ("metric", pa.string()), ("trips", pa.int64()),
+        ("value_count", pa.int64()), ("value_sum", pa.float64()),
+        ("min_value", pa.float64()), ("max_value", pa.float64()),
+        ("centroid_means", pa.binary()), ("centroid_weights", pa.binary()), ("histogram", pa.binary()),
+    ])
+
+
+def write_distribution_file(path, builder):
+    """
+    Write a builder's rows and per-day trip counts to a parquet file,
+    replacing it atomically.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rows = builder.rows()
+    for row in rows:
+        row["trips"] = builder.trips[row["date"]]
+    tmp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pylist(rows, schema=_distribution_file_schema()), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_distribution_file(path, first_day=None, last_day=None):
+    """
+    (trip_distributions rows, {date: trips}) of a sketch file written by
+    the ETL, limited to pickup dates first_day..last_day when given.
+    """
+    import pyarrow.parquet as pq
+    rows, trips = [], {}
+    for row in pq.read_table(path).to_pylist():
+        day = row["date"]
+        if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+            continue
+        trips[day] = row.pop("trips")
+        rows.append(row)
+    return rows, trips
+
+
+def refresh_distributions(session, first_day, last_day, compression=DEFAULT_COMPRESSION):
+    """
+    Rebuild the per-day sketches and histograms of DISTRIBUTION_METRICS for
+    pickup dates first_day..last_day (inclusive). Each day's values are read
+    once and summarised in memory; rows already stored for those days are
+    replaced.
+    """
+    pd = _pandas()
+    pickup_date = func.date(Trip.pickup_datetime)
+    days = (
+        session.query(pickup_date)
+        .filter(Trip.pickup_datetime >= midnight(first_day),
+                Trip.pickup_datetime < midnight(last_day + timedelta(days=1)))
+        .group_by(pickup_date)
+        .all()
+    )
+    metrics = list(DISTRIBUTION_METRICS)
+
+    rows = []
+    connection = session.connection()
+    for (day,) in days:
+        day = _as_date(day)
+        stmt = select(*[getattr(Trip, m) for m in metrics]).where(
+            Trip.pickup_datetime >= midnight(day),
+            Trip.pickup_datetime < midnight(day + timedelta(days=1)),
+        )
+        frame = pd.read_sql_query(stmt, connection)
+        for metric in metrics:
+            rows.append(_distribution_row(day, metric, *_summarise(_metric_values(frame, metric), metric,
+                                                                   compression)))
+
+    _replace_distributions(session, rows, TripDistribution.date >= first_day, TripDistribution.date <= last_day)
+    logger.info(f"Refreshed distributions for {first_day} to {last_day}: {len(days)} days")
+
+
+def _replace_distributions(session, rows, *where):
+    try:
+        session.query(TripDistribution).filter(*where).delete(synchronize_session=False)
+        session.bulk_insert_mappings(TripDistribution, rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+def load_distribution_file(session, path, first_day, last_day):
+    """
+    Store the ETL's sketches from `path` for pickup dates first_day..last_day
+    instead of re-reading those days' trips. A day is only taken from the
+    file when the database holds exactly the trips the file summarised
+    (trips from other sources would be missing from it). Returns the days
+    that have trips but could not be taken, for refresh_distributions.
+    """
+    rows, trips = read_distribution_file(path, first_day, last_day)
+    pickup_date = func.date(Trip.pickup_datetime)
+    in_db = {
+        _as_date(day): count for day, count in
+        session.query(pickup_date, func.count())
+        .filter(Trip.pickup_datetime >= midnight(first_day),
+                Trip.pickup_datetime < midnight(last_day + timedelta(days=1)))
+        .group_by(pickup_date)
+        .all()
+    }
+    usable = {day for day, count in trips.items() if in_db.get(day) == count}
+    if usable:
+        _replace_distributions(session, [r for r in rows if r["date"] in usable],
+                               TripDistribution.date.in_(sorted(usable)))
+    logger.info(f"Loaded distributions for {len(usable)} days from {path}")
+    return sorted(set(in_db) - usable)
+
+
+def rebuild_all_distributions(session, compression=DEFAULT_COMPRESSION):
+    """
+    Rebuild the distributions for every pickup date present in trips.
+    """
+    lo, hi = session.query(func.min(Trip.pickup_datetime), func.max(Trip.pickup_datetime)).one()
+    if lo is None:
+        logger.info("No trips found; no distributions to build.")
+        return
+    refresh_distributions(session, lo.date(), hi.date(), compression=compression)
+
+
+def quantile_label(q):
+    return f"p{q * 100:g}"
+
+
+def _finite(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def _has_trips(start, end):
+    q = Trip.query.with_entities(Trip.id)
+    if start is not None:
+        q = q.filter(Trip.pickup_datetime >= midnight(start.date()))
+    if end is not None:
+        q = q.filter(Trip.pickup_datetime < midnight(end.date() + timedelta(days=1)))
+    return q.first() is not None
+
+
+def distribution_stats(start=None, end=None, metrics=None, quantiles=DEFAULT_QUANTILES):
+    """
+    Count, mean, min/max, estimated quantiles and histogram of each metric
+    over the whole days of [start, end], by merging the daily sketches.
+    Raises ValueError for an unknown metric or a quantile outside [0, 1],
+    and DistributionsMissing when the window has trips but no sketches.
+    """
+    metrics = list(metrics or DISTRIBUTION_METRICS)
+    unknown = [m for m in metrics if m not in DISTRIBUTION_METRICS]
+    if unknown:
+        raise ValueError(f"unknown metrics {unknown}; expected some of {list(DISTRIBUTION_METRICS)}")
+    if any(not 0.0 <= q <= 1.0 for q in quantiles):
+        raise ValueError("quantiles must be between 0 and 1")
+
+    q = TripDistribution.query.filter(TripDistribution.metric.in_(metrics))
+    if start is not None:
+        q = q.filter(TripDistribution.date >= start.date())
+    if end is not None:
+        q = q.filter(TripDistribution.date <= end.date())
+    by_metric = {m: [] for m in metrics}
+    for row in q.all():
+        by_metric[row.metric].append(row)
+    if not any(by_metric.values()) and _has_trips(start, end):
+        raise DistributionsMissing("no distributions have been built for this window; "
+                                   "run scripts/rebuild_rollups.py")
+
+    result = {}
+    for metric, rows in by_metric.items():
+        digest = TDigest.merged([
+            TDigest(np.frombuffer(r.centroid_means, dtype=np.float64),
+                    np.frombuffer(r.centroid_weights, dtype=np.float64),
+                    r.min_value, r.max_value)
+            for r in rows if r.value_count
+        ])
+        counts = np.zeros(DISTRIBUTION_METRICS[metric][2] + 2, dtype=np.int64)
+        for r in rows:
+            counts += np.frombuffer(r.histogram, dtype=np.int64)
+        value_count = sum(r.value_count for r in rows)
+        value_sum = sum(r.value_sum for r in rows)
+        result[metric] = {
+            "count": value_count,
+            "mean": value_sum / value_count if value_count else None,
+            "min": _finite(digest.min),
+            "max": _finite(digest.max),
+            "quantiles": {quantile_label(p): _finite(v) for p, v in zip(quantiles, digest.quantiles(quantiles))},
+            "histogram": {
+                "edges": histogram_edges(metric).tolist(),
+                "counts": counts[1:-1].tolist(),
+                "below": int(counts[0]),
+                "above": int(counts[-1]),
+            },
+        }
+    return result
@@ -1,34 +1,377 @@
 import os
-from ..etl_steps.loader import iter_csv_in_chunks, extract_csv_from_zip
+import queue
+import shutil
+import threading
+import tracemalloc
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..etl_steps.loader import iter_csv_in_chunks, iter_parquet_in_chunks, PARTITION_COLUMN
 from ..etl_steps.cleaner import basic_clean
 from ..etl_steps.feature_engineering import apply_feature_engineering
+from ..etl_steps.quarantine import QuarantineWriter
+from ..etl_steps.profiling import StageProfiler, NULL_PROFILER
+from .trip_loader import TripSink
+from .distributions import DistributionBuilder, DISTRIBUTION_METRICS, distributions_path, write_distribution_file
+from .checkpoint import (Checkpoint, manifest_path, committed_spans, committed_prefix,
+                         check_resumable, imported_window)
 from logging import getLogger
 
 logger = getLogger(__name__)
 
-def run_etl_from_csv(csv_path, output_path, chunksize=50000):
+def transform_chunk(chunk, keep_rejected=False, profile=False, trace_memory=False, sketch=False):
     """
-    Read csv in chunks, clean, enrich, and append to a processed CSV.
-    Keeps a log of removed rows counts via logger.
+    Clean and enrich one raw chunk. Module-level so process pool workers can
+    pickle it. Returns (input rows, enriched df or None if empty, reasons,
+    rejected rows with reject_reason or None unless keep_rejected, the
+    chunk's DistributionBuilder or None unless sketch, stage timings as
+    StageProfiler.stages or None unless profile).
     """
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    profiler = StageProfiler(trace_memory) if profile else NULL_PROFILER
+    # pool workers trace their own allocations
+    own_trace = profile and trace_memory and not tracemalloc.is_tracing()
+    if own_trace:
+        tracemalloc.start()
+    try:
+        cleaned_chunk, removed_df, reasons = basic_clean(chunk, return_removed=keep_rejected, profiler=profiler)
+        rejected = removed_df if keep_rejected else None
+        enriched = None
+        if not cleaned_chunk.empty:
+            with profiler.stage("feature_engineering", len(cleaned_chunk)):
+                enriched = apply_feature_engineering(cleaned_chunk)
+        sketches = None
+        if sketch:
+            sketches = DistributionBuilder()
+            if enriched is not None:
+                with profiler.stage("distributions", len(enriched)):
+                    sketches.add(enriched)
+    finally:
+        if own_trace:
+            tracemalloc.stop()
+    return len(chunk), enriched, reasons, rejected, sketches, profiler.stages if profile else None
+
+
+def transform_chunks(csv_path, chunksize=50000, workers=1, max_in_flight=None, read_options=None,
+                     keep_rejected=False, skip_rows=0, profiler=None, sketch=False):
+    """
+    Yield (input rows, enriched, reasons, rejected, sketches) from
+    transform_chunk in input order. With workers > 1 chunks are processed on a process pool,
+    with at most `max_in_flight` (default 2 * workers) chunks submitted but
+    not yet yielded to bound memory.
+    read_options are passed to iter_csv_in_chunks (typed, prune_columns, engine);
+    the first skip_rows raw rows are skipped. With a StageProfiler, CSV
+    parsing and every transform stage (also from pool workers) are timed.
+    """
+    chunks = iter_csv_in_chunks(csv_path, chunksize=chunksize, skip_rows=skip_rows, **(read_options or {}))
+    profile = profiler is not None
+    trace_memory = profile and profiler.trace_memory
+    if profile:
+        chunks = profiler.iterate("csv_parse", chunks)
+
+    def collect(result):
+        *result, stages = result
+        if stages:
+            profiler.merge(stages)
+        return tuple(result)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield collect(transform_chunk(chunk, keep_rejected, profile, trace_memory, sketch))
+        return
+
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(transform_chunk, chunk, keep_rejected, profile, trace_memory, sketch))
+            if len(pending) >= max_in_flight:
+                yield collect(pending.popleft().result())
+        while pending:
+            yield collect(pending.popleft().result())
+
+
+def log_removed(removed_by_reason):
+    for reason, count in removed_by_reason.items():
+        logger.info(f"Removed {count} rows in total for reason: {reason}")
+
+
+def prepare_parquet_output(output_dir):
+    """
+    Create the parquet output directory, removing partitions of a previous
+    run (the parquet equivalent of overwriting the CSV).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name in os.listdir(output_dir):
+        if name.startswith(f"{PARTITION_COLUMN}="):
+            shutil.rmtree(os.path.join(output_dir, name))
+
+
+def write_parquet_chunk(df, output_dir, chunk_index, schema=None):
+    """
+    Append one enriched chunk to a parquet dataset partitioned by pickup date.
+    Pass the schema returned for the first chunk so every file agrees on types.
+    Returns the arrow schema written.
+    """
+    df = df.assign(**{PARTITION_COLUMN: df['pickup_datetime'].dt.strftime('%Y-%m-%d')})
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        output_dir,
+        partition_cols=[PARTITION_COLUMN],
+        basename_template=f"part-{chunk_index:06d}-{{i}}.parquet",
+    )
+    return table.schema
+
+
+def resume_parquet_output(output_dir, chunk_index):
+    """
+    Drop parquet files written for chunks at or after `chunk_index` (written
+    after the last checkpoint) and return the schema of the remaining files,
+    so a resumed run keeps writing the same types. None if nothing is left.
+    """
+    schema = None
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            if not (name.startswith("part-") and name.endswith(".parquet")):
+                continue
+            path = os.path.join(root, name)
+            if int(name.split("-")[1]) >= chunk_index:
+                os.remove(path)
+            elif schema is None:
+                schema = pq.read_schema(path).append(pa.field(PARTITION_COLUMN, pa.string()))
+    return schema
+
+
+def sketch_output(output_path, output_format, builder, chunksize=50000):
+    """
+    Add the trips already written to a processed CSV or parquet output to
+    `builder`, reading only the pickup time and the distribution metrics.
+    """
+    columns = ["pickup_datetime", *DISTRIBUTION_METRICS]
+    if output_format == "parquet":
+        chunks = iter_parquet_in_chunks(output_path, chunksize=chunksize, columns=columns)
+    else:
+        chunks = pd.read_csv(output_path, usecols=columns, parse_dates=["pickup_datetime"], chunksize=chunksize)
+    for df in chunks:
+        builder.add(df)
+
+
+def run_etl_from_csv(csv_path, output_path, chunksize=50000, workers=1, max_in_flight=None,
+                     output_format="csv", read_options=None, quarantine_path=None,
+                     resume=False, checkpoint_path=None, profiler=None):
+    """
+    Read csv in chunks, clean, enrich, and append to a processed CSV, or with
+    output_format="parquet" to a parquet dataset directory partitioned by
+    pickup date (pickup_date=YYYY-MM-DD/) that keeps column dtypes.
+    Chunks are transformed on `workers` processes when workers > 1; output
+    order is unchanged. Keeps a log of removed rows counts via logger, and
+    with quarantine_path streams the removed rows to that file.
+    After each chunk is written a checkpoint manifest (default
+    <output_path>.etl-checkpoint.json) records the raw rows consumed and the
+    output written; resume=True continues an interrupted run from it.
+    Per-day t-digests and histograms of the written trips (see
+    DistributionBuilder) are built alongside, on the pool workers too, and
+    saved to distributions_path(output_path) once the run completes.
+    A StageProfiler times parsing, each cleaning step and the writes.
+    Returns a dict of removed row counts per reason.
+    """
+    checkpoint = Checkpoint(checkpoint_path or manifest_path(output_path, "etl"), csv_path)
+    saved = checkpoint.load() if resume else {}
+    if saved and (saved.get("output_path") != output_path or saved.get("output_format") != output_format):
+        logger.warning(f"Checkpoint {checkpoint.path} is for another output; starting over")
+        saved = {}
+    if saved.get("complete"):
+        logger.info(f"ETL of {csv_path} already completed; nothing to resume")
+        return saved.get("removed", {})
+
     first_write = True
-    total_in = 0
-    total_out = 0
-    for chunk in iter_csv_in_chunks(csv_path, chunksize=chunksize):
-        total_in += len(chunk)
-        cleaned_chunk, removed_df, reasons = basic_clean(chunk)
-        if cleaned_chunk.empty:
-            logger.info("Chunk cleaned to empty; skipping.")
-            continue
-        enriched = apply_feature_engineering(cleaned_chunk)
-        # write to CSV (append)
-        if first_write:
-            enriched.to_csv(output_path, index=False, mode='w')
-            first_write = False
+    schema = None
+    chunk_index = saved.get("chunk_index", 0)
+    if output_format == "parquet":
+        if saved:
+            schema = resume_parquet_output(output_path, chunk_index)
         else:
-            enriched.to_csv(output_path, index=False, header=False, mode='a')
-        total_out += len(enriched)
-        logger.info(f"Processed chunk: input {len(chunk)} -> output {len(enriched)}")
+            prepare_parquet_output(output_path)
+    else:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if saved.get("output_position"):
+            with open(output_path, "r+b") as f:
+                f.truncate(saved["output_position"])
+            first_write = False
+    total_in = saved.get("offset", 0)
+    total_out = saved.get("rows_written", 0)
+    removed_by_reason = Counter(saved.get("removed", {}))
+    if saved:
+        logger.info(f"Resuming ETL of {csv_path} after {total_in} raw rows ({total_out} written)")
+
+    # the sketches of output kept from an interrupted run are rebuilt from it
+    distributions = DistributionBuilder()
+    if os.path.exists(distributions_path(output_path)):
+        os.remove(distributions_path(output_path))
+    if saved and total_out:
+        sketch_output(output_path, output_format, distributions, chunksize)
+
+    quarantine = None
+    if quarantine_path:
+        quarantine = QuarantineWriter(quarantine_path, saved.get("quarantine_position") if saved else None)
+    checkpoint.state = {"output_path": output_path, "output_format": output_format, "unit": "rows"}
+    stages = profiler or NULL_PROFILER
+    try:
+        for rows_in, enriched, reasons, rejected, sketches in transform_chunks(
+                csv_path, chunksize, workers, max_in_flight, read_options, quarantine is not None,
+                skip_rows=total_in, profiler=profiler, sketch=True):
+            total_in += rows_in
+            distributions.merge(sketches)
+            for reason, count in reasons:
+                removed_by_reason[reason] += count
+            if quarantine is not None:
+                with stages.stage("quarantine_write", len(rejected)):
+                    quarantine.write(rejected)
+            if enriched is None:
+                logger.info("Chunk cleaned to empty; skipping.")
+            else:
+                with stages.stage("write", len(enriched)):
+                    if output_format == "parquet":
+                        schema = write_parquet_chunk(enriched, output_path, chunk_index, schema)
+                        chunk_index += 1
+                    # write to CSV (append)
+                    elif first_write:
+                        enriched.to_csv(output_path, index=False, mode='w')
+                        first_write = False
+                    else:
+                        enriched.to_csv(output_path, index=False, header=False, mode='a')
+                total_out += len(enriched)
+                logger.info(f"Processed chunk: input {rows_in} -> output {len(enriched)}")
+            with stages.stage("checkpoint"):
+                checkpoint.save(
+                    offset=total_in,
+                    rows_written=total_out,
+                    chunk_index=chunk_index,
+                    output_position=0 if first_write or output_format == "parquet" else os.path.getsize(output_path),
+                    quarantine_position=quarantine.position() if quarantine is not None else None,
+                    removed=dict(removed_by_reason),
+                    complete=False,
+                )
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+    with stages.stage("distributions_write"):
+        write_distribution_file(distributions_path(output_path), distributions)
+    checkpoint.save(complete=True)
+    log_removed(removed_by_reason)
     logger.info(f"ETL finished. Total in {total_in}, total out {total_out}")
-    return True
+    return dict(removed_by_reason)
+
+
+def run_etl_to_db(csv_path, engine, chunksize=50000, queue_size=2, workers=1, max_in_flight=None,
+                  read_options=None, quarantine_path=None, resume=False, checkpoint_path=None,
+                  profiler=None):
+    """
+    Fused pipeline: clean and enrich chunks and load them straight into the
+    trips table, skipping the intermediate processed CSV. A loader thread
+    drains a bounded queue so transform and load overlap while at most
+    `queue_size` transformed chunks are held in memory. `workers`,
+    `max_in_flight` and `read_options` are passed to transform_chunks;
+    rejected rows go to quarantine_path when given.
+    Each chunk commits together with an import_batches row keyed on the raw
+    file's fingerprint and row offsets, then a checkpoint manifest (default
+    <csv_path>.etl-db-checkpoint.json) is saved. resume=True skips the rows
+    already committed; a file with committed rows is refused without it.
+    A StageProfiler times the transform stages and, on the loader thread,
+    the database writes (its memory peaks then overlap the transform).
+    Returns (rows loaded, first pickup, last pickup) over the whole file.
+    """
+    checkpoint = Checkpoint(checkpoint_path or manifest_path(csv_path, "etl-db"), csv_path)
+    source = checkpoint.fingerprint
+    with engine.connect() as connection:
+        committed = committed_spans(connection, source, "rows")
+        base_rows = imported_window(connection, source, "rows")[0] or 0
+    check_resumable(committed, csv_path, resume)
+    skip_rows = committed_prefix(committed)
+    saved = checkpoint.load() if resume else {}
+    if saved.get("offset", 0) != skip_rows:
+        # the manifest lags the ledger by the chunk committed before a crash
+        logger.warning(f"Checkpoint offset {saved.get('offset', 0)} != committed offset {skip_rows}; "
+                       f"removed-row counts and quarantine may miss one chunk")
+        saved = {}
+    if skip_rows:
+        logger.info(f"Resuming ETL to database of {csv_path} after {skip_rows} raw rows ({base_rows} loaded)")
+
+    chunks = queue.Queue(maxsize=queue_size)
+    state = {"rows": 0, "error": None}
+    checkpoint.state = {"unit": "rows"}
+    stages = profiler or NULL_PROFILER
+
+    def load():
+        sink = None
+        try:
+            sink = TripSink(engine)
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                if state["error"] is None:
+                    start, stop, df, progress = item
+                    batch = (source, "rows", start, stop)
+                    if df is None:
+                        sink.record_empty(batch)
+                    else:
+                        with stages.stage("db_write", len(df)):
+                            state["rows"] += sink.write(df, batch)
+                        logger.info(f"Loaded chunk of {len(df)} rows; {state['rows']} so far")
+                    with stages.stage("checkpoint"):
+                        checkpoint.save(offset=stop, rows_written=base_rows + state["rows"],
+                                        complete=False, **progress)
+        except Exception as e:
+            state["error"] = e
+            # keep draining so the producer never blocks on a full queue
+            while chunks.get() is not None:
+                pass
+        finally:
+            if sink is not None:
+                sink.close()
+
+    loader = threading.Thread(target=load, name="etl-loader", daemon=True)
+    loader.start()
+
+    total_in = skip_rows
+    removed_by_reason = Counter(saved.get("removed", {}))
+    quarantine = None
+    if quarantine_path:
+        quarantine = QuarantineWriter(quarantine_path, saved.get("quarantine_position") if saved else None)
+    try:
+        for rows_in, enriched, reasons, rejected, _ in transform_chunks(
+                csv_path, chunksize, workers, max_in_flight, read_options, quarantine is not None,
+                skip_rows=skip_rows, profiler=profiler):
+            if state["error"] is not None:
+                break
+            start, total_in = total_in, total_in + rows_in
+            for reason, count in reasons:
+                removed_by_reason[reason] += count
+            if quarantine is not None:
+                with stages.stage("quarantine_write", len(rejected)):
+                    quarantine.write(rejected)
+            if enriched is None:
+                logger.info("Chunk cleaned to empty; skipping.")
+            progress = {
+                "quarantine_position": quarantine.position() if quarantine is not None else None,
+                "removed": dict(removed_by_reason),
+            }
+            chunks.put((start, total_in, enriched, progress))
+    finally:
+        chunks.put(None)
+        loader.join()
+        if quarantine is not None:
+            quarantine.close()
+
+    if state["error"] is not None:
+        raise state["error"]
+    checkpoint.save(complete=True)
+    log_removed(removed_by_reason)
+    with engine.connect() as connection:
+        rows, first_pickup, last_pickup = imported_window(connection, source, "rows")
+    logger.info(f"ETL to database finished. Total in {total_in}, loaded {state['rows']} this run, "
+                f"{rows or 0} in total")
+    return int(rows or 0), first_pickup, last_pickup
@@ -0,0 +1,97 @@
+from datetime import date
+from logging import getLogger
+from sqlalchemy import text
+
+logger = getLogger(__name__)
+
+PARTITIONED_TABLE = "trips"
+# pg_advisory_xact_lock key serializing partition creation across loaders
+PARTITION_LOCK_KEY = 7460211
+
+# engine url -> partition names known to exist
+_known_partitions = {}
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARTITIONED_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def month_partitions(first, last):
+    """
+    (name, lower, upper) of the monthly partitions covering first..last.
+    """
+    month = month_start(first)
+    end = month_start(last)
+    partitions = []
+    while month <= end:
+        upper = next_month(month)
+        partitions.append((partition_name(month), month, upper))
+        month = upper
+    return partitions
+
+
+def existing_partitions(connection):
+    """
+    Names of the partitions of trips, or None when trips is not a
+    partitioned table (SQLite, or PostgreSQL before the migration).
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    partitioned = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+        {"t": PARTITIONED_TABLE},
+    ).scalar()
+    if not partitioned:
+        return None
+    rows = connection.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:t)"),
+        {"t": PARTITIONED_TABLE},
+    )
+    return {name for name, in rows}
+
+
+def ensure_month_partitions(engine, first, last):
+    """
+    Create the monthly partitions of trips needed for pickups first..last
+    before they are loaded. A no-op when trips is not partitioned. Runs in
+    its own short transaction under an advisory lock so concurrent loaders
+    never race on the same month; known partitions are cached so the
+    common case issues no query at all. Returns the partitions created.
+    """
+    if first is None or last is None or engine.dialect.name != "postgresql":
+        return []
+    key = str(engine.url)
+    wanted = month_partitions(first, last)
+    known = _known_partitions.get(key, set())
+    if all(name in known for name, _, _ in wanted):
+        return []
+
+    created = []
+    with engine.begin() as connection:
+        existing = existing_partitions(connection)
+        if existing is not None and any(name not in existing for name, _, _ in wanted):
+            connection.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": PARTITION_LOCK_KEY})
+            existing = existing_partitions(connection)
+            for name, lower, upper in wanted:
+                if name in existing:
+                    continue
+                connection.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} "
+                    f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+                ))
+                existing.add(name)
+                created.append(name)
+    if existing is not None:
+        _known_partitions[key] = existing
+    if created:
+        logger.info(f"Created trips partitions: {', '.join(created)}")
+    return created
@@ -0,0 +1,221 @@
+import contextvars
+import threading
+import time
+from logging import getLogger
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Stats of the request being served; copied into threads started with
+# contextvars.copy_context() so their statements count too
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """
+    SQL statements and DB time of one request. Only the `max_statements`
+    slowest statements are kept (with their parameters) for the slow log.
+    """
+
+    def __init__(self, max_statements=10):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.max_statements = max_statements
+        self.slowest = []
+        self._lock = threading.Lock()
+
+    def add_statement(self, seconds, statement, parameters):
+        with self._lock:
+            self.statements += 1
+            self.db_seconds += seconds
+            if len(self.slowest) < self.max_statements:
+                self.slowest.append((seconds, statement, parameters))
+                return
+            fastest = min(range(len(self.slowest)), key=lambda i: self.slowest[i][0])
+            if seconds > self.slowest[fastest][0]:
+                self.slowest[fastest] = (seconds, statement, parameters)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label tuple, rendered in the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            label_text = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            sep = "," if label_text else ""
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text}{sep}le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{label_text}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the per-statement execution context, so a statement that fails
+    # (and never fires after_cursor_execute) leaves nothing behind
+    if context is not None:
+        context._request_metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_request_metrics_start", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.add_statement(seconds, statement, parameters)
+
+
+class RequestMetrics:
+    """
+    App extension recording per-endpoint latency, SQL statement counts, DB
+    time (through engine cursor events) and response sizes, exposed by
+    render() in Prometheus text format. Requests slower than
+    SLOW_REQUEST_SECONDS are logged with their slowest statements and
+    bound parameters.
+    """
+
+    _listening = False
+
+    def __init__(self, slow_seconds=1.0, slow_statements=10):
+        self.slow_seconds = slow_seconds
+        self.slow_statements = slow_statements
+        self._lock = threading.Lock()
+        labels = ("method", "endpoint", "status")
+        self.latency = Histogram("http_request_duration_seconds", "Request latency in seconds.",
+                                 labels, LATENCY_BUCKETS)
+        self.statements = Histogram("http_request_db_statements", "SQL statements executed per request.",
+                                    labels, STATEMENT_BUCKETS)
+        self.db_time = Histogram("http_request_db_seconds", "Time spent in SQL statements per request.",
+                                 labels, LATENCY_BUCKETS)
+        self.sizes = Histogram("http_response_size_bytes", "Response body size in bytes.",
+                               labels, SIZE_BUCKETS)
+        self.extensions = None
+
+    def init_app(self, app):
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+        self.slow_seconds = app.config.get("SLOW_REQUEST_SECONDS", self.slow_seconds)
+        self.slow_statements = app.config.get("SLOW_REQUEST_STATEMENTS", self.slow_statements)
+        self.extensions = app.extensions
+        app.extensions["request_metrics"] = self
+        if not RequestMetrics._listening:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            RequestMetrics._listening = True
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.request_stats = RequestStats(self.slow_statements)
+        _current.set(g.request_stats)
+
+    def _after_request(self, response):
+        stats = g.pop("request_stats", None)
+        if stats is None:
+            return response
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = (request.method, rule, str(response.status_code))
+        path = request.full_path.rstrip("?")
+
+        if response.is_streamed:
+            # streamed bodies (ndjson) are measured once they have been sent
+            response.response = self._counted(response.response, stats)
+            response.call_on_close(lambda: self._finish(stats, labels, path))
+        else:
+            stats.response_bytes = response.calculate_content_length() or 0
+            self._finish(stats, labels, path)
+        return response
+
+    @staticmethod
+    def _counted(chunks, stats):
+        for chunk in chunks:
+            stats.response_bytes += len(chunk)
+            yield chunk
+
+    def _finish(self, stats, labels, path):
+        if _current.get() is stats:
+            _current.set(None)
+        seconds = time.perf_counter() - stats.started
+        with self._lock:
+            self.latency.observe(labels, seconds)
+            self.statements.observe(labels, stats.statements)
+            self.db_time.observe(labels, stats.db_seconds)
+            self.sizes.observe(labels, stats.response_bytes)
+        if self.slow_seconds and seconds >= self.slow_seconds:
+            method, rule, status = labels
+            slowest = "".join(
+                f"\n  {s * 1000:.1f} ms: {statement} params={parameters!r}"
+                for s, statement, parameters in sorted(stats.slowest, key=lambda x: x[0], reverse=True)
+            )
+            logger.warning(
+                f"Slow request {method} {path} ({rule}) -> {status} in {seconds * 1000:.1f} ms: "
+                f"{stats.statements} statements, {stats.db_seconds * 1000:.1f} ms in SQL, "
+                f"{stats.response_bytes} bytes{slowest}"
+            )
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = []
+            for histogram in (self.latency, self.statements, self.db_time, self.sizes):
+                lines += histogram.render()
+        cache = self.extensions.get("response_cache") if self.extensions is not None else None
+        if cache is not None:
+            stats = cache.stats()
+            lines += [
+                "# HELP response_cache_requests_total Response cache lookups by result.",
+                "# TYPE response_cache_requests_total counter",
+                f'response_cache_requests_total{{result="hit"}} {stats["hits"]}',
+                f'response_cache_requests_total{{result="miss"}} {stats["misses"]}',
+                "# HELP response_cache_bytes Bytes held by the response cache.",
+                "# TYPE response_cache_bytes gauge",
+                f"response_cache_bytes {stats['bytes']}",
+            ]
+        startup = self.extensions.get("startup") if self.extensions is not None else None
+        if startup is not None:
+            lines += [
+                "# HELP app_startup_phase_seconds Time spent in each phase of building the app.",
+                "# TYPE app_startup_phase_seconds gauge",
+            ]
+            lines += [f'app_startup_phase_seconds{{phase="{_escape(name)}"}} {seconds}'
+                      for name, seconds in startup.phases.items()]
+        return "\n".join(lines) + "\n"
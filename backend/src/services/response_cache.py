@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Process-local LRU of serialized API responses, bounded by the total size
+    of the cached bodies. Keys must include the dataset version so entries
+    go stale exactly when an import bumps it. The version itself is re-read
+    at most every `version_ttl` seconds.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, version_ttl=1.0):
+        self.max_bytes = max_bytes
+        self.version_ttl = version_ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_read_at = 0.0
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get("RESPONSE_CACHE_BYTES", self.max_bytes)
+        self.version_ttl = app.config.get("DATASET_VERSION_TTL", self.version_ttl)
+        app.extensions["response_cache"] = self
+
+    def dataset_version(self, load):
+        """
+        Cached result of load(), refreshed after version_ttl seconds.
+        Entries of an older version can never be hit again, so they are
+        dropped as soon as a new version is seen.
+        """
+        now = time.monotonic()
+        if self._version is None or now - self._version_read_at >= self.version_ttl:
+            version = load()
+            if self._version is not None and version != self._version:
+                self.clear()
+            self._version = version
+            self._version_read_at = now
+        return self._version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        """
+        Store a response body; returns (body, etag). Bodies larger than the
+        whole cache are returned without being stored.
+        """
+        entry = (body, hashlib.sha1(body).hexdigest())
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        self._version = None
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,212 @@
+from datetime import date, datetime, time, timedelta
+from logging import getLogger
+from sqlalchemy import func, insert, literal
+from ..models.trip import Trip
+from ..models.rollup import HourlyTripRollup, DailyTripRollup, TripFlowRollup
+
+logger = getLogger(__name__)
+
+# Grid resolutions (CELL_RESOLUTIONS suffixes) kept in the flow rollup; block
+# level pairs are too sparse to be worth aggregating
+FLOW_RESOLUTIONS = ("d1", "d2")
+
+
+def parse_window(start, end):
+    """
+    Parse the ISO `start`/`end` query strings used by the trip endpoints.
+    Missing values stay None (unbounded). Raises ValueError on bad input.
+    """
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt = datetime.fromisoformat(end) if end else None
+    return start_dt, end_dt
+
+
+def midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def filter_window(q, column, lo=None, hi=None, hi_inclusive=True):
+    """
+    Apply a pickup-time range to a query. `hi` is inclusive by default to
+    match the `end` semantics of the API.
+    """
+    if lo is not None:
+        q = q.filter(column >= lo)
+    if hi is not None:
+        q = q.filter(column <= hi if hi_inclusive else column < hi)
+    return q
+
+
+def split_window(start, end):
+    """
+    Split an inclusive [start, end] pickup window into whole days that can be
+    answered from the rollup tables and the partial-day edges that still need
+    a scan of raw trips.
+
+    Returns (days, raw_ranges):
+      - days: (first_day, end_day) with rollup rows first_day <= date < end_day,
+        either bound None when the window is open; None if no day is whole
+      - raw_ranges: list of (lo, hi, hi_inclusive) to scan on trips
+    """
+    first_day = None
+    if start is not None:
+        first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    end_day = end.date() if end is not None else None
+
+    if first_day is not None and end_day is not None and first_day >= end_day:
+        return None, [(start, end, True)]
+
+    raw_ranges = []
+    if start is not None and start.time() != time.min:
+        raw_ranges.append((start, midnight(first_day), False))
+    if end is not None:
+        raw_ranges.append((midnight(end_day), end, True))
+    return (first_day, end_day), raw_ranges
+
+
+def filter_days(q, column, days):
+    first_day, end_day = days
+    if first_day is not None:
+        q = q.filter(column >= first_day)
+    if end_day is not None:
+        q = q.filter(column < end_day)
+    return q
+
+
+def _as_date(value):
+    # SQLite returns date() as a string, PostgreSQL as a date
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def refresh_rollups(session, first_day, last_day):
+    """
+    Recompute rollup rows for pickup dates first_day..last_day (inclusive)
+    from the trips table. Idempotent, so it is safe to rerun after a partial
+    import.
+    """
+    lo = midnight(first_day)
+    hi = midnight(last_day + timedelta(days=1))
+    pickup_date = func.date(Trip.pickup_datetime)
+
+    hourly = (
+        session.query(
+            pickup_date,
+            Trip.pickup_hour,
+            func.count(Trip.id),
+            func.sum(Trip.average_speed_kmph),
+            func.count(Trip.average_speed_kmph),
+        )
+        .filter(Trip.pickup_datetime >= lo, Trip.pickup_datetime < hi)
+        .filter(Trip.pickup_hour.isnot(None))
+        .group_by(pickup_date, Trip.pickup_hour)
+        .all()
+    )
+
+    daily = (
+        session.query(
+            pickup_date,
+            func.count(Trip.id),
+            func.sum(Trip.trip_distance),
+            func.count(Trip.trip_distance),
+            func.sum(Trip.fare_amount),
+            func.count(Trip.fare_amount),
+            func.sum(Trip.average_speed_kmph),
+            func.count(Trip.average_speed_kmph),
+        )
+        .filter(Trip.pickup_datetime >= lo, Trip.pickup_datetime < hi)
+        .group_by(pickup_date)
+        .all()
+    )
+
+    try:
+        session.query(HourlyTripRollup).filter(
+            HourlyTripRollup.date >= first_day, HourlyTripRollup.date <= last_day
+        ).delete(synchronize_session=False)
+        session.bulk_insert_mappings(HourlyTripRollup, [
+            {
+                "date": _as_date(day),
+                "pickup_hour": hour,
+                "trip_count": count,
+                "speed_sum": speed_sum or 0.0,
+                "speed_count": speed_count,
+            }
+            for day, hour, count, speed_sum, speed_count in hourly
+        ])
+        session.query(DailyTripRollup).filter(
+            DailyTripRollup.date >= first_day, DailyTripRollup.date <= last_day
+        ).delete(synchronize_session=False)
+        session.bulk_insert_mappings(DailyTripRollup, [
+            {
+                "date": _as_date(day),
+                "trip_count": count,
+                "distance_sum": distance_sum or 0.0,
+                "distance_count": distance_count,
+                "fare_sum": fare_sum or 0.0,
+                "fare_count": fare_count,
+                "speed_sum": speed_sum or 0.0,
+                "speed_count": speed_count,
+            }
+            for day, count, distance_sum, distance_count, fare_sum, fare_count, speed_sum, speed_count in daily
+        ])
+        flows = _refresh_flows(session, first_day, last_day, lo, hi)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    logger.info(
+        f"Refreshed rollups for {first_day} to {last_day}: "
+        f"{len(hourly)} hourly rows, {len(daily)} daily rows, {flows} flow rows"
+    )
+
+
+def _refresh_flows(session, first_day, last_day, lo, hi):
+    """
+    Replace the flow rollup rows of first_day..last_day, aggregated in the
+    database (INSERT ... SELECT) since the pair count can be large.
+    Returns the number of rows written.
+    """
+    session.query(TripFlowRollup).filter(
+        TripFlowRollup.date >= first_day, TripFlowRollup.date <= last_day
+    ).delete(synchronize_session=False)
+    pickup_date = func.date(Trip.pickup_datetime)
+    written = 0
+    for suffix in FLOW_RESOLUTIONS:
+        origin = getattr(Trip, f"pickup_cell_{suffix}")
+        destination = getattr(Trip, f"dropoff_cell_{suffix}")
+        rows = (
+            session.query(
+                literal(suffix),
+                origin,
+                destination,
+                pickup_date,
+                func.count(Trip.id),
+                func.coalesce(func.sum(Trip.trip_duration), 0.0),
+                func.count(Trip.trip_duration),
+                func.coalesce(func.sum(Trip.fare_amount), 0.0),
+                func.count(Trip.fare_amount),
+                func.coalesce(func.sum(Trip.average_speed_kmph), 0.0),
+                func.count(Trip.average_speed_kmph),
+            )
+            .filter(Trip.pickup_datetime >= lo, Trip.pickup_datetime < hi)
+            .filter(origin.isnot(None), destination.isnot(None))
+            .group_by(origin, destination, pickup_date)
+        )
+        result = session.execute(insert(TripFlowRollup).from_select([
+            "resolution", "origin_cell", "destination_cell", "date", "trip_count",
+            "duration_sum", "duration_count", "fare_sum", "fare_count", "speed_sum", "speed_count",
+        ], rows.statement))
+        written += result.rowcount
+    return written
+
+
+def rebuild_all_rollups(session):
+    """
+    Rebuild the rollups for every pickup date present in trips.
+    """
+    lo, hi = session.query(func.min(Trip.pickup_datetime), func.max(Trip.pickup_datetime)).one()
+    if lo is None:
+        logger.info("No trips found; nothing to roll up.")
+        return
+    refresh_rollups(session, lo.date(), hi.date())
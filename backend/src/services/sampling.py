@@ -0,0 +1,242 @@
+import math
+from datetime import timedelta
+from logging import getLogger
+from sqlalchemy import func, insert, literal, select, Date
+from ..models.trip import Trip
+from ..models.trip_sample import TripSample, TripSampleStratum
+from .rollups import midnight, filter_window, _as_date
+
+logger = getLogger(__name__)
+
+# Rows are picked by a multiplicative hash of the trip id, so a refresh of
+# the same days selects the same trips.
+SAMPLE_HASH_MULTIPLIER = 2654435761
+SAMPLE_HASH_MODULUS = 1000003
+
+# two-sided 95% normal quantile
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.959963984540054
+
+SAMPLE_COLUMNS = ("pickup_datetime", "pickup_hour", "trip_distance", "fare_amount", "average_speed_kmph")
+
+
+def refresh_samples(session, first_day, last_day, fraction=0.01, min_rows=100):
+    """
+    Re-draw the stratified sample for pickup dates first_day..last_day
+    (inclusive): `fraction` of each day's trips, but at least `min_rows`
+    (or the whole day) so small days still get a usable stratum.
+    Existing samples for those days are replaced.
+    """
+    pickup_date = func.date(Trip.pickup_datetime)
+    populations = (
+        session.query(pickup_date, func.count(Trip.id))
+        .filter(Trip.pickup_datetime >= midnight(first_day),
+                Trip.pickup_datetime < midnight(last_day + timedelta(days=1)))
+        .group_by(pickup_date)
+        .all()
+    )
+    sampled = Trip.id * SAMPLE_HASH_MULTIPLIER % SAMPLE_HASH_MODULUS
+
+    try:
+        session.query(TripSample).filter(
+            TripSample.date >= first_day, TripSample.date <= last_day
+        ).delete(synchronize_session=False)
+        session.query(TripSampleStratum).filter(
+            TripSampleStratum.date >= first_day, TripSampleStratum.date <= last_day
+        ).delete(synchronize_session=False)
+
+        strata = []
+        for day, population in populations:
+            day = _as_date(day)
+            rate = min(1.0, max(fraction, min_rows / population))
+            rows = select(Trip.id, literal(day, Date), *[getattr(Trip, c) for c in SAMPLE_COLUMNS]).where(
+                Trip.pickup_datetime >= midnight(day),
+                Trip.pickup_datetime < midnight(day + timedelta(days=1)),
+            )
+            if rate < 1.0:
+                rows = rows.where(sampled < int(rate * SAMPLE_HASH_MODULUS))
+            result = session.execute(
+                insert(TripSample).from_select(["trip_id", "date", *SAMPLE_COLUMNS], rows)
+            )
+            strata.append({"date": day, "population": population, "sample_rows": result.rowcount})
+        session.bulk_insert_mappings(TripSampleStratum, strata)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    logger.info(
+        f"Refreshed trip samples for {first_day} to {last_day}: "
+        f"{sum(s['sample_rows'] for s in strata)} rows over {len(strata)} days"
+    )
+
+
+def rebuild_all_samples(session, fraction=0.01, min_rows=100):
+    """
+    Re-draw the sample for every pickup date present in trips.
+    """
+    lo, hi = session.query(func.min(Trip.pickup_datetime), func.max(Trip.pickup_datetime)).one()
+    if lo is None:
+        logger.info("No trips found; nothing to sample.")
+        return
+    refresh_samples(session, lo.date(), hi.date(), fraction=fraction, min_rows=min_rows)
+
+
+def _strata(start, end):
+    """
+    {date: (population, sample_rows)} for the days the window touches.
+    """
+    q = TripSampleStratum.query
+    if start is not None:
+        q = q.filter(TripSampleStratum.date >= start.date())
+    if end is not None:
+        q = q.filter(TripSampleStratum.date <= end.date())
+    return {s.date: (s.population, s.sample_rows) for s in q.all() if s.sample_rows}
+
+
+def estimated_window_rows(start=None, end=None):
+    """
+    Upper bound on the trips in [start, end] (whole days), read from the
+    strata table; 0 when no sample has been drawn.
+    """
+    q = TripSampleStratum.query.with_entities(func.sum(TripSampleStratum.population))
+    if start is not None:
+        q = q.filter(TripSampleStratum.date >= start.date())
+    if end is not None:
+        q = q.filter(TripSampleStratum.date <= end.date())
+    return int(q.scalar() or 0)
+
+
+def _variance_term(population, sample_rows, total, total_sq):
+    """
+    Stratum contribution to the variance of an estimated total: the values
+    are `sample_rows` draws (zero outside the window) with the given sum
+    and sum of squares.
+    """
+    if sample_rows < 2:
+        return 0.0
+    spread = max(total_sq - total * total / sample_rows, 0.0) / (sample_rows - 1)
+    return population * population * (1 - sample_rows / population) / sample_rows * spread
+
+
+class _Estimate:
+    """
+    Accumulates a stratified estimate of a count and of a mean (a ratio of
+    two estimated totals, with linearized variance) from per-stratum
+    (rows, value_count, value_sum, value_sum_sq) aggregates.
+    """
+
+    def __init__(self):
+        self.strata = []
+
+    def add(self, population, sample_rows, rows, value_count=0, value_sum=0.0, value_sum_sq=0.0):
+        self.strata.append((population, sample_rows, rows, value_count, float(value_sum or 0),
+                            float(value_sum_sq or 0)))
+
+    def count(self):
+        estimate = sum(N / n * rows for N, n, rows, *_ in self.strata)
+        variance = sum(_variance_term(N, n, rows, rows) for N, n, rows, *_ in self.strata)
+        half = CONFIDENCE_Z * math.sqrt(variance)
+        return round(estimate), [max(round(estimate - half), 0), round(estimate + half)]
+
+    def mean(self):
+        value_total = sum(N / n * s for N, n, _, _, s, _ in self.strata)
+        count_total = sum(N / n * c for N, n, _, c, _, _ in self.strata)
+        if not count_total:
+            return 0.0, [0.0, 0.0]
+        ratio = value_total / count_total
+        variance = 0.0
+        for N, n, _, c, s, ss in self.strata:
+            # residuals d = y - ratio over the rows that have a value
+            d_sum = s - ratio * c
+            d_sum_sq = ss - 2 * ratio * s + ratio * ratio * c
+            variance += _variance_term(N, n, d_sum, d_sum_sq)
+        half = CONFIDENCE_Z * math.sqrt(variance) / count_total
+        return ratio, [ratio - half, ratio + half]
+
+
+def _sample_query(*columns):
+    return TripSample.query.with_entities(TripSample.date, *columns)
+
+
+def sample_summary_stats(start=None, end=None):
+    """
+    summary_stats estimated from the stratified sample, with 95% confidence
+    intervals. None when no sampled day overlaps the window.
+    """
+    strata = _strata(start, end)
+    if not strata:
+        return None
+    metrics = ("trip_distance", "fare_amount", "average_speed_kmph")
+    columns = [func.count()]
+    for name in metrics:
+        column = getattr(TripSample, name)
+        columns += [func.count(column), func.sum(column), func.sum(column * column)]
+    q = filter_window(_sample_query(*columns), TripSample.pickup_datetime, start, end)
+
+    trips = _Estimate()
+    means = {name: _Estimate() for name in metrics}
+    sample_size = 0
+    for day, rows, *values in q.group_by(TripSample.date).all():
+        population, sample_rows = strata.get(_as_date(day), (0, 0))
+        if not sample_rows:
+            continue
+        sample_size += rows
+        trips.add(population, sample_rows, rows)
+        for i, name in enumerate(metrics):
+            means[name].add(population, sample_rows, rows, *values[3 * i:3 * i + 3])
+
+    total, total_ci = trips.count()
+    (distance, distance_ci), (fare, fare_ci), (speed, speed_ci) = (means[name].mean() for name in metrics)
+    return {
+        "total_trips": total,
+        "avg_distance": distance,
+        "avg_fare": fare,
+        "avg_speed_kmph": speed,
+        "approximate": True,
+        "sample_size": sample_size,
+        "confidence_level": CONFIDENCE_LEVEL,
+        "confidence_intervals": {
+            "total_trips": total_ci,
+            "avg_distance": distance_ci,
+            "avg_fare": fare_ci,
+            "avg_speed_kmph": speed_ci,
+        },
+    }
+
+
+def sample_hourly_stats(start=None, end=None):
+    """
+    hourly_stats estimated from the stratified sample, with 95% confidence
+    intervals per hour. None when no sampled day overlaps the window.
+    """
+    strata = _strata(start, end)
+    if not strata:
+        return None
+    speed = TripSample.average_speed_kmph
+    q = _sample_query(TripSample.pickup_hour, func.count(), func.count(speed), func.sum(speed),
+                      func.sum(speed * speed))
+    q = filter_window(q, TripSample.pickup_datetime, start, end)
+
+    hours = [_Estimate() for _ in range(24)]
+    sample_size = 0
+    for day, hour, rows, *values in q.group_by(TripSample.date, TripSample.pickup_hour).all():
+        population, sample_rows = strata.get(_as_date(day), (0, 0))
+        if hour is None or not 0 <= hour < 24 or not sample_rows:
+            continue
+        sample_size += rows
+        hours[hour].add(population, sample_rows, rows, *values)
+
+    trips = [h.count() for h in hours]
+    speeds = [h.mean() for h in hours]
+    return {
+        "hours": list(range(24)),
+        "trips": [t for t, _ in trips],
+        "speeds": [s for s, _ in speeds],
+        "approximate": True,
+        "sample_size": sample_size,
+        "confidence_level": CONFIDENCE_LEVEL,
+        "confidence_intervals": {
+            "trips": [ci for _, ci in trips],
+            "speeds": [ci for _, ci in speeds],
+        },
+    }
@@ -0,0 +1,39 @@
+from sqlalchemy import Integer, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class grid_floor(FunctionElement):
+    """
+    floor(value / cell_size) as an integer, i.e. the SQL side of
+    coord_to_cell. SQLite builds without the math extension have no
+    floor(), so it is spelled with a truncating CAST there.
+    """
+    type = Integer()
+    inherit_cache = True
+    name = "grid_floor"
+
+    def __init__(self, value, cell_size_deg):
+        # cell size is inlined (not bound) so the same expression text can
+        # appear in both SELECT and GROUP BY, and still keys the SQL cache
+        super().__init__(value, literal_column(repr(float(cell_size_deg))))
+
+
+@compiles(grid_floor)
+def _grid_floor_default(element, compiler, **kw):
+    value, cell_size = [compiler.process(c, **kw) for c in element.clauses]
+    return "CAST(floor(%s / %s) AS INTEGER)" % (value, cell_size)
+
+
+@compiles(grid_floor, "sqlite")
+def _grid_floor_sqlite(element, compiler, **kw):
+    value, cell_size = [compiler.process(c, **kw) for c in element.clauses]
+    scaled = "(%s / %s)" % (value, cell_size)
+    return "(CAST(%s AS INTEGER) - (%s < CAST(%s AS INTEGER)))" % (scaled, scaled, scaled)
+
+
+def coord_cell_columns(lat_column, lon_column, cell_size_deg=0.01):
+    """
+    (row, col) grid cell expressions for a lat/lon column pair.
+    """
+    return grid_floor(lat_column, cell_size_deg), grid_floor(lon_column, cell_size_deg)
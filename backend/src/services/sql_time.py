@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from sqlalchemy import BigInteger, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+EPOCH = datetime(1970, 1, 1)
+
+# Bucket sizes accepted by the time-series endpoint, in seconds
+TIME_BUCKETS = {
+    "5min": 5 * 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "week": 7 * 24 * 60 * 60,
+}
+
+# 1970-01-05 was a Monday, so week buckets start on Mondays like day_of_week
+BUCKET_ORIGINS = {"week": 4 * 24 * 60 * 60}
+
+
+class time_bucket(FunctionElement):
+    """
+    Start of the fixed-size bucket a naive timestamp falls in, as whole
+    seconds since the epoch: origin + floor((t - origin) / size) * size.
+    PostgreSQL reads the epoch with extract(), SQLite with strftime('%s').
+    """
+    type = BigInteger()
+    inherit_cache = True
+    name = "time_bucket"
+
+    def __init__(self, value, seconds, origin=0):
+        # inlined like grid_floor so SELECT and GROUP BY share the expression text
+        super().__init__(value, literal_column(str(int(seconds))), literal_column(str(int(origin))))
+
+
+@compiles(time_bucket)
+def _time_bucket_default(element, compiler, **kw):
+    value, seconds, origin = [compiler.process(c, **kw) for c in element.clauses]
+    shifted = "(extract(epoch FROM %s) - %s)" % (value, origin)
+    return "(CAST(floor(%s / %s) AS BIGINT) * %s + %s)" % (shifted, seconds, seconds, origin)
+
+
+@compiles(time_bucket, "sqlite")
+def _time_bucket_sqlite(element, compiler, **kw):
+    value, seconds, origin = [compiler.process(c, **kw) for c in element.clauses]
+    shifted = "(CAST(strftime('%%s', %s) AS INTEGER) - %s)" % (value, origin)
+    # integer division truncates towards zero; step back one bucket below the origin
+    return "((%s / %s - (%s < 0 AND %s %% %s != 0)) * %s + %s)" % (
+        shifted, seconds, shifted, shifted, seconds, seconds, origin)
+
+
+def bucket_start(value, seconds, origin=0):
+    """
+    Python side of time_bucket: epoch seconds of the bucket holding `value`.
+    """
+    elapsed = int((value - EPOCH).total_seconds()) - origin
+    return elapsed // seconds * seconds + origin
+
+
+def epoch_to_datetime(seconds):
+    return EPOCH + timedelta(seconds=seconds)
@@ -0,0 +1,83 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = getLogger(__name__)
+
+_REVISION = re.compile(r"^revision\s*=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision\s*=\s*(.+)$", re.MULTILINE)
+
+
+class StartupTimer:
+    """
+    Wall time of each phase of building the API app, in order; create_app
+    records the time its module imports took as the first phase.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - began)
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def format(self):
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+
+def migration_heads(migrations_dir):
+    """
+    Head revision ids of the Alembic scripts in `migrations_dir`, read from
+    their `revision`/`down_revision` lines so alembic itself is not
+    imported by API workers.
+    """
+    versions_dir = os.path.join(migrations_dir, "versions")
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, name)) as f:
+            source = f.read()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision is not None:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+def check_schema_revision(engine, migrations_dir):
+    """
+    Compare the database's alembic_version with the migration heads.
+    One indexed read instead of create_all()'s per-table reflection; logs a
+    warning when the schema is behind. Returns True when it is current.
+    """
+    heads = migration_heads(migrations_dir)
+    try:
+        with engine.connect() as connection:
+            current = {row[0] for row in connection.execute(text("SELECT version_num FROM alembic_version"))}
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not read the schema revision ({type(e).__name__}); "
+                       f"run `flask --app src.manage db upgrade`")
+        return False
+    if current != heads:
+        logger.warning(f"Database schema is at {sorted(current) or 'no revision'}, migrations head is "
+                       f"{sorted(heads)}; run `flask --app src.manage db upgrade`")
+        return False
+    return True
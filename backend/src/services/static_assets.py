@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+# Responses for URLs carrying the asset's content hash (?v=...) never change
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else (index.html, unversioned URLs) is revalidated with its ETag
+REVALIDATE = "no-cache"
+
+# Bodies smaller than this are not worth a compressed variant
+MIN_COMPRESS_BYTES = 256
+
+_REFERENCE = re.compile(r'(\s(?:src|href)=")([^"?#:]+)(")')
+
+
+class Asset:
+    __slots__ = ("path", "mimetype", "version", "bodies")
+
+    def __init__(self, path, body):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.version = hashlib.sha256(body).hexdigest()[:20]
+        # content-coding -> body, identity always present
+        self.bodies = {"identity": body}
+
+    def etag(self, encoding):
+        return self.version if encoding == "identity" else f"{self.version}-{encoding}"
+
+
+class StaticAssets:
+    """
+    In-memory manifest of the frontend directory, built once at startup:
+    every file's bytes, a content hash, and gzip/brotli variants (read from
+    `name.gz`/`name.br` next to the file when a build step produced them,
+    else compressed here). References from HTML files to other assets are
+    rewritten to `name?v=<hash>` so those URLs can be cached as immutable.
+    Requests, including 304s, are answered without touching the disk.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.assets = {}
+
+    def init_app(self, app):
+        self.directory = app.config.get("FRONTEND_DIR", self.directory)
+        if app.config.get("STATIC_ASSET_MANIFEST", False):
+            self.build()
+            app.extensions["static_assets"] = self
+
+    def build(self):
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith((".gz", ".br")):
+                    continue
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                with open(full, "rb") as f:
+                    assets[path] = Asset(path, f.read())
+        # hashes of referenced files are final before the HTML is rewritten
+        for asset in assets.values():
+            if asset.mimetype == "text/html":
+                body = self._version_references(asset, assets)
+                assets[asset.path] = Asset(asset.path, body)
+        for asset in assets.values():
+            self._add_variants(asset, os.path.join(self.directory, asset.path))
+        self.assets = assets
+
+    @staticmethod
+    def _version_references(asset, assets):
+        base = posixpath.dirname(asset.path)
+
+        def versioned(match):
+            target = posixpath.normpath(posixpath.join(base, match.group(2)))
+            if target not in assets or target == asset.path:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={assets[target].version}{match.group(3)}"
+
+        return _REFERENCE.sub(versioned, asset.bodies["identity"].decode("utf-8")).encode("utf-8")
+
+    @staticmethod
+    def _add_variants(asset, full_path):
+        body = asset.bodies["identity"]
+        if len(body) < MIN_COMPRESS_BYTES:
+            return
+        compressors = {"gzip": (".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))}
+        if brotli is not None:
+            compressors["br"] = (".br", lambda b: brotli.compress(b, quality=11))
+        for encoding, (suffix, compress) in compressors.items():
+            # prebuilt files are only trusted for unmodified (non-HTML) assets
+            prebuilt = full_path + suffix
+            if asset.mimetype != "text/html" and os.path.isfile(prebuilt):
+                with open(prebuilt, "rb") as f:
+                    encoded = f.read()
+            else:
+                encoded = compress(body)
+            if len(encoded) < len(body):
+                asset.bodies[encoding] = encoded
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def response(self, asset, request, response_class):
+        """
+        Response for `asset`: the smallest representation the client
+        accepts, its ETag, and an immutable Cache-Control when the URL's
+        ?v= matches the content hash. 304 when If-None-Match has that ETag.
+        """
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in asset.bodies and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        etag = asset.etag(encoding)
+        versioned = request.args.get("v") == asset.version
+
+        if request.if_none_match.contains(etag):
+            response = response_class(status=304)
+        else:
+            response = response_class(asset.bodies[encoding], mimetype=asset.mimetype)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = IMMUTABLE if versioned else REVALIDATE
+        if len(asset.bodies) > 1:
+            response.vary.add("Accept-Encoding")
+        return response
@@ -0,0 +1,293 @@
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging import getLogger
+import pandas as pd
+from sqlalchemy import DateTime, Float, Integer
+from ..models.trip import Trip
+from ..models.import_batch import ImportBatch
+from .checkpoint import LEDGER_INSERT_SQL
+from .partitions import ensure_month_partitions
+
+logger = getLogger(__name__)
+
+# Trip columns loaded from processed ETL output (the CSV `id` is the source
+# dataset's trip key, not ours, so it is never loaded)
+IMPORT_FIELDS = (
+    "vendor_id", "pickup_datetime", "dropoff_datetime", "passenger_count",
+    "trip_distance", "pickup_longitude", "pickup_latitude", "dropoff_longitude",
+    "dropoff_latitude", "fare_amount", "tip_amount", "payment_type",
+    "trip_duration", "average_speed_kmph", "fare_per_km", "pickup_hour",
+    "day_of_week", "pickup_cell_d1", "pickup_cell_d2", "pickup_cell_d3",
+    "dropoff_cell_d1", "dropoff_cell_d2", "dropoff_cell_d3",
+)
+
+STAGING_TABLE = "trips_staging"
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _cast_sql(column_name, text_expr):
+    """
+    SQL casting a staged text value to the type of a Trip column, with ''
+    as NULL. Integers go through float8 so values written as "1.0" load.
+    """
+    column_type = Trip.__table__.c[column_name].type
+    value = f"NULLIF({text_expr}, '')"
+    if isinstance(column_type, Integer):
+        return f"trunc({value}::double precision)::bigint"
+    if isinstance(column_type, Float):
+        return f"{value}::double precision"
+    if isinstance(column_type, DateTime):
+        return f"{value}::timestamp"
+    return value
+
+
+def staging_sql(header):
+    """
+    (create staging, insert into trips) statements for a CSV with `header`.
+    The staging table is all text so COPY never rejects a row on type.
+    """
+    create = "CREATE TEMP TABLE {} ({}) ON COMMIT DROP".format(
+        STAGING_TABLE, ", ".join(f"{_quote(col)} text" for col in header)
+    )
+    fields = [f for f in IMPORT_FIELDS if f in header]
+    insert = "INSERT INTO trips ({}) SELECT {} FROM {}".format(
+        ", ".join(fields),
+        ", ".join(_cast_sql(f, _quote(f)) for f in fields),
+        STAGING_TABLE,
+    )
+    return create, insert
+
+
+class ByteRangeReader:
+    """
+    File-like view of bytes [start, stop) of a file, for cursor.copy_expert.
+    """
+
+    def __init__(self, f, start, stop):
+        f.seek(start)
+        self.f = f
+        self.remaining = stop - start
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        line = self.f.readline(self.remaining if size is None or size < 0 else min(size, self.remaining))
+        self.remaining -= len(line)
+        return line
+
+
+def read_csv_header(csv_path):
+    """
+    (header columns, byte offset of the first data row) of a CSV.
+    """
+    with open(csv_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        return header, f.tell()
+
+
+def split_byte_ranges(csv_path, parts, spans=None, max_bytes=None):
+    """
+    Split the data rows of a CSV into line-aligned byte ranges: at least
+    `parts` per span and, when `max_bytes` is given, none much larger than
+    that, so each range can be committed (and resumed past) on its own.
+    Assumes no quoted field spans a newline, which holds for ETL output.
+    `spans` limits the split to those line-aligned (start, stop) byte spans
+    (each split separately), e.g. what is left of a partial import.
+    Returns (header columns, [(start, stop), ...]).
+    """
+    size = os.path.getsize(csv_path)
+    header, data_start = read_csv_header(csv_path)
+    if spans is None:
+        spans = [(data_start, size)]
+    ranges = []
+    with open(csv_path, "rb") as f:
+        for span_start, span_stop in spans:
+            span_parts = parts
+            if max_bytes:
+                span_parts = max(parts, -(-(span_stop - span_start) // max_bytes))
+            bounds = [span_start]
+            for i in range(1, span_parts):
+                offset = span_start + (span_stop - span_start) * i // span_parts
+                if offset <= bounds[-1]:
+                    continue
+                f.seek(offset)
+                f.readline()  # advance to the start of the next line
+                pos = f.tell()
+                if bounds[-1] < pos < span_stop:
+                    bounds.append(pos)
+            bounds.append(span_stop)
+            ranges.extend((lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo)
+    return header, ranges
+
+
+def copy_stream(connection, header, stream, batch=None, before_insert=None):
+    """
+    COPY a CSV body (no header line) into trips through a temp staging table
+    on a raw DB-API connection, in one transaction. `batch` is an optional
+    (source, unit, start, stop) ledger key committed in the same transaction.
+    before_insert(first pickup, last pickup) runs once the rows are staged
+    and before they reach trips (used to create missing partitions).
+    Returns (rows inserted, first pickup, last pickup).
+    """
+    create, insert = staging_sql(header)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(create)
+        cursor.copy_expert(f"COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT csv)", stream)
+        first_pickup, last_pickup = None, None
+        if "pickup_datetime" in header:
+            pickup = _cast_sql("pickup_datetime", _quote("pickup_datetime"))
+            cursor.execute(f"SELECT min({pickup}), max({pickup}) FROM {STAGING_TABLE}")
+            first_pickup, last_pickup = cursor.fetchone()
+        if before_insert is not None:
+            before_insert(first_pickup, last_pickup)
+        cursor.execute(insert)
+        rows = cursor.rowcount
+        if batch is not None:
+            cursor.execute(LEDGER_INSERT_SQL, (*batch, rows, first_pickup, last_pickup))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return rows, first_pickup, last_pickup
+
+
+def _copy_range(engine, csv_path, header, start, stop, source=None):
+    batch = (source, "bytes", start, stop) if source is not None else None
+    connection = engine.raw_connection()
+    try:
+        with open(csv_path, "rb") as f:
+            result = copy_stream(connection, header, ByteRangeReader(f, start, stop), batch,
+                                 lambda first, last: ensure_month_partitions(engine, first, last))
+    finally:
+        connection.close()
+    logger.info(f"Copied {result[0]} rows from bytes {start}-{stop}")
+    return result
+
+
+def copy_csv(engine, csv_path, workers=1, source=None, spans=None, on_commit=None,
+             batch_bytes=64 * 1024 * 1024):
+    """
+    Load a processed CSV into trips with PostgreSQL COPY FROM STDIN, in
+    line-aligned byte ranges of about `batch_bytes` spread over `workers`
+    connections. Each range commits on its own, with a ledger row keyed on
+    `source` when given, so a resumed import only redoes uncommitted ranges.
+    `spans` restricts the load to those byte spans; on_commit(start, stop,
+    rows) is called from this thread as each range commits.
+    Returns (rows inserted, first pickup, last pickup).
+    """
+    workers = max(1, workers)
+    header, ranges = split_byte_ranges(csv_path, workers, spans, max_bytes=batch_bytes)
+    results = []
+    if workers == 1 or len(ranges) <= 1:
+        for lo, hi in ranges:
+            results.append(_copy_range(engine, csv_path, header, lo, hi, source))
+            if on_commit is not None:
+                on_commit(lo, hi, results[-1][0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = {
+                pool.submit(_copy_range, engine, csv_path, header, lo, hi, source): (lo, hi)
+                for lo, hi in ranges
+            }
+            for fut in as_completed(futures):
+                results.append(fut.result())
+                if on_commit is not None:
+                    on_commit(*futures[fut], results[-1][0])
+
+    total = sum(r[0] for r in results)
+    firsts = [r[1] for r in results if r[1] is not None]
+    lasts = [r[2] for r in results if r[2] is not None]
+    return total, (min(firsts) if firsts else None), (max(lasts) if lasts else None)
+
+
+def ledger_record(batch, df):
+    """
+    import_batches row for a DataFrame batch keyed (source, unit, start, stop).
+    """
+    source, unit, start, stop = batch
+    first_pickup = last_pickup = None
+    if len(df) and "pickup_datetime" in df.columns:
+        first_pickup, last_pickup = df["pickup_datetime"].min(), df["pickup_datetime"].max()
+    return {
+        "source": source,
+        "unit": unit,
+        "start_offset": start,
+        "end_offset": stop,
+        "rows": len(df),
+        "first_pickup": None if pd.isna(first_pickup) else pd.Timestamp(first_pickup).to_pydatetime(),
+        "last_pickup": None if pd.isna(last_pickup) else pd.Timestamp(last_pickup).to_pydatetime(),
+    }
+
+
+class TripSink:
+    """
+    Writes processed DataFrame chunks straight into trips: COPY from an
+    in-memory buffer on PostgreSQL, executemany of column values elsewhere.
+    Monthly partitions a chunk needs are created before it is written.
+    Each write commits, so a failure loses at most the chunk in flight; a
+    write given a (source, unit, start, stop) batch key records it in the
+    import ledger in the same transaction.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.use_copy = engine.dialect.name == "postgresql"
+        self.connection = engine.raw_connection() if self.use_copy else engine.connect()
+
+    def write(self, df, batch=None):
+        fields = [f for f in IMPORT_FIELDS if f in df.columns]
+        frame = df[fields]
+        if self.use_copy:
+            if len(df) and "pickup_datetime" in df.columns:
+                ensure_month_partitions(self.engine, df["pickup_datetime"].min(), df["pickup_datetime"].max())
+            buf = io.StringIO()
+            frame.to_csv(buf, header=False, index=False)
+            buf.seek(0)
+            rows, _, _ = copy_stream(self.connection, fields, buf, batch)
+            return rows
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        with self.connection.begin():
+            if records:
+                self.connection.execute(Trip.__table__.insert(), records)
+            if batch is not None:
+                self.connection.execute(ImportBatch.__table__.insert(), ledger_record(batch, df))
+        return len(records)
+
+    def record_empty(self, batch):
+        """
+        Ledger row for a batch that produced no trips (e.g. a chunk cleaned
+        to empty), so committed offsets stay contiguous.
+        """
+        if self.use_copy:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(LEDGER_INSERT_SQL, (*batch, 0, None, None))
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            return
+        with self.connection.begin():
+            self.connection.execute(ImportBatch.__table__.insert(), ledger_record(batch, pd.DataFrame()))
+
+    def close(self):
+        self.connection.close()
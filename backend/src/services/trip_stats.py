@@ -0,0 +1,280 @@
+from sqlalchemy import func
+from ..models.trip import Trip
+from ..models.rollup import HourlyTripRollup, DailyTripRollup, TripFlowRollup
+from ..services_custom.top_k_hotspots import (manual_top_k, cells_to_hotspots, resolution_suffix, id_to_cell,
+                                              cell_center, CELL_RESOLUTIONS)
+from .rollups import split_window, filter_window, filter_days, FLOW_RESOLUTIONS
+from .sql_grid import coord_cell_columns
+from .sql_time import time_bucket, bucket_start, epoch_to_datetime, TIME_BUCKETS, BUCKET_ORIGINS
+
+
+def _number(value):
+    """
+    An aggregate as a float, 0 for NULL. PostgreSQL returns SUM() over
+    bigint and numeric columns as Decimal, which does not mix with floats.
+    """
+    return float(value or 0)
+
+
+def _mean(total, count, empty=None):
+    return _number(total) / _number(count) if count else empty
+
+
+def hourly_stats(start=None, end=None, use_rollups=False):
+    """
+    Trip count and average speed for each pickup hour in [start, end].
+    One grouped query per source: whole days come from the hourly rollup
+    when `use_rollups` is set, the remaining edges from raw trips.
+    """
+    trips = [0] * 24
+    speed_sum = [0.0] * 24
+    speed_count = [0] * 24
+
+    def add(rows):
+        for hour, count, s_sum, s_count in rows:
+            if hour is None or not 0 <= hour < 24:
+                continue
+            trips[hour] += int(count or 0)
+            speed_sum[hour] += _number(s_sum)
+            speed_count[hour] += int(s_count or 0)
+
+    if use_rollups:
+        days, raw_ranges = split_window(start, end)
+        if days is not None:
+            q = HourlyTripRollup.query.with_entities(
+                HourlyTripRollup.pickup_hour,
+                func.sum(HourlyTripRollup.trip_count),
+                func.sum(HourlyTripRollup.speed_sum),
+                func.sum(HourlyTripRollup.speed_count),
+            )
+            q = filter_days(q, HourlyTripRollup.date, days)
+            add(q.group_by(HourlyTripRollup.pickup_hour).all())
+    else:
+        raw_ranges = [(start, end, True)]
+
+    for lo, hi, hi_inclusive in raw_ranges:
+        q = Trip.query.with_entities(
+            Trip.pickup_hour,
+            func.count(Trip.id),
+            func.sum(Trip.average_speed_kmph),
+            func.count(Trip.average_speed_kmph),
+        )
+        q = filter_window(q, Trip.pickup_datetime, lo, hi, hi_inclusive)
+        add(q.group_by(Trip.pickup_hour).all())
+
+    return {
+        "hours": list(range(24)),
+        "trips": trips,
+        "speeds": [s / c if c else 0.0 for s, c in zip(speed_sum, speed_count)],
+    }
+
+
+def summary_stats(start=None, end=None, use_rollups=False):
+    """
+    Trip count and average distance, fare and speed over [start, end].
+    Each source is read with a single aggregate query; with `use_rollups`
+    whole days come from the daily rollup so wide windows cost about the
+    same as narrow ones.
+    """
+    totals = [0.0] * 7
+
+    def add(row):
+        for i, value in enumerate(row):
+            totals[i] += _number(value)
+
+    if use_rollups:
+        days, raw_ranges = split_window(start, end)
+        if days is not None:
+            q = DailyTripRollup.query.with_entities(
+                func.sum(DailyTripRollup.trip_count),
+                func.sum(DailyTripRollup.distance_sum),
+                func.sum(DailyTripRollup.distance_count),
+                func.sum(DailyTripRollup.fare_sum),
+                func.sum(DailyTripRollup.fare_count),
+                func.sum(DailyTripRollup.speed_sum),
+                func.sum(DailyTripRollup.speed_count),
+            )
+            add(filter_days(q, DailyTripRollup.date, days).one())
+    else:
+        raw_ranges = [(start, end, True)]
+
+    for lo, hi, hi_inclusive in raw_ranges:
+        q = Trip.query.with_entities(
+            func.count(Trip.id),
+            func.sum(Trip.trip_distance),
+            func.count(Trip.trip_distance),
+            func.sum(Trip.fare_amount),
+            func.count(Trip.fare_amount),
+            func.sum(Trip.average_speed_kmph),
+            func.count(Trip.average_speed_kmph),
+        )
+        add(filter_window(q, Trip.pickup_datetime, lo, hi, hi_inclusive).one())
+
+    count, distance_sum, distance_count, fare_sum, fare_count, speed_sum, speed_count = totals
+    return {
+        "total_trips": int(count),
+        "avg_distance": distance_sum / distance_count if distance_count else 0.0,
+        "avg_fare": fare_sum / fare_count if fare_count else 0.0,
+        "avg_speed_kmph": speed_sum / speed_count if speed_count else 0.0,
+    }
+
+
+def timeseries_stats(start=None, end=None, bucket="hour", max_buckets=None):
+    """
+    Trip count and average fare, distance and speed per fixed-size pickup
+    time bucket (a TIME_BUCKETS key), from one query grouped on the bucket
+    start. Buckets without trips are filled with zeros between the window
+    bounds (or the first and last trip of an unbounded side). Raises
+    ValueError for an unknown bucket or a span of more than `max_buckets`.
+    """
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"bucket must be one of {list(TIME_BUCKETS)}")
+    seconds = TIME_BUCKETS[bucket]
+    origin = BUCKET_ORIGINS.get(bucket, 0)
+
+    def check_span(first, last):
+        if max_buckets and (last - first) // seconds + 1 > max_buckets:
+            raise ValueError(f"window spans more than {max_buckets} {bucket} buckets")
+
+    first = bucket_start(start, seconds, origin) if start is not None else None
+    last = bucket_start(end, seconds, origin) if end is not None else None
+    if first is not None and last is not None:
+        check_span(first, last)
+
+    bucket_col = time_bucket(Trip.pickup_datetime, seconds, origin)
+    q = Trip.query.with_entities(
+        bucket_col,
+        func.count(Trip.id),
+        func.sum(Trip.fare_amount),
+        func.count(Trip.fare_amount),
+        func.sum(Trip.trip_distance),
+        func.count(Trip.trip_distance),
+        func.sum(Trip.average_speed_kmph),
+        func.count(Trip.average_speed_kmph),
+    )
+    q = filter_window(q, Trip.pickup_datetime, start, end)
+    rows = {int(row[0]): row[1:] for row in q.group_by(bucket_col).all()}
+
+    buckets, trips, fares, distances, speeds = [], [], [], [], []
+    if rows:
+        first = min(rows) if first is None else first
+        last = max(rows) if last is None else last
+        check_span(first, last)
+    if first is not None and last is not None:
+        for at in range(first, last + 1, seconds):
+            count, fare_sum, fare_count, distance_sum, distance_count, speed_sum, speed_count = \
+                rows.get(at, (0, 0, 0, 0, 0, 0, 0))
+            buckets.append(epoch_to_datetime(at).isoformat())
+            trips.append(int(count))
+            fares.append(_mean(fare_sum, fare_count, 0.0))
+            distances.append(_mean(distance_sum, distance_count, 0.0))
+            speeds.append(_mean(speed_sum, speed_count, 0.0))
+
+    return {
+        "bucket": bucket,
+        "buckets": buckets,
+        "trips": trips,
+        "avg_fare": fares,
+        "avg_distance": distances,
+        "avg_speed_kmph": speeds,
+    }
+
+
+def heatmap_stats(start=None, end=None):
+    """
+    Trip counts per (day_of_week, pickup_hour), as 7 rows (Monday first)
+    of 24 hours. One group-by on the columns the ETL derives, answered
+    from the (pickup_datetime, day_of_week, pickup_hour) index alone.
+    """
+    trips = [[0] * 24 for _ in range(7)]
+    q = Trip.query.with_entities(Trip.day_of_week, Trip.pickup_hour, func.count())
+    q = filter_window(q, Trip.pickup_datetime, start, end)
+    for day, hour, count in q.group_by(Trip.day_of_week, Trip.pickup_hour).all():
+        if day is None or hour is None or not (0 <= day < 7 and 0 <= hour < 24):
+            continue
+        trips[day][hour] = int(count)
+    return {
+        "days": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+        "hours": list(range(24)),
+        "trips": trips,
+    }
+
+
+def hotspot_stats(start=None, end=None, k=10, cell_size_deg=0.01):
+    """
+    Top-k pickup grid cells over the whole [start, end] window.
+    Resolutions the ETL precomputes are grouped on the stored cell id
+    column (covered by the (pickup_datetime, cell) index); other sizes are
+    bucketed from lat/lon in SQL. Only (cell, count) pairs come back for
+    the top-k selection.
+    """
+    suffix = resolution_suffix(cell_size_deg)
+    if suffix is not None:
+        cell_col = getattr(Trip, f"pickup_cell_{suffix}")
+        q = Trip.query.with_entities(cell_col, func.count()).filter(cell_col.isnot(None))
+        q = filter_window(q, Trip.pickup_datetime, start, end)
+        rows = q.group_by(cell_col).all()
+        pairs = ((id_to_cell(cell_id, cell_size_deg), cnt) for cell_id, cnt in rows)
+    else:
+        cell_lat, cell_lon = coord_cell_columns(Trip.pickup_latitude, Trip.pickup_longitude, cell_size_deg)
+        q = Trip.query.with_entities(cell_lat, cell_lon, func.count())
+        q = q.filter(Trip.pickup_latitude.isnot(None), Trip.pickup_longitude.isnot(None))
+        q = filter_window(q, Trip.pickup_datetime, start, end)
+        rows = q.group_by(cell_lat, cell_lon).all()
+        pairs = (((ci, cj), cnt) for ci, cj, cnt in rows)
+
+    topk = manual_top_k(pairs, k)
+    return cells_to_hotspots(topk, cell_size_deg)
+
+
+def flow_stats(start=None, end=None, k=10, cell_size_deg=0.01):
+    """
+    Top-k origin -> destination cell pairs by trip count, with average
+    duration (seconds), fare and speed per pair, read only from the flow
+    rollup. The rollup is per day, so the window covers the whole days of
+    `start` and `end`. Raises ValueError for a resolution not in
+    FLOW_RESOLUTIONS.
+    """
+    suffix = resolution_suffix(cell_size_deg)
+    if suffix not in FLOW_RESOLUTIONS:
+        raise ValueError(f"flows are aggregated at resolutions {[CELL_RESOLUTIONS[s] for s in FLOW_RESOLUTIONS]}")
+    trips = func.sum(TripFlowRollup.trip_count)
+    q = TripFlowRollup.query.with_entities(
+        TripFlowRollup.origin_cell,
+        TripFlowRollup.destination_cell,
+        trips,
+        func.sum(TripFlowRollup.duration_sum),
+        func.sum(TripFlowRollup.duration_count),
+        func.sum(TripFlowRollup.fare_sum),
+        func.sum(TripFlowRollup.fare_count),
+        func.sum(TripFlowRollup.speed_sum),
+        func.sum(TripFlowRollup.speed_count),
+    ).filter(TripFlowRollup.resolution == suffix)
+    if start is not None:
+        q = q.filter(TripFlowRollup.date >= start.date())
+    if end is not None:
+        q = q.filter(TripFlowRollup.date <= end.date())
+    rows = (
+        q.group_by(TripFlowRollup.origin_cell, TripFlowRollup.destination_cell)
+        .order_by(trips.desc(), TripFlowRollup.origin_cell, TripFlowRollup.destination_cell)
+        .limit(max(k, 0))
+        .all()
+    )
+
+    def endpoint(cell_id):
+        cell = id_to_cell(cell_id, cell_size_deg)
+        center_lat, center_lon = cell_center(cell, cell_size_deg)
+        return {"cell": cell, "center_lat": center_lat, "center_lon": center_lon}
+
+    return [
+        {
+            "origin": endpoint(origin),
+            "destination": endpoint(destination),
+            "count": int(count),
+            "avg_duration": _mean(duration_sum, duration_count),
+            "avg_fare": _mean(fare_sum, fare_count),
+            "avg_speed_kmph": _mean(speed_sum, speed_count),
+        }
+        for (origin, destination, count, duration_sum, duration_count, fare_sum, fare_count,
+             speed_sum, speed_count) in rows
+    ]
@@ -0,0 +1,89 @@
+import numpy as np
+
+DEFAULT_COMPRESSION = 200
+
+
+def _compress(means, weights, compression):
+    """
+    Merge sorted-by-mean centroids into clusters spanning at most one unit
+    of the t-digest k1 scale, k(q) = compression / (2 pi) * asin(2q - 1).
+    The scale is steep near q = 0 and 1, so the tails stay (nearly) single
+    values while the middle is summarised by a few heavy centroids.
+    """
+    if len(means) == 0:
+        return means, weights
+    order = np.argsort(means, kind="mergesort")
+    means = means[order]
+    weights = weights[order]
+    cumulative = np.cumsum(weights)
+    q = (cumulative - weights / 2) / cumulative[-1]
+    k = compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1.0, 1.0))
+    cluster = np.floor(k - k[0]).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(cluster)) + 1))
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (a merging t-digest): a bounded set of
+    (mean, weight) centroids plus the exact min and max. Two digests merge
+    by pooling their centroids and compressing again, so per-day digests
+    can be combined for any range of days without the raw values.
+    Quantile error is smallest at the tails, where it matters for p95/p99.
+    """
+
+    def __init__(self, means=None, weights=None, minimum=np.nan, maximum=np.nan,
+                 compression=DEFAULT_COMPRESSION):
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+        self.min = float(minimum)
+        self.max = float(maximum)
+        self.compression = compression
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        """
+        Digest of a 1-d array; NaNs are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return cls(compression=compression)
+        means, weights = _compress(values, np.ones(len(values)), compression)
+        return cls(means, weights, values.min(), values.max(), compression)
+
+    @classmethod
+    def merged(cls, digests, compression=DEFAULT_COMPRESSION):
+        """
+        One digest summarising all of `digests`.
+        """
+        digests = [d for d in digests if d.count]
+        if not digests:
+            return cls(compression=compression)
+        means, weights = _compress(np.concatenate([d.means for d in digests]),
+                                   np.concatenate([d.weights for d in digests]), compression)
+        return cls(means, weights, min(d.min for d in digests), max(d.max for d in digests), compression)
+
+    @property
+    def count(self):
+        return int(round(self.weights.sum())) if len(self.weights) else 0
+
+    def quantiles(self, qs):
+        """
+        Estimated values at the quantiles `qs` (each in [0, 1]), interpolating
+        linearly between centroid centres and the exact min and max.
+        Returns NaNs for an empty digest.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        cumulative = np.cumsum(self.weights)
+        total = cumulative[-1]
+        centres = np.concatenate(([0.0], cumulative - self.weights / 2, [total]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(qs * total, centres, values)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
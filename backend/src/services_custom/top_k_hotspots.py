@@ -10,6 +10,44 @@ def coord_to_cell(lat, lon, cell_size_deg=0.01):
         return None
     return (floor(lat / cell_size_deg), floor(lon / cell_size_deg))
 
+# Grid resolutions precomputed by the ETL: column suffix -> cell size in degrees
+CELL_RESOLUTIONS = {"d1": 0.1, "d2": 0.01, "d3": 0.001}
+
+
+def resolution_suffix(cell_size_deg):
+    """
+    Column suffix for a precomputed resolution, or None if it is not stored.
+    """
+    for suffix, size in CELL_RESOLUTIONS.items():
+        if abs(size - cell_size_deg) < 1e-12:
+            return suffix
+    return None
+
+
+def cell_id_layout(cell_size_deg):
+    """
+    Offsets and row width used to pack a (row, col) cell into one non-negative integer.
+    """
+    lat_offset = int(round(90 / cell_size_deg))
+    lon_offset = int(round(180 / cell_size_deg))
+    return lat_offset, lon_offset, 2 * lon_offset + 1
+
+
+def cell_to_id(cell, cell_size_deg=0.01):
+    if cell is None:
+        return None
+    lat_offset, lon_offset, width = cell_id_layout(cell_size_deg)
+    ci, cj = cell
+    return (ci + lat_offset) * width + (cj + lon_offset)
+
+
+def id_to_cell(cell_id, cell_size_deg=0.01):
+    if cell_id is None:
+        return None
+    lat_offset, lon_offset, width = cell_id_layout(cell_size_deg)
+    return (cell_id // width - lat_offset, cell_id % width - lon_offset)
+
+
 def count_pickup_cells(rows, lat_col='pickup_latitude', lon_col='pickup_longitude', cell_size_deg=0.01):
     """
     rows: iterable of dict-like rows
@@ -25,40 +63,80 @@ def count_pickup_cells(rows, lat_col='pickup_latitude', lon_col='pickup_longitud
         counts[cell] += 1
     return counts
 
+def _sift_down(heap, i):
+    n = len(heap)
+    while True:
+        smallest = i
+        left, right = 2 * i + 1, 2 * i + 2
+        if left < n and heap[left] < heap[smallest]:
+            smallest = left
+        if right < n and heap[right] < heap[smallest]:
+            smallest = right
+        if smallest == i:
+            return
+        heap[i], heap[smallest] = heap[smallest], heap[i]
+        i = smallest
+
+
+def _sift_up(heap, i):
+    while i > 0:
+        parent = (i - 1) // 2
+        if heap[i] < heap[parent]:
+            heap[i], heap[parent] = heap[parent], heap[i]
+            i = parent
+        else:
+            return
+
+
 def manual_top_k(counts_dict, k):
     """
-    Manual selection of top-k from dictionary counts without using built-in sorted/heap.
-    Uses repeated linear scan to pick max k times (O(k*n)). Not optimal for huge n, but valid.
+    Manual selection of top-k from (cell, count) items without using built-in sorted/heap.
+    Keeps a hand-written min-heap of the best k seen so far (O(n log k)); ties keep the
+    earlier item, as the old repeated linear scan did.
+    Accepts a dict or an iterable of (cell, count) pairs.
     Returns list of tuples (cell, count) sorted descending.
     """
-    items = list(counts_dict.items())
+    items = counts_dict.items() if hasattr(counts_dict, "items") else counts_dict
+    if k <= 0:
+        return []
+    heap = []  # entries (count, -position, cell); root is the weakest kept item
+    for pos, (cell, cnt) in enumerate(items):
+        entry = (cnt, -pos, cell)
+        if len(heap) < k:
+            heap.append(entry)
+            _sift_up(heap, len(heap) - 1)
+        elif entry[:2] > heap[0][:2]:
+            heap[0] = entry
+            _sift_down(heap, 0)
+
+    # pop weakest first, then reverse for descending order
     result = []
-    used = set()
-    n = len(items)
-    for _ in range(min(k, n)):
-        best_idx = -1
-        best_val = None
-        for i, (cell, cnt) in enumerate(items):
-            if i in used:
-                continue
-            if best_val is None or cnt > best_val:
-                best_val = cnt
-                best_idx = i
-        if best_idx == -1:
-            break
-        used.add(best_idx)
-        result.append(items[best_idx])
+    while heap:
+        cnt, _, cell = heap[0]
+        result.append((cell, cnt))
+        last = heap.pop()
+        if heap:
+            heap[0] = last
+            _sift_down(heap, 0)
+    result.reverse()
     return result
 
-def top_k_hotspots(rows, k=10, cell_size_deg=0.01):
-    counts = count_pickup_cells(rows, cell_size_deg=cell_size_deg)
-    topk = manual_top_k(counts, k)
-    # convert cell back to approximate coordinates (center of cell)
+
+def cell_center(cell, cell_size_deg=0.01):
+    """
+    Approximate (lat, lon) centre of a grid cell.
+    """
+    ci, cj = cell
+    return (ci + 0.5) * cell_size_deg, (cj + 0.5) * cell_size_deg
+
+
+def cells_to_hotspots(topk, cell_size_deg=0.01):
+    """
+    Convert (cell, count) pairs to hotspot dicts with the approximate cell centre.
+    """
     hotspots = []
     for (cell, cnt) in topk:
-        ci, cj = cell
-        center_lat = (ci + 0.5) * cell_size_deg
-        center_lon = (cj + 0.5) * cell_size_deg
+        center_lat, center_lon = cell_center(cell, cell_size_deg)
         hotspots.append({
             "cell": cell,
             "center_lat": center_lat,
@@ -66,3 +144,10 @@ def top_k_hotspots(rows, k=10, cell_size_deg=0.01):
             "count": cnt
         })
     return hotspots
+
+
+def top_k_hotspots(rows, k=10, cell_size_deg=0.01):
+    counts = count_pickup_cells(rows, cell_size_deg=cell_size_deg)
+    topk = manual_top_k(counts, k)
+    # convert cell back to approximate coordinates (center of cell)
+    return cells_to_hotspots(topk, cell_size_deg)
@@ -0,0 +1,136 @@
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# tests import everything through the src package, like `python src/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app import create_app
+from src.config import Config
+from src.extensions import db, response_cache
+from src.models.trip import Trip
+from src.services_custom.top_k_hotspots import CELL_RESOLUTIONS, cell_to_id, coord_to_cell
+
+
+class TestingConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    DB_CREATE_ALL = True
+    RESPONSE_CACHE_BYTES = 0
+    USE_ROLLUPS = False
+    USE_COLUMNAR = False
+    APPROX_ROW_THRESHOLD = 0
+    STATIC_ASSET_MANIFEST = False
+    SLOW_REQUEST_SECONDS = 0.0
+
+
+@pytest.fixture
+def make_app():
+    """
+    create_app() with TestingConfig, overridden by keyword settings.
+    """
+    def make(**settings):
+        # the extension instances are module globals shared by every test's app
+        response_cache.clear()
+        return create_app(type("Config", (TestingConfig,), settings))
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_trips(n, seed=1, first_day=datetime(2016, 1, 1), days=10):
+    """
+    `n` reproducible trips with pickups spread over `days` days from
+    `first_day`, some with missing fares and speeds.
+    """
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        pickup = first_day + timedelta(seconds=rnd.randint(0, 86400 * days - 1))
+        duration = rnd.randint(60, 3600)
+        distance = rnd.uniform(0.5, 20.0)
+        lat, lon = 40.75 + rnd.gauss(0, 0.03), -73.98 + rnd.gauss(0, 0.03)
+        row = {
+            "id": i + 1,
+            "vendor_id": rnd.choice([1, 2]),
+            "pickup_datetime": pickup,
+            "dropoff_datetime": pickup + timedelta(seconds=duration),
+            "passenger_count": rnd.randint(1, 4),
+            "trip_distance": distance,
+            "pickup_latitude": lat,
+            "pickup_longitude": lon,
+            "dropoff_latitude": 40.75 + rnd.gauss(0, 0.05),
+            "dropoff_longitude": -73.98 + rnd.gauss(0, 0.05),
+            "fare_amount": rnd.choice([None, 2.5 + distance * rnd.uniform(1.5, 3.0)]),
+            "tip_amount": 1.0,
+            "payment_type": "1",
+            "trip_duration": float(duration),
+            "average_speed_kmph": rnd.choice([None, distance / (duration / 3600)]),
+            "fare_per_km": 2.0,
+            "pickup_hour": pickup.hour,
+            "day_of_week": pickup.weekday(),
+        }
+        for suffix, size in CELL_RESOLUTIONS.items():
+            row[f"pickup_cell_{suffix}"] = cell_to_id(coord_to_cell(lat, lon, size), size)
+            row[f"dropoff_cell_{suffix}"] = cell_to_id(
+                coord_to_cell(row["dropoff_latitude"], row["dropoff_longitude"], size), size)
+        rows.append(row)
+    return rows
+
+
+@pytest.fixture
+def trips(app):
+    """
+    2000 trips over 2016-01-01..2016-01-10 in the app's database.
+    """
+    with app.app_context():
+        db.session.bulk_insert_mappings(Trip, make_trips(2000))
+        db.session.commit()
+    return app
+
+
+RAW_COLUMNS = ["id", "vendor_id", "pickup_datetime", "dropoff_datetime", "passenger_count", "pickup_longitude",
+               "pickup_latitude", "dropoff_longitude", "dropoff_latitude", "store_and_fwd_flag", "trip_duration",
+               "fare_amount", "payment_type"]
+
+
+def write_raw_csv(path, n=3000, seed=7):
+    """
+    A raw Kaggle-layout trip CSV of `n` rows with full-precision coordinates;
+    about 1% of the rows have an unparseable pickup time or a missing
+    coordinate, and the random durations include negative ones.
+    """
+    rnd = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RAW_COLUMNS)
+        for i in range(n):
+            pickup = datetime(2016, 1, 1) + timedelta(seconds=rnd.randint(0, 86400 * 10))
+            duration = rnd.randint(-10, 4000)
+            row = [f"id{i}", rnd.choice([1, 2]), pickup.strftime("%Y-%m-%d %H:%M:%S"),
+                   (pickup + timedelta(seconds=duration)).strftime("%Y-%m-%d %H:%M:%S"), rnd.randint(1, 6),
+                   -73.98 + rnd.gauss(0, 0.04), 40.75 + rnd.gauss(0, 0.04),
+                   -73.98 + rnd.gauss(0, 0.05), 40.75 + rnd.gauss(0, 0.05), "N", duration,
+                   round(rnd.uniform(-2, 60), 2), rnd.choice(["CRD", "CSH"])]
+            if rnd.random() < 0.01:
+                row[2] = "garbage"
+            if rnd.random() < 0.01:
+                row[5] = ""
+            writer.writerow(row)
+    return str(path)
+
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    return write_raw_csv(tmp_path / "raw.csv")
@@ -0,0 +1,70 @@
+import pytest
+
+from src.services.checkpoint import check_resumable, committed_prefix, merge_spans, pending_spans
+from src.services.trip_loader import split_byte_ranges
+
+
+def test_merge_spans_joins_overlapping_and_adjacent():
+    assert merge_spans([(10, 20), (0, 5), (5, 8), (15, 30), (40, 50)]) == [(0, 8), (10, 30), (40, 50)]
+    assert merge_spans([]) == []
+
+
+def test_pending_spans_are_the_gaps():
+    committed = [(0, 10), (20, 30), (35, 40)]
+    assert pending_spans(committed, 0, 50) == [(10, 20), (30, 35), (40, 50)]
+    assert pending_spans(committed, 5, 25) == [(10, 20)]
+    assert pending_spans(committed, 20, 30) == []
+    assert pending_spans([], 3, 9) == [(3, 9)]
+
+
+def test_pending_and_committed_spans_cover_the_range():
+    committed = merge_spans([(4, 9), (12, 20), (9, 11), (25, 26)])
+    pending = pending_spans(committed, 0, 30)
+    assert merge_spans(committed + pending) == [(0, 30)]
+    assert not any(plo < hi and lo < phi for lo, hi in committed for plo, phi in pending)
+
+
+def test_committed_prefix_stops_at_the_first_gap():
+    assert committed_prefix([(0, 10), (10, 25), (30, 40)]) == 25
+    assert committed_prefix([(5, 10)]) == 0
+    assert committed_prefix([(0, 10), (8, 12)], start=0) == 12
+    assert committed_prefix([], start=7) == 7
+
+
+def test_check_resumable_refuses_a_second_run_without_resume():
+    check_resumable([], "trips.csv", resume=False)
+    check_resumable([(0, 10)], "trips.csv", resume=True)
+    with pytest.raises(ValueError):
+        check_resumable([(0, 10)], "trips.csv", resume=False)
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "trips.csv"
+    lines = ["id,pickup_datetime,trip_distance"] + [f"{i},2016-01-01 00:{i % 60:02d}:00,{i * 0.1:.1f}"
+                                                    for i in range(1, 501)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def _rows(path, ranges):
+    data = path.read_bytes()
+    return [line for lo, hi in ranges for line in data[lo:hi].decode().splitlines()]
+
+
+def test_split_byte_ranges_are_line_aligned_and_bounded(csv_file):
+    header, ranges = split_byte_ranges(str(csv_file), parts=2, max_bytes=1000)
+    assert header == ["id", "pickup_datetime", "trip_distance"]
+    assert len(ranges) >= csv_file.stat().st_size // 1000
+    # one line of slack past max_bytes for the line alignment
+    assert all(hi - lo <= 1000 + 40 for lo, hi in ranges)
+    assert _rows(csv_file, ranges) == csv_file.read_text().splitlines()[1:]
+
+
+def test_split_byte_ranges_only_splits_pending_spans(csv_file):
+    _, ranges = split_byte_ranges(str(csv_file), parts=1, max_bytes=1000)
+    committed = ranges[::2]
+    pending = pending_spans(committed, ranges[0][0], ranges[-1][1])
+    _, resumed = split_byte_ranges(str(csv_file), parts=1, spans=pending, max_bytes=1000)
+    assert sorted(_rows(csv_file, committed) + _rows(csv_file, resumed)) == \
+        sorted(csv_file.read_text().splitlines()[1:])
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+
+from src.extensions import db
+from src.models.trip import Trip
+from src.services.columnar import ColumnarSnapshot, write_snapshot
+from src.services.dataset_version import current_dataset_version
+from src.services.trip_stats import hotspot_stats, hourly_stats, summary_stats
+
+WINDOWS = [
+    (None, None),
+    (datetime(2016, 1, 3), datetime(2016, 1, 7)),
+    (datetime(2016, 1, 2, 13, 30), datetime(2016, 1, 8, 7, 15)),
+    (datetime(2016, 1, 4, 2), datetime(2016, 1, 4, 20)),
+    (datetime(2016, 1, 6, 12), None),
+]
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(USE_COLUMNAR=True, COLUMNAR_SNAPSHOT_DIR=str(tmp_path))
+
+
+@pytest.fixture
+def snapshot(trips):
+    with trips.app_context():
+        directory = trips.config["COLUMNAR_SNAPSHOT_DIR"]
+        write_snapshot(db.engine, directory, current_dataset_version(db.session))
+    return ColumnarSnapshot.load(directory)
+
+
+def by_count(hotspots):
+    # cells with equal counts may come back in either order
+    return sorted(({**h, "cell": list(h["cell"])} for h in hotspots), key=lambda h: (-h["count"], h["cell"]))
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+def test_snapshot_matches_sql(trips, snapshot, start, end):
+    with trips.app_context():
+        expected = summary_stats(start, end)
+        actual = snapshot.summary(start, end)
+        assert actual["total_trips"] == expected["total_trips"]
+        for key in ("avg_distance", "avg_fare", "avg_speed_kmph"):
+            assert actual[key] == pytest.approx(expected[key])
+
+        expected_hourly = hourly_stats(start, end)
+        actual_hourly = snapshot.hourly(start, end)
+        assert actual_hourly["trips"] == expected_hourly["trips"]
+        assert actual_hourly["speeds"] == pytest.approx(expected_hourly["speeds"])
+
+        for cell_size_deg in (0.1, 0.01, 0.001, 0.005):
+            assert by_count(snapshot.hotspots(start, end, k=15, cell_size_deg=cell_size_deg)) == \
+                by_count(hotspot_stats(start, end, k=15, cell_size_deg=cell_size_deg))
+
+
+def test_api_answers_from_the_snapshot(trips, snapshot):
+    with trips.app_context():
+        expected = summary_stats()
+        expected_hotspots = hotspot_stats(k=5)
+        # the snapshot is still at the current dataset version, so the API must not see this
+        Trip.query.delete()
+        db.session.commit()
+
+    client = trips.test_client()
+    assert client.get("/api/trips/summary").get_json() == pytest.approx(expected)
+    assert sum(client.get("/api/trips/hourly").get_json()["trips"]) == 2000
+    assert by_count(client.get("/api/trips/hotspots?k=5").get_json()) == by_count(expected_hotspots)
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from src.extensions import db
+from src.services.concurrent_queries import QueryTimeout, run_concurrently
+
+# a few billion rows of cross join over the seeded trips
+SLOW_QUERY = "SELECT count(*) FROM trips a, trips b, trips c"
+
+
+@pytest.fixture
+def file_app(make_app, tmp_path):
+    # a file database, so each worker gets its own connection (in-memory SQLite shares one)
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'trips.db'}", DASHBOARD_WORKERS=2)
+    with app.app_context():
+        db.session.execute(db.text("INSERT INTO trips (id, pickup_datetime, dropoff_datetime, trip_distance) "
+                                   "VALUES (:id, '2016-01-01', '2016-01-01', 1.0)"),
+                           [{"id": i} for i in range(1, 2001)])
+        db.session.commit()
+    return app
+
+
+def _scalar(sql):
+    return lambda: db.session.execute(db.text(sql)).scalar()
+
+
+def test_results_by_name(file_app):
+    assert run_concurrently(file_app, {"one": _scalar("SELECT 1"), "trips": _scalar("SELECT count(*) FROM trips")},
+                            timeout=5) == {"one": 1, "trips": 2000}
+
+
+def test_timed_out_queries_are_aborted_and_free_their_workers(file_app):
+    started = time.monotonic()
+    with pytest.raises(QueryTimeout):
+        run_concurrently(file_app, {"a": _scalar(SLOW_QUERY), "b": _scalar(SLOW_QUERY)}, timeout=0.3)
+    assert time.monotonic() - started < 2
+    # both workers are free again right away, not after the cross joins finish
+    started = time.monotonic()
+    assert run_concurrently(file_app, {"a": _scalar("SELECT 1"), "b": _scalar("SELECT 2")},
+                            timeout=5) == {"a": 1, "b": 2}
+    assert time.monotonic() - started < 1
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl_steps.loader import (PARTITION_COLUMN, data_row_offset, iter_csv_in_chunks, iter_parquet_in_chunks,
+                                  read_parquet_partitions)
+from src.extensions import db
+from src.models.import_batch import ImportBatch
+from src.models.trip import Trip
+from src.services import etl
+from src.services.distributions import (DISTRIBUTION_METRICS, distribution_stats, distributions_path,
+                                        load_distribution_file, read_distribution_file, refresh_distributions)
+from src.services.etl import run_etl_from_csv, run_etl_to_db
+from src.services.trip_loader import TripSink
+from src.services_custom.top_k_hotspots import CELL_RESOLUTIONS
+
+CELL_COLUMNS = [f"{end}_cell_{suffix}" for end in ("pickup", "dropoff") for suffix in CELL_RESOLUTIONS]
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_typed_reads_give_the_same_cells(raw_csv, tmp_path, engine):
+    untyped, typed = tmp_path / "untyped.csv", tmp_path / "typed.csv"
+    run_etl_from_csv(raw_csv, str(untyped), chunksize=1000)
+    run_etl_from_csv(raw_csv, str(typed), chunksize=1000,
+                     read_options={"typed": True, "prune_columns": True, "engine": engine})
+    expected, actual = pd.read_csv(untyped), pd.read_csv(typed)
+    assert len(actual) == len(expected) > 0
+    pd.testing.assert_frame_equal(actual[CELL_COLUMNS], expected[CELL_COLUMNS])
+    pd.testing.assert_frame_equal(actual[["pickup_latitude", "pickup_longitude"]],
+                                  expected[["pickup_latitude", "pickup_longitude"]])
+
+
+@pytest.mark.parametrize("typed, engine", [(False, "c"), (True, "c"), (True, "pyarrow")])
+@pytest.mark.parametrize("skip_rows", [1, 1234, 2999, 3000, 4000])
+def test_skipped_rows_are_not_parsed_and_columns_are_kept(raw_csv, typed, engine, skip_rows):
+    chunks = list(iter_csv_in_chunks(raw_csv, 700, typed=typed, engine=engine, skip_rows=skip_rows))
+    header = list(pd.read_csv(raw_csv, nrows=0).columns)
+    assert sum(len(chunk) for chunk in chunks) == max(0, 3000 - skip_rows)
+    if chunks:
+        assert list(chunks[0].columns) == header
+        assert chunks[0]["id"].iloc[0] == f"id{skip_rows}"
+
+
+def test_data_row_offset(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_bytes(b"a,b\n1,2\n33,44\n5,6\n")
+    assert [data_row_offset(str(path), rows, block_size=3) for rows in range(5)] == [4, 8, 14, 18, 18]
+
+
+def test_resumed_run_matches_an_uninterrupted_one(raw_csv, tmp_path, monkeypatch):
+    expected_path, resumed_path = tmp_path / "full.csv", tmp_path / "resumed.csv"
+    expected_removed = run_etl_from_csv(raw_csv, str(expected_path), chunksize=400)
+
+    original = etl.transform_chunks
+
+    def crash_after_three_chunks(*args, **kwargs):
+        for i, result in enumerate(original(*args, **kwargs)):
+            if i == 3:
+                raise RuntimeError("interrupted")
+            yield result
+
+    monkeypatch.setattr(etl, "transform_chunks", crash_after_three_chunks)
+    with pytest.raises(RuntimeError):
+        run_etl_from_csv(raw_csv, str(resumed_path), chunksize=400)
+    monkeypatch.setattr(etl, "transform_chunks", original)
+    skipped = []
+
+    def reading(csv_path, skip_rows=0, **kwargs):
+        skipped.append(skip_rows)
+        return iter_csv_in_chunks(csv_path, skip_rows=skip_rows, **kwargs)
+
+    monkeypatch.setattr(etl, "iter_csv_in_chunks", reading)
+    assert run_etl_from_csv(raw_csv, str(resumed_path), chunksize=400, resume=True) == expected_removed
+    assert skipped == [1200]
+    assert resumed_path.read_bytes() == expected_path.read_bytes()
+    assert sketch_totals(resumed_path) == sketch_totals(expected_path)
+
+
+def expected_reasons(raw_csv):
+    """
+    Rejected rows per reason, worked out from the raw fixture: unparseable
+    pickup times, then non-positive durations, missing pickup coordinates
+    and negative fares, each row counted under the first rule it fails.
+    """
+    raw = pd.read_csv(raw_csv)
+    unparsed = raw["pickup_datetime"] == "garbage"
+    bad_duration = ~unparsed & (raw["trip_duration"] <= 0)
+    no_coordinates = ~unparsed & ~bad_duration & raw["pickup_longitude"].isna()
+    negative_fare = ~unparsed & ~bad_duration & ~no_coordinates & (raw["fare_amount"] < 0)
+    return {
+        "missing_essential": int(unparsed.sum()),
+        "non_positive_duration": int(bad_duration.sum()),
+        "invalid_coordinates": int(no_coordinates.sum()),
+        "negative_fare": int(negative_fare.sum()),
+    }
+
+
+@pytest.mark.parametrize("quarantine_name", ["rejected.csv", "rejected.parquet"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_csv_run_splits_every_row_between_output_and_quarantine(raw_csv, tmp_path, quarantine_name, workers):
+    output_path, quarantine_path = tmp_path / "trips.csv", str(tmp_path / quarantine_name)
+    removed = run_etl_from_csv(raw_csv, str(output_path), chunksize=700, workers=workers,
+                               quarantine_path=quarantine_path)
+    output = pd.read_csv(output_path)
+    if quarantine_path.endswith(".parquet"):
+        rejected = pd.read_parquet(quarantine_path)
+    else:
+        rejected = pd.read_csv(quarantine_path)
+
+    assert removed == expected_reasons(raw_csv)
+    assert rejected["reject_reason"].value_counts().to_dict() == removed
+    assert len(output) == 3000 - sum(removed.values())
+    assert set(output["id"]).isdisjoint(rejected["id"])
+    assert len(set(output["id"]) | set(rejected["id"])) == 3000
+    # chunks are written in input order
+    assert list(output["id"]) == sorted(output["id"], key=lambda i: int(i[2:]))
+
+
+def test_parquet_run_matches_the_csv_run(raw_csv, tmp_path):
+    csv_path, parquet_path = tmp_path / "trips.csv", tmp_path / "trips"
+    csv_removed = run_etl_from_csv(raw_csv, str(csv_path), chunksize=700)
+    removed = run_etl_from_csv(raw_csv, str(parquet_path), chunksize=700, output_format="parquet",
+                               quarantine_path=str(tmp_path / "rejected.csv"))
+    assert removed == csv_removed == expected_reasons(raw_csv)
+
+    expected = pd.read_csv(csv_path, parse_dates=["pickup_datetime", "dropoff_datetime"])
+    actual = read_parquet_partitions(str(parquet_path))
+    assert len(actual) == len(expected) == 3000 - sum(removed.values())
+    days = sorted(expected["pickup_datetime"].dt.strftime("%Y-%m-%d").unique())
+    assert sorted(p.name for p in parquet_path.glob(f"{PARTITION_COLUMN}=*")) == \
+        [f"{PARTITION_COLUMN}={day}" for day in days]
+    # dtypes survive without re-parsing
+    assert actual["pickup_datetime"].dtype.kind == "M"
+    assert actual["pickup_cell_d3"].dtype.kind == "i"
+
+    actual = actual.drop(columns=PARTITION_COLUMN).sort_values("id").reset_index(drop=True)
+    expected = expected.sort_values("id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
+    window = pd.concat(iter_parquet_in_chunks(str(parquet_path), chunksize=100, start_date=days[2],
+                                              end_date=days[4], columns=["id", "pickup_datetime"]))
+    in_window = expected["pickup_datetime"].dt.strftime("%Y-%m-%d").between(days[2], days[4])
+    assert sorted(window["id"]) == sorted(expected.loc[in_window, "id"])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_fused_run_loads_what_the_csv_run_writes(make_app, raw_csv, tmp_path, workers):
+    # a file database: the loader thread writes on its own connection
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'trips.db'}")
+    output_path, quarantine_path = tmp_path / "trips.csv", tmp_path / "rejected.csv"
+    removed = run_etl_from_csv(raw_csv, str(output_path), chunksize=700)
+    expected = pd.read_csv(output_path, parse_dates=["pickup_datetime"])
+
+    with app.app_context():
+        rows, first_pickup, last_pickup = run_etl_to_db(raw_csv, db.engine, chunksize=700, workers=workers,
+                                                        quarantine_path=str(quarantine_path),
+                                                        checkpoint_path=str(tmp_path / "etl-db.json"))
+        assert rows == Trip.query.count() == len(expected) == 3000 - sum(removed.values())
+        assert (first_pickup, last_pickup) == (expected["pickup_datetime"].min(), expected["pickup_datetime"].max())
+        # one ledger row per raw chunk, covering the whole file
+        batches = ImportBatch.query.order_by(ImportBatch.start_offset).all()
+        assert [(b.start_offset, b.end_offset) for b in batches] == [(i, min(i + 700, 3000))
+                                                                    for i in range(0, 3000, 700)]
+        assert sum(b.rows for b in batches) == rows
+        loaded = sorted(t.pickup_cell_d3 for t in Trip.query.with_entities(Trip.pickup_cell_d3))
+    assert loaded == sorted(expected["pickup_cell_d3"])
+    assert pd.read_csv(quarantine_path)["reject_reason"].value_counts().to_dict() == removed
+
+
+def sketch_totals(output_path):
+    rows, trips = read_distribution_file(distributions_path(str(output_path)))
+    return trips, [(r["date"], r["metric"], r["value_count"], round(r["value_sum"], 6), r["histogram"]) for r in rows]
+
+
+@pytest.mark.parametrize("output_format, workers", [("csv", 1), ("parquet", 2)])
+def test_etl_writes_day_sketches_of_its_output(raw_csv, tmp_path, output_format, workers):
+    output_path = str(tmp_path / ("trips.csv" if output_format == "csv" else "trips"))
+    run_etl_from_csv(raw_csv, output_path, chunksize=700, workers=workers, output_format=output_format)
+    if output_format == "csv":
+        output = pd.read_csv(output_path, parse_dates=["pickup_datetime"])
+    else:
+        output = read_parquet_partitions(output_path)
+    rows, trips = read_distribution_file(distributions_path(output_path))
+
+    by_day = output.groupby(output["pickup_datetime"].dt.date)
+    assert trips == by_day.size().to_dict()
+    assert len(rows) == len(trips) * len(DISTRIBUTION_METRICS)
+    for row in rows:
+        values = by_day.get_group(row["date"])[row["metric"]].dropna()
+        assert row["value_count"] == len(values)
+        assert row["value_sum"] == pytest.approx(values.sum())
+        assert np.frombuffer(row["histogram"], dtype=np.int64).sum() == len(values)
+
+
+def test_day_sketches_are_loaded_only_where_the_database_matches(app, raw_csv, tmp_path):
+    output_path = str(tmp_path / "trips.csv")
+    run_etl_from_csv(raw_csv, output_path, chunksize=700)
+    output = pd.read_csv(output_path, parse_dates=["pickup_datetime", "dropoff_datetime"])
+    days = sorted(output["pickup_datetime"].dt.date.unique())
+    # one trip of the second day never reaches the database
+    missing = output.index[output["pickup_datetime"].dt.date == days[1]][0]
+
+    with app.app_context():
+        sink = TripSink(db.engine)
+        sink.write(output.drop(index=missing))
+        sink.close()
+        assert load_distribution_file(db.session, distributions_path(output_path), days[0], days[-1]) == [days[1]]
+        refresh_distributions(db.session, days[1], days[1])
+        from_file = distribution_stats()
+        refresh_distributions(db.session, days[0], days[-1])
+        from_database = distribution_stats()
+
+    for metric, stats in from_database.items():
+        assert from_file[metric]["count"] == stats["count"]
+        assert from_file[metric]["mean"] == pytest.approx(stats["mean"])
+        assert from_file[metric]["histogram"] == stats["histogram"]
+        assert from_file[metric]["quantiles"]["p50"] == pytest.approx(stats["quantiles"]["p50"], rel=0.02)
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from src.extensions import db
+from src.models.trip import Trip
+from src.services.startup import check_schema_revision
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def flask_db(database_url, *args):
+    """
+    `flask --app src.manage db <args>` against `database_url`, in a
+    subprocess so alembic's logging setup stays out of the test process.
+    """
+    env = dict(os.environ, DATABASE_URL=database_url)
+    return subprocess.run([sys.executable, "-m", "flask", "--app", "src.manage", "db", *args],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def test_upgraded_sqlite_schema_accepts_trips(make_app, tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'trips.db'}"
+    flask_db(database_url, "upgrade")
+    assert "No new upgrade operations detected" in flask_db(database_url, "check").stdout
+
+    app = make_app(SQLALCHEMY_DATABASE_URI=database_url, DB_CREATE_ALL=False)
+    with app.app_context():
+        assert check_schema_revision(db.engine, app.config["MIGRATIONS_DIR"])
+        pickup = datetime(2016, 1, 1, 8, 30)
+        db.session.add(Trip(pickup_datetime=pickup, dropoff_datetime=pickup, trip_distance=1.5))
+        db.session.add(Trip(pickup_datetime=pickup, dropoff_datetime=pickup, trip_distance=2.5))
+        db.session.commit()
+        assert [trip.id for trip in Trip.query.order_by(Trip.id)] == [1, 2]
+
+    client = app.test_client()
+    assert client.get("/api/trips/summary?start=2016-01-01&end=2016-01-02").status_code == 200
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.extensions import db
+from src.services.distributions import rebuild_all_distributions
+from src.services_custom.quantile_sketch import TDigest
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def _rank_error(values, estimates, qs):
+    """
+    Largest |rank(estimate) - q| over `qs`, as a fraction of the values.
+    """
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, estimates) / len(ordered)
+    return np.max(np.abs(ranks - np.asarray(qs)))
+
+
+def test_quantiles_of_a_skewed_sample():
+    values = np.random.default_rng(1).lognormal(mean=2.5, sigma=0.8, size=50000)
+    digest = TDigest.from_values(values)
+    assert digest.count == len(values)
+    assert len(digest.means) < 1000
+    assert (digest.min, digest.max) == (values.min(), values.max())
+    assert _rank_error(values, digest.quantiles(QUANTILES), QUANTILES) < 0.005
+    assert digest.quantile(0.0) == values.min()
+    assert digest.quantile(1.0) == values.max()
+
+
+def test_merged_digests_match_one_digest_of_all_values():
+    rng = np.random.default_rng(2)
+    # days with different distributions, like per-day sketches
+    days = [rng.normal(loc=10 * i, scale=3 + i, size=rng.integers(500, 5000)) for i in range(8)]
+    merged = TDigest.merged([TDigest.from_values(day) for day in days])
+    values = np.concatenate(days)
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    assert _rank_error(values, merged.quantiles(QUANTILES), QUANTILES) < 0.01
+
+
+def test_empty_and_nan_inputs():
+    assert TDigest.from_values([np.nan, np.nan]).count == 0
+    assert np.isnan(TDigest.merged([]).quantile(0.5))
+    assert TDigest.merged([TDigest(), TDigest.from_values([3.0])]).quantile(0.5) == 3.0
+
+
+def test_distribution_endpoint_matches_raw_values(trips, client):
+    assert client.get("/api/trips/distribution").status_code == 404
+    with trips.app_context():
+        rebuild_all_distributions(db.session)
+        fares = np.array([f for (f,) in db.session.execute(db.text(
+            "SELECT fare_amount FROM trips WHERE fare_amount IS NOT NULL "
+            "AND pickup_datetime >= '2016-01-02' AND pickup_datetime < '2016-01-06'"))])
+
+    response = client.get("/api/trips/distribution?metrics=fare_amount&start=2016-01-02&end=2016-01-05")
+    assert response.status_code == 200
+    stats = response.get_json()["fare_amount"]
+    assert stats["count"] == len(fares)
+    assert stats["mean"] == pytest.approx(fares.mean())
+    assert (stats["min"], stats["max"]) == (fares.min(), fares.max())
+    estimates = [stats["quantiles"][f"p{q * 100:g}"] for q in QUANTILES]
+    assert _rank_error(fares, estimates, QUANTILES) < 0.02
+    histogram = stats["histogram"]
+    assert sum(histogram["counts"]) + histogram["below"] + histogram["above"] == len(fares)
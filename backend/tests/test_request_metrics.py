@@ -0,0 +1,46 @@
+import copy
+import re
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.extensions import db
+from src.services.request_metrics import RequestStats, _current
+
+
+def _count(metrics, name, rule):
+    match = re.search(rf'^{name}_count{{method="GET",endpoint="{re.escape(rule)}",status="200"}} (\S+)$',
+                      metrics, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_requests_and_their_statements_are_counted(trips, client):
+    # the metrics extension is shared by every test's app, so compare before and after
+    rule = "/api/trips/<int:trip_id>"
+    before = client.get("/api/metrics").data.decode()
+    assert client.get("/api/trips/7").status_code == 200
+    after = client.get("/api/metrics").data.decode()
+    assert _count(after, "http_request_duration_seconds", rule) == \
+        _count(before, "http_request_duration_seconds", rule) + 1
+    assert 'http_request_db_statements_bucket{method="GET",endpoint="/api/trips/<int:trip_id>",status="200",le="1"}' \
+        in after
+
+
+def test_failed_statements_leave_nothing_on_the_connection(app):
+    with app.app_context():
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            connection = db.session.connection()
+            info = copy.deepcopy(dict(connection.info))
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql("SELECT * FROM no_such_table")
+            db.session.rollback()
+            connection = db.session.connection()
+            assert connection.exec_driver_sql("SELECT 1").scalar() == 1
+            assert dict(connection.info) == info
+            assert stats.statements == 1
+            assert 0 <= stats.db_seconds < 1
+        finally:
+            _current.reset(token)
@@ -0,0 +1,55 @@
+import pytest
+
+from src.extensions import db
+from src.services.dataset_version import bump_dataset_version
+from src.services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cached_app(trips):
+    trips.config["RESPONSE_CACHE_BYTES"] = 1024 * 1024
+    trips.extensions["response_cache"].init_app(trips)
+    # the dataset version is re-read on every request
+    trips.extensions["response_cache"].version_ttl = 0
+    return trips
+
+
+@pytest.mark.parametrize("path", ["/api/trips/summary", "/api/trips/hourly?start=2016-01-03",
+                                  "/api/trips/hotspots?k=5"])
+def test_etag_and_304(trips, client, path):
+    first = client.get(path)
+    assert first.status_code == 200 and first.headers.get("ETag")
+    again = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_cached_response_is_reused_until_the_dataset_version_changes(cached_app, client):
+    cache = cached_app.extensions["response_cache"]
+    first = client.get("/api/trips/summary")
+    second = client.get("/api/trips/summary")
+    assert cache.stats()["hits"] == 1
+    assert second.data == first.data and second.headers["ETag"] == first.headers["ETag"]
+
+    with cached_app.app_context():
+        db.session.execute(db.text("DELETE FROM trips WHERE id <= 100"))
+        db.session.commit()
+        bump_dataset_version(db.engine)
+    fresh = client.get("/api/trips/summary", headers={"If-None-Match": first.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert fresh.get_json()["total_trips"] == first.get_json()["total_trips"] - 100
+
+
+def test_cache_evicts_least_recently_used_within_its_byte_budget():
+    cache = ResponseCache(max_bytes=25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"y" * 10)
+    assert cache.get("a") is not None
+    cache.put("c", b"z" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 20
+    # too large to keep, but still returned with its ETag
+    body, etag = cache.put("d", b"w" * 30)
+    assert body == b"w" * 30 and etag and cache.get("d") is None
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+
+import pytest
+
+from src.extensions import db
+from src.services.rollups import rebuild_all_rollups, split_window
+from src.services.trip_stats import hourly_stats, summary_stats
+
+
+def test_split_window_midnight_bounds_are_all_rollup():
+    days, raw_ranges = split_window(datetime(2016, 1, 2), datetime(2016, 1, 5))
+    assert days == (date(2016, 1, 2), date(2016, 1, 5))
+    # the inclusive end instant itself is still read from trips
+    assert raw_ranges == [(datetime(2016, 1, 5), datetime(2016, 1, 5), True)]
+
+
+def test_split_window_partial_days_become_raw_edges():
+    start, end = datetime(2016, 1, 2, 13, 30), datetime(2016, 1, 5, 8)
+    days, raw_ranges = split_window(start, end)
+    assert days == (date(2016, 1, 3), date(2016, 1, 5))
+    assert raw_ranges == [
+        (start, datetime(2016, 1, 3), False),
+        (datetime(2016, 1, 5), end, True),
+    ]
+
+
+def test_split_window_within_one_day_has_no_rollup_days():
+    start, end = datetime(2016, 1, 2, 1), datetime(2016, 1, 2, 23)
+    assert split_window(start, end) == (None, [(start, end, True)])
+
+
+def test_split_window_open_bounds():
+    assert split_window(None, None) == ((None, None), [])
+    days, raw_ranges = split_window(datetime(2016, 1, 2, 6), None)
+    assert days == (date(2016, 1, 3), None)
+    assert raw_ranges == [(datetime(2016, 1, 2, 6), datetime(2016, 1, 3), False)]
+
+
+WINDOWS = [
+    (None, None),
+    (datetime(2016, 1, 3), datetime(2016, 1, 7)),
+    (datetime(2016, 1, 2, 13, 30), datetime(2016, 1, 8, 7, 15)),
+    (datetime(2016, 1, 4, 2), datetime(2016, 1, 4, 20)),
+    (datetime(2016, 1, 6, 12), None),
+]
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+def test_rollups_match_raw_trips(trips, start, end):
+    with trips.app_context():
+        rebuild_all_rollups(db.session)
+        raw_summary = summary_stats(start, end, use_rollups=False)
+        rolled_summary = summary_stats(start, end, use_rollups=True)
+        assert rolled_summary["total_trips"] == raw_summary["total_trips"]
+        for key in ("avg_distance", "avg_fare", "avg_speed_kmph"):
+            assert rolled_summary[key] == pytest.approx(raw_summary[key])
+
+        raw_hourly = hourly_stats(start, end, use_rollups=False)
+        rolled_hourly = hourly_stats(start, end, use_rollups=True)
+        assert rolled_hourly["trips"] == raw_hourly["trips"]
+        assert rolled_hourly["speeds"] == pytest.approx(raw_hourly["speeds"])
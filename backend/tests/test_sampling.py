@@ -0,0 +1,80 @@
+import pytest
+
+from src.api.trips import _window
+from src.extensions import db
+from src.models.trip_sample import TripSample
+from src.services.sampling import rebuild_all_samples
+from src.services.trip_stats import hourly_stats, summary_stats
+
+WINDOWS = ["", "?start=2016-01-03&end=2016-01-07", "?start=2016-01-02T13:30:00&end=2016-01-08T07:15:00"]
+
+
+@pytest.fixture
+def sampled(trips):
+    """
+    The trips fixture with half of each day sampled. The fixture's speeds
+    are heavy-tailed (trips as short as a minute), so smaller samples can
+    miss the tail that the normal-approximation intervals assume is there.
+    """
+    with trips.app_context():
+        rebuild_all_samples(db.session, fraction=0.5, min_rows=30)
+    return trips
+
+
+def exact(app, build, query):
+    """
+    build(start, end) over the window the endpoints parse from `query`.
+    """
+    with app.test_request_context(f"/api/trips/summary{query}"):
+        start, end = _window()
+        return build(start, end)
+
+
+@pytest.mark.parametrize("query", WINDOWS)
+def test_approx_summary_intervals_contain_the_exact_values(sampled, query):
+    client = sampled.test_client()
+    separator = "&" if query else "?"
+    approx = client.get(f"/api/trips/summary{query}{separator}approx=true").get_json()
+    expected = exact(sampled, summary_stats, query)
+    with sampled.app_context():
+        sampled_rows = TripSample.query.count()
+
+    assert approx["approximate"] is True
+    assert 0 < approx["sample_size"] <= sampled_rows < 2000
+    for key in ("total_trips", "avg_distance", "avg_fare", "avg_speed_kmph"):
+        low, high = approx["confidence_intervals"][key]
+        assert low <= expected[key] <= high, key
+    if not query:
+        # every sampled row is inside the open window
+        assert approx["sample_size"] == sampled_rows
+
+
+def test_approx_hourly_intervals_contain_the_exact_counts(sampled):
+    approx = sampled.test_client().get("/api/trips/hourly?approx=true").get_json()
+    with sampled.app_context():
+        expected = hourly_stats()
+    assert approx["approximate"] is True and approx["sample_size"] > 0
+    covered = [low <= n <= high for n, (low, high) in zip(expected["trips"], approx["confidence_intervals"]["trips"])]
+    # 95% intervals: allow the odd miss among 24 hours
+    assert sum(covered) >= 22
+
+
+def test_row_threshold_switches_to_the_sample(sampled):
+    client = sampled.test_client()
+    sampled.config["APPROX_ROW_THRESHOLD"] = 5000
+    assert "approximate" not in client.get("/api/trips/summary").get_json()
+
+    sampled.config["APPROX_ROW_THRESHOLD"] = 1000
+    assert client.get("/api/trips/summary").get_json()["approximate"] is True
+    assert client.get("/api/trips/hourly").get_json()["approximate"] is True
+    # an explicit approx=false still gets the exact answer
+    assert client.get("/api/trips/summary?approx=false").get_json() == pytest.approx(
+        exact(sampled, summary_stats, ""))
+    # a window below the threshold is answered exactly
+    assert "approximate" not in client.get("/api/trips/summary?start=2016-01-03&end=2016-01-03").get_json()
+
+
+def test_approx_without_a_sample_falls_back_to_exact(trips):
+    response = trips.test_client().get("/api/trips/summary?approx=true").get_json()
+    assert "approximate" not in response
+    assert response["total_trips"] == 2000
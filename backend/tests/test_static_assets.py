@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+
+APP_JS = "console.log('trips');\n" * 40
+
+
+@pytest.fixture
+def frontend(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "index.html").write_text(
+        '<html><head><link rel="stylesheet" href="styles.css">'
+        '<script src="js/app.js"></script><script src="https://cdn.example.com/x.js"></script>'
+        '<a href="missing.html">x</a></head></html>\n'
+    )
+    (tmp_path / "styles.css").write_text("body { color: black; }\n")
+    (tmp_path / "js" / "app.js").write_text(APP_JS)
+    return tmp_path
+
+
+@pytest.fixture
+def static_client(make_app, frontend):
+    return make_app(FRONTEND_DIR=str(frontend), STATIC_ASSET_MANIFEST=True).test_client()
+
+
+def _version(static_client, path):
+    return static_client.get(path).headers["ETag"].strip('"')
+
+
+def test_html_references_are_versioned(static_client):
+    html = static_client.get("/").data.decode()
+    assert f'href="styles.css?v={_version(static_client, "/styles.css")}"' in html
+    assert f'src="js/app.js?v={_version(static_client, "/js/app.js")}"' in html
+    # external and unknown references are left alone
+    assert 'src="https://cdn.example.com/x.js"' in html
+    assert 'href="missing.html"' in html
+
+
+def test_versioned_urls_are_immutable_and_others_revalidate(static_client):
+    version = _version(static_client, "/js/app.js")
+    assert "immutable" in static_client.get(f"/js/app.js?v={version}").headers["Cache-Control"]
+    assert static_client.get("/js/app.js").headers["Cache-Control"] == "no-cache"
+    assert static_client.get("/js/app.js?v=old").headers["Cache-Control"] == "no-cache"
+    assert static_client.get("/").headers["Cache-Control"] == "no-cache"
+
+
+def test_compressed_variant_and_304(static_client):
+    response = static_client.get("/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode() == APP_JS
+    again = static_client.get("/js/app.js", headers={"Accept-Encoding": "gzip",
+                                                     "If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+    # too small to be worth compressing
+    assert "Content-Encoding" not in static_client.get("/styles.css", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_missing_files_and_spa_routes(static_client):
+    assert static_client.get("/nope.js").status_code == 404
+    assert static_client.get("/api/nope").status_code == 404
+    spa = static_client.get("/trips/42")
+    assert spa.status_code == 200 and spa.data == static_client.get("/").data
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.extensions import db
+from src.models.trip import Trip
+
+# (pickup, fare): two trips in Monday's 08:00 hour, one at 10:05, one just
+# before Wednesday midnight and one at the first second of Sunday
+PICKUPS = [
+    (datetime(2016, 1, 4, 8, 10), 10.0),
+    (datetime(2016, 1, 4, 8, 50), 20.0),
+    (datetime(2016, 1, 4, 10, 5), 30.0),
+    (datetime(2016, 1, 6, 23, 59, 59), 5.0),
+    (datetime(2016, 1, 10, 0, 0), None),
+]
+
+
+@pytest.fixture
+def week(app):
+    with app.app_context():
+        db.session.bulk_insert_mappings(Trip, [{
+            "pickup_datetime": pickup,
+            "dropoff_datetime": pickup + timedelta(minutes=10),
+            "trip_distance": 2.0,
+            "fare_amount": fare,
+            "average_speed_kmph": 12.0,
+            "pickup_hour": pickup.hour,
+            "day_of_week": pickup.weekday(),
+        } for pickup, fare in PICKUPS])
+        db.session.commit()
+    return app
+
+
+def test_hourly_buckets_are_zero_filled(week):
+    body = week.test_client().get(
+        "/api/trips/timeseries?bucket=hour&start=2016-01-04T08:00:00&end=2016-01-04T11:00:00").get_json()
+    assert body["buckets"] == [f"2016-01-04T{h:02d}:00:00" for h in (8, 9, 10, 11)]
+    assert body["trips"] == [2, 0, 1, 0]
+    assert body["avg_fare"] == [15.0, 0.0, 30.0, 0.0]
+    assert body["avg_speed_kmph"] == [12.0, 0.0, 12.0, 0.0]
+
+
+def test_unbounded_buckets_run_from_the_first_to_the_last_trip(week):
+    client = week.test_client()
+    days = client.get("/api/trips/timeseries?bucket=day").get_json()
+    assert days["buckets"] == [f"2016-01-{d:02d}T00:00:00" for d in range(4, 11)]
+    assert days["trips"] == [3, 0, 1, 0, 0, 0, 1]
+    # the Sunday trip has no fare, so only the Wednesday one is averaged there
+    assert days["avg_fare"] == [20.0, 0.0, 5.0, 0.0, 0.0, 0.0, 0.0]
+
+    weeks = client.get("/api/trips/timeseries?bucket=week").get_json()
+    assert weeks["buckets"] == ["2016-01-04T00:00:00"]
+    assert weeks["trips"] == [5]
+
+
+def test_unknown_bucket_is_rejected(week):
+    response = week.test_client().get("/api/trips/timeseries?bucket=minute")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid bucket"
+
+
+def test_too_many_buckets_are_rejected(make_app):
+    client = make_app(TIMESERIES_MAX_BUCKETS=48).test_client()
+    assert client.get("/api/trips/timeseries?bucket=hour&start=2016-01-04&end=2016-01-04").status_code == 200
+    assert client.get("/api/trips/timeseries?bucket=hour&start=2016-01-04&end=2016-01-06").status_code == 400
+
+
+def test_too_many_buckets_between_trips_are_rejected(week):
+    week.config["TIMESERIES_MAX_BUCKETS"] = 48
+    assert week.test_client().get("/api/trips/timeseries?bucket=5min").status_code == 400
+
+
+def test_heatmap_counts_weekday_and_hour(week):
+    client = week.test_client()
+    body = client.get("/api/trips/heatmap").get_json()
+    assert body["days"][0] == "Mon" and body["hours"] == list(range(24))
+    expected = [[0] * 24 for _ in range(7)]
+    expected[0][8], expected[0][10], expected[2][23], expected[6][0] = 2, 1, 1, 1
+    assert body["trips"] == expected
+
+    later = client.get("/api/trips/heatmap?start=2016-01-05").get_json()
+    expected[0][8] = expected[0][10] = 0
+    assert later["trips"] == expected
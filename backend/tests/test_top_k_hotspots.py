@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from src.services_custom.top_k_hotspots import CELL_RESOLUTIONS, cell_to_id, coord_to_cell, id_to_cell, manual_top_k
+
+
+@pytest.mark.parametrize("cell_size_deg", list(CELL_RESOLUTIONS.values()))
+def test_cell_id_round_trip(cell_size_deg):
+    rnd = random.Random(cell_size_deg)
+    points = [(40.75, -73.98), (-89.9999, -179.9999), (89.9999, 179.9999), (0.0, 0.0)]
+    points += [(rnd.uniform(-90, 90), rnd.uniform(-180, 180)) for _ in range(200)]
+    for lat, lon in points:
+        cell = coord_to_cell(lat, lon, cell_size_deg)
+        cell_id = cell_to_id(cell, cell_size_deg)
+        assert cell_id >= 0
+        assert id_to_cell(cell_id, cell_size_deg) == cell
+
+
+def test_cell_ids_are_unique_per_cell():
+    cells = {(i, j) for i in range(4070, 4080) for j in range(-7400, -7390)}
+    assert len({cell_to_id(cell) for cell in cells}) == len(cells)
+    assert cell_to_id(None) is None and id_to_cell(None) is None
+
+
+def test_manual_top_k_matches_a_stable_sort():
+    rnd = random.Random(3)
+    counts = {(i, -i): rnd.randint(0, 30) for i in range(500)}
+    # sorted() is stable, so equal counts keep their first-seen order
+    expected = sorted(counts.items(), key=lambda item: -item[1])
+    for k in (1, 5, 20, 500, 600):
+        assert manual_top_k(counts, k) == expected[:k]
+
+
+def test_manual_top_k_edge_cases():
+    assert manual_top_k({}, 5) == []
+    assert manual_top_k({"a": 1}, 0) == []
+    assert manual_top_k([("a", 2), ("b", 2), ("c", 3)], 2) == [("c", 3), ("a", 2)]
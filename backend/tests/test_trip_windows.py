@@ -0,0 +1,26 @@
+import pytest
+
+from src.extensions import db
+from src.services.distributions import rebuild_all_distributions
+from src.services.rollups import rebuild_all_rollups
+
+ENDPOINTS = ["", "/summary", "/hotspots", "/hourly", "/timeseries", "/heatmap", "/distribution", "/flows",
+             "/dashboard"]
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_invalid_dates_are_rejected(client, endpoint):
+    response = client.get(f"/api/trips{endpoint}?start=yesterday")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid date"
+
+
+@pytest.mark.parametrize("endpoint", ["/flows", "/distribution"])
+def test_whole_day_endpoints_reject_times_of_day(trips, client, endpoint):
+    with trips.app_context():
+        rebuild_all_rollups(db.session)
+        rebuild_all_distributions(db.session)
+    assert client.get(f"/api/trips{endpoint}?start=2016-01-02&end=2016-01-04").status_code == 200
+    assert client.get(f"/api/trips{endpoint}?start=2016-01-02T00:00:00").status_code == 200
+    for query in ("start=2016-01-02T06:00:00", "end=2016-01-04T12:00:00"):
+        assert client.get(f"/api/trips{endpoint}?{query}").status_code == 400
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+
+from src.api.trips import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    at = datetime(2016, 1, 3, 12, 30, 5, 250000)
+    assert _decode_cursor(_encode_cursor(at, 42)) == (at, 42)
+
+
+def _walk(client, query):
+    ids, pages = [], 0
+    url = f"/api/trips?{query}"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids.extend(row["id"] for row in response.get_json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/trips?{query}&cursor={cursor}" if cursor else None
+    return ids, pages
+
+
+def test_keyset_pages_cover_every_trip_once(trips, client):
+    ids, pages = _walk(client, "limit=170")
+    assert sorted(ids) == list(range(1, 2001))
+    assert pages == 12
+
+
+def test_keyset_pages_follow_pickup_order_within_window(trips, client):
+    ids, _ = _walk(client, "limit=100&start=2016-01-03T06:00:00&end=2016-01-05&fields=id,pickup_datetime")
+    response = client.get("/api/trips?format=ndjson&start=2016-01-03T06:00:00&end=2016-01-05")
+    streamed = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert ids == [row["id"] for row in streamed]
+    pickups = [(row["pickup_datetime"], row["id"]) for row in streamed]
+    assert pickups == sorted(pickups)
+    assert all("2016-01-03T06:00:00" <= p <= "2016-01-05T00:00:00" for p, _ in pickups)
+
+
+def test_field_projection(trips, client):
+    rows = client.get("/api/trips?limit=5&fields=id,fare_amount").get_json()
+    assert len(rows) == 5
+    assert all(set(row) == {"id", "fare_amount"} for row in rows)
+    assert client.get("/api/trips?fields=id,nope").status_code == 400
+
+
+def test_bad_cursor_is_rejected(trips, client):
+    response = client.get("/api/trips?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid cursor"